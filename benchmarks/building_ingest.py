@@ -0,0 +1,101 @@
+"""
+Compares the building ingest strategies (see noise_api.noise_analysis.sql_query_builder.select_building_ingest)
+on synthetic cities of growing size and suggests BUILDING_INGEST_INDIVIDUAL_MIN_BUILDINGS:
+the smallest number of buildings from which individual, indexed buildings are faster than a single multipolygon.
+
+    python -m benchmarks.building_ingest --buildings 250 1000 2000 4000 8000 --output building_ingest.json
+
+Runs the complete calculation and needs Java.
+"""
+import argparse
+import datetime
+import json
+import statistics
+
+from benchmarks.stages import git_revision, summarize, time_all_stages
+from benchmarks.synthetic_city import generate_city
+from noise_api.noise_analysis.sql_query_builder import (
+    INDIVIDUAL_BUILDINGS,
+    MULTIPOLYGON_BUILDINGS,
+)
+
+STRATEGIES = (MULTIPOLYGON_BUILDINGS, INDIVIDUAL_BUILDINGS)
+# stages that depend on the building table
+COMPARED_STAGES = ("ingest", "emission", "propagation", "contouring")
+
+
+def time_strategy(city: dict, building_ingest: str, repetitions: int) -> dict:
+    runs = [time_all_stages(city, building_ingest) for _ in range(repetitions)]
+
+    return {
+        "stages": {
+            stage: summarize([run_timings[stage] for run_timings in runs])
+            for stage in COMPARED_STAGES
+        },
+        "total_seconds_median": statistics.median(
+            sum(run_timings[stage] for stage in COMPARED_STAGES) for run_timings in runs
+        ),
+    }
+
+
+def suggest_threshold(results: list[dict]) -> int | None:
+    for result in sorted(results, key=lambda r: r["buildings"]):
+        timings = result["strategies"]
+        if (
+            timings[INDIVIDUAL_BUILDINGS]["total_seconds_median"]
+            < timings[MULTIPOLYGON_BUILDINGS]["total_seconds_median"]
+        ):
+            return result["buildings"]
+
+    return None
+
+
+def run(
+    building_counts: list[int], roads_per_building: float, repetitions: int
+) -> dict:
+    results = []
+    for buildings in building_counts:
+        city = generate_city(buildings, max(int(buildings * roads_per_building), 1))
+        results.append(
+            {
+                "buildings": buildings,
+                "strategies": {
+                    strategy: time_strategy(city, strategy, repetitions)
+                    for strategy in STRATEGIES
+                },
+            }
+        )
+
+    return {
+        "revision": git_revision(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "parameters": {
+            "roads_per_building": roads_per_building,
+            "repetitions": repetitions,
+        },
+        "results": results,
+        "suggested_individual_min_buildings": suggest_threshold(results),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--buildings", type=int, nargs="+", default=[250, 1000, 2000, 4000, 8000]
+    )
+    parser.add_argument("--roads-per-building", type=float, default=0.5)
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument(
+        "--output", help="JSON file to write the results to, printed otherwise"
+    )
+    args = parser.parse_args()
+
+    results = run(args.buildings, args.roads_per_building, args.repetitions)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
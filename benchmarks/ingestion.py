@@ -0,0 +1,92 @@
+"""
+Measures the CPU time the API spends on an execution request that misses the cache,
+from the raw request body to the enqueued task. Redis and the broker are replaced by stubs.
+
+    python -m benchmarks.ingestion --copies 100
+"""
+import argparse
+import copy
+import json
+import statistics
+import time
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from noise_api.api import endpoints
+from noise_api.api.main import app
+from noise_api.models.calculation_input import BUILDINGS, ROADS
+from noise_api.utils import load_json_file
+
+
+class CacheMissStub:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def claim(self, *args, owner, **kwargs):
+        return owner
+
+
+def replicate_features(
+    feature_collection: dict, copies: int, offset: float = 0.01
+) -> dict:
+    # shifts copies of the example features, to get inputs of city scale
+    features = []
+    for i in range(copies):
+        for feature in feature_collection["features"]:
+            feature = copy.deepcopy(feature)
+            feature["geometry"]["coordinates"] = shift_coordinates(
+                feature["geometry"]["coordinates"], i * offset
+            )
+            features.append(feature)
+
+    return {**feature_collection, "features": features}
+
+
+def shift_coordinates(coordinates: list, offset: float) -> list:
+    if isinstance(coordinates[0], (int, float)):
+        return [coordinates[0] + offset, *coordinates[1:]]
+
+    return [shift_coordinates(part, offset) for part in coordinates]
+
+
+def run(copies: int, repetitions: int) -> dict:
+    request_body = json.dumps(
+        {
+            "buildings": replicate_features(load_json_file(BUILDINGS), copies),
+            "roads": replicate_features(load_json_file(ROADS), copies),
+            "max_speed": 30,
+        }
+    ).encode()
+
+    cpu_times = []
+    with mock.patch.object(endpoints, "cache", CacheMissStub()), mock.patch.object(
+        endpoints, "job_store", CacheMissStub()
+    ), mock.patch.object(endpoints.tasks.compute_task, "apply_async"), TestClient(
+        app
+    ) as client:
+        for _ in range(repetitions):
+            start = time.process_time()
+            response = client.post(
+                "/noise/processes/traffic-noise/execution",
+                content=request_body,
+                headers={"Content-Type": "application/json"},
+            )
+            cpu_times.append(time.process_time() - start)
+            assert response.status_code == 201, response.text
+
+    return {
+        "copies": copies,
+        "request_bytes": len(request_body),
+        "cpu_seconds_median": statistics.median(cpu_times),
+        "cpu_seconds_min": min(cpu_times),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--copies", type=int, default=100)
+    parser.add_argument("--repetitions", type=int, default=10)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.copies, args.repetitions)))
@@ -0,0 +1,126 @@
+"""
+Times each stage of the noise calculation (see noise_api.noise_analysis.noisemap.STAGES)
+on a synthetic city and writes the results as JSON, to track them across versions.
+
+    python -m benchmarks.stages --buildings 1000 --roads 500 --output stages.json
+
+The stages from ingest on run in the H2 database and need Java.
+--python-only times the stages before the database only.
+"""
+import argparse
+import datetime
+import json
+import statistics
+import subprocess
+import time
+
+from benchmarks.synthetic_city import generate_city
+from noise_api.noise_analysis.noisemap import (
+    H2DatabaseContextManager,
+    calculate_noise_result,
+    prepare_queries,
+)
+
+TRAFFIC_SETTINGS = {"max_speed": None, "traffic_quota": None}
+
+
+def time_python_stages(city: dict) -> dict:
+    stage_timings = {}
+    prepare_queries(
+        city["buildings"],
+        city["roads"],
+        TRAFFIC_SETTINGS,
+        stage_timings=stage_timings,
+    )
+
+    return stage_timings
+
+
+def time_all_stages(city: dict, building_ingest: str | None = None) -> dict:
+    stage_timings = {}
+    start = time.perf_counter()
+    with H2DatabaseContextManager() as h2_context:
+        stage_timings["h2_boot"] = time.perf_counter() - start
+        calculate_noise_result(
+            h2_context.psycopg2_cursor,
+            city["buildings"],
+            city["roads"],
+            TRAFFIC_SETTINGS,
+            stage_timings=stage_timings,
+            building_ingest=building_ingest,
+        )
+
+    return stage_timings
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(timings: list[float]) -> dict:
+    return {
+        "median_seconds": statistics.median(timings),
+        "min_seconds": min(timings),
+        "max_seconds": max(timings),
+    }
+
+
+def run(
+    buildings: int, roads: int, railroads: int, repetitions: int, python_only: bool
+) -> dict:
+    city = generate_city(buildings, roads, railroads)
+    time_stages = time_python_stages if python_only else time_all_stages
+
+    runs = [time_stages(city) for _ in range(repetitions)]
+
+    return {
+        "revision": git_revision(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "parameters": {
+            "buildings": buildings,
+            "roads": roads,
+            "railroads": railroads,
+            "repetitions": repetitions,
+            "python_only": python_only,
+        },
+        "stages": {
+            stage: summarize([run_timings[stage] for run_timings in runs])
+            for stage in runs[0]
+        },
+        "total_seconds_median": statistics.median(
+            sum(run_timings.values()) for run_timings in runs
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--buildings", type=int, default=1000)
+    parser.add_argument("--roads", type=int, default=500)
+    parser.add_argument("--railroads", type=int, default=10)
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--python-only", action="store_true")
+    parser.add_argument(
+        "--output", help="JSON file to write the results to, printed otherwise"
+    )
+    args = parser.parse_args()
+
+    results = run(
+        args.buildings, args.roads, args.railroads, args.repetitions, args.python_only
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
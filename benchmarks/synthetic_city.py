@@ -0,0 +1,166 @@
+"""
+Generates synthetic inputs of configurable scale: building footprints on a grid of blocks,
+road segments of mixed road_type along the block borders and a railroad south of the city.
+
+    python -m benchmarks.synthetic_city --buildings 1000 --roads 500 --railroads 20 > city.json
+"""
+import argparse
+import json
+import math
+import random
+
+# Hamburg, in UTM zone 32 (EPSG:25832)
+ORIGIN = (10.0, 53.53)
+BLOCK_SIZE_METERS = 60
+METERS_PER_DEGREE = 111_320
+
+ROAD_TYPES = {
+    # road_type: (max_speed, car_traffic_daily, truck_traffic_daily, weight)
+    "boulevard": (60, 9000, 2000, 1),
+    "street": (50, 3000, 800, 3),
+    "alley": (30, 600, 50, 2),
+}
+
+
+def generate_city(
+    buildings: int,
+    roads: int,
+    railroads: int = 0,
+    seed: int = 0,
+    origin: tuple = ORIGIN,
+) -> dict:
+    rng = random.Random(seed)
+    # enough blocks for one building each, and enough block borders for the roads
+    blocks_per_side = max(
+        math.ceil(math.sqrt(buildings)), math.ceil(math.sqrt(roads / 2)), 1
+    )
+    to_wgs84 = _local_to_wgs84(origin)
+
+    building_features = [
+        _building(rng, i % blocks_per_side, i // blocks_per_side, to_wgs84)
+        for i in range(buildings)
+    ]
+    road_features = [
+        _road(rng, road_id, start, end, to_wgs84)
+        for road_id, (start, end) in enumerate(_block_borders(blocks_per_side)[:roads])
+    ]
+    road_features += [
+        _railroad(road_id, i, to_wgs84)
+        for road_id, i in enumerate(range(railroads), start=len(road_features))
+    ]
+
+    return {
+        "buildings": {"type": "FeatureCollection", "features": building_features},
+        "roads": {"type": "FeatureCollection", "features": road_features},
+    }
+
+
+def _local_to_wgs84(origin: tuple):
+    lon, lat = origin
+    meters_per_degree_lon = METERS_PER_DEGREE * math.cos(math.radians(lat))
+
+    def to_wgs84(x: float, y: float) -> list[float]:
+        return [lon + x / meters_per_degree_lon, lat + y / METERS_PER_DEGREE]
+
+    return to_wgs84
+
+
+def _building(rng: random.Random, column: int, row: int, to_wgs84) -> dict:
+    width, depth = rng.uniform(10, 30), rng.uniform(10, 30)
+    x = column * BLOCK_SIZE_METERS + rng.uniform(10, BLOCK_SIZE_METERS - 10 - width)
+    y = row * BLOCK_SIZE_METERS + rng.uniform(10, BLOCK_SIZE_METERS - 10 - depth)
+    corners = [(x, y), (x + width, y), (x + width, y + depth), (x, y + depth), (x, y)]
+
+    return {
+        "type": "Feature",
+        "properties": {"building_height": round(rng.uniform(6, 40), 1)},
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[to_wgs84(*corner) for corner in corners]],
+        },
+    }
+
+
+def _block_borders(blocks_per_side: int) -> list[tuple]:
+    borders = []
+    for i in range(blocks_per_side + 1):
+        for j in range(blocks_per_side):
+            borders.append(((j, i), (j + 1, i)))  # west to east
+            borders.append(((i, j), (i, j + 1)))  # south to north
+
+    # streets close to the city center first
+    center = blocks_per_side / 2
+    return sorted(
+        borders,
+        key=lambda border: max(abs(c - center) for point in border for c in point),
+    )
+
+
+def _road(rng: random.Random, road_id: int, start: tuple, end: tuple, to_wgs84) -> dict:
+    road_type = rng.choices(
+        list(ROAD_TYPES), weights=[values[3] for values in ROAD_TYPES.values()]
+    )[0]
+    max_speed, car_traffic_daily, truck_traffic_daily, _ = ROAD_TYPES[road_type]
+
+    return {
+        "type": "Feature",
+        "properties": {
+            "id": road_id,
+            "road_type": road_type,
+            "max_speed": max_speed,
+            "car_traffic_daily": car_traffic_daily,
+            "truck_traffic_daily": truck_traffic_daily,
+            "train_speed": None,
+            "trains_per_hour": None,
+            "ground_type": None,
+            "has_anti_vibration": None,
+            "traffic_settings_adjustable": rng.random() < 0.5,
+        },
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [
+                to_wgs84(*(c * BLOCK_SIZE_METERS for c in start)),
+                to_wgs84(*(c * BLOCK_SIZE_METERS for c in end)),
+            ],
+        },
+    }
+
+
+def _railroad(road_id: int, segment: int, to_wgs84) -> dict:
+    x = segment * BLOCK_SIZE_METERS
+
+    return {
+        "type": "Feature",
+        "properties": {
+            "id": road_id,
+            "road_type": "railroad",
+            "max_speed": None,
+            "car_traffic_daily": None,
+            "truck_traffic_daily": None,
+            "train_speed": 80,
+            "trains_per_hour": 20,
+            "ground_type": 1,
+            "has_anti_vibration": False,
+            "traffic_settings_adjustable": False,
+        },
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [
+                to_wgs84(x, -BLOCK_SIZE_METERS),
+                to_wgs84(x + BLOCK_SIZE_METERS, -BLOCK_SIZE_METERS),
+            ],
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--buildings", type=int, default=1000)
+    parser.add_argument("--roads", type=int, default=500)
+    parser.add_argument("--railroads", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        json.dumps(generate_city(args.buildings, args.roads, args.railroads, args.seed))
+    )
@@ -0,0 +1,57 @@
+import math
+
+from noise_api.cache import Cache
+from noise_api.config import settings
+from noise_api.models.cost_estimate import CostEstimate
+
+"""
+Admission of jobs by the workers of a host against a CPU and memory budget.
+Celery starts up to worker_concurrency jobs per worker, a few large jobs together would exhaust
+the memory of the host. A job reserves its demand before it starts its H2 database, jobs that
+do not fit in are retried later (see tasks.compute_task).
+Part of the budget is kept back for the interactive queue: jobs of the other queues reserve
+against the budget without it, so they never keep interactive jobs waiting.
+"""
+
+
+def _budget_key() -> str:
+    return f"admission:{settings.admission.host}"
+
+
+def _limits(queue: str | None) -> dict[str, float]:
+    admission = settings.admission
+    if queue == settings.routing.interactive_queue:
+        return {"cpus": admission.cpu_budget, "memory_mb": admission.memory_budget_mb}
+
+    return {
+        "cpus": admission.cpu_budget - admission.interactive_cpus,
+        "memory_mb": admission.memory_budget_mb - admission.interactive_memory_mb,
+    }
+
+
+def heap_size_mb(estimate: CostEstimate, queue: str | None) -> int:
+    admission = settings.admission
+    heap_size = math.ceil(estimate.memory_mb * admission.heap_headroom)
+    # a job never holds more than its queue may use
+    max_heap_size = min(admission.max_heap_mb, _limits(queue)["memory_mb"])
+
+    return max(min(heap_size, max_heap_size), admission.min_heap_mb)
+
+
+def admit(
+    job_store: Cache, job_id: str, estimate: CostEstimate, queue: str | None
+) -> bool:
+    return job_store.reserve(
+        key=_budget_key(),
+        owner=job_id,
+        amounts={
+            "cpus": settings.admission.cpus_per_job,
+            "memory_mb": heap_size_mb(estimate, queue),
+        },
+        limits=_limits(queue),
+        ttl_seconds=settings.broker.task_time_limit,
+    )
+
+
+def release(job_store: Cache, job_id: str) -> None:
+    job_store.release_reservation(key=_budget_key(), owner=job_id)
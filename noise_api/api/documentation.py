@@ -1,6 +1,6 @@
+import logging
 import os
-from noise_api.utils import load_json_file
-from noise_api.models.calculation_input import NoiseCalculationInput, NoiseTask, BUILDINGS, ROADS
+from noise_api.models.calculation_input import example_input_dataset
 
 
 """
@@ -10,8 +10,11 @@ to create and serve OGC-API-PROCESSES compatible description jsons for
 - processes/process-id
 - conformances
 - landingpage
+The documents never change while the API runs, they are generated on first use (see endpoints.ogc_documents).
 """
 
+logger = logging.getLogger(__name__)
+
 
 def get_landingpage_json():
     return {
@@ -53,7 +56,7 @@ def get_processes(openapi_json: dict) -> dict:
 
 
 def generate_process_description(openapi_json: dict, process_path: str) -> dict:
-    print("generating process description for", process_path)
+    logger.debug(f"Generating process description for {process_path}")
 
     for path in openapi_json["paths"]:
         if path == process_path:
@@ -62,7 +65,7 @@ def generate_process_description(openapi_json: dict, process_path: str) -> dict:
                 "title": openapi_json["paths"][path]["post"]["summary"],
                 "description": openapi_json["paths"][path]["post"]["summary"],
                 "outputTransmission": ["value"],
-                "jobControlOptions": ["async-execute"],
+                "jobControlOptions": ["sync-execute", "async-execute", "dismiss"],
                 "keywords": openapi_json["paths"][path]["post"]["summary"].split(" "),
                 "inputs": {}
             }
@@ -79,7 +82,7 @@ def generate_process_description(openapi_json: dict, process_path: str) -> dict:
                         inputs_info["properties"][input]["title"]
                     ),
                     "schema": inputs_info["properties"][input],
-                    "minOccurs": int(input in inputs_info["required"]),
+                    "minOccurs": int(input in inputs_info.get("required", [])),
                     "maxOccurs": 1
                 }
 
@@ -114,6 +117,7 @@ def get_conformance():
         "conformsTo": [
             "http://www.opengis.net/spec/ogcapi-processes/1.0/conf/core",
             "http://www.opengis.net/spec/ogcapi-processes/1.0/conf/json",
+            "http://www.opengis.net/spec/ogcapi-processes/1.0/conf/dismiss",
         ]
     }
 
@@ -123,10 +127,7 @@ def get_openapi_examples():
         "without_global_traffic_settings": {
             "summary": "Without global traffic settings",
             "description": "Max speed and traffic loads as stated in 'roads' parameter will not be changed",
-            "value": {
-                "buildings": load_json_file(BUILDINGS),
-                "roads": load_json_file(ROADS)
-            }
+            "value": example_input_dataset()
         },
         "global_traffic_settings": {
             "summary": "Global traffic settings",
@@ -136,8 +137,25 @@ def get_openapi_examples():
                 "max_speed": 42,
                 "traffic_quota": 40,
                 "wall_absorption": 0.23,
-                "buildings": load_json_file(BUILDINGS),
-                "roads": load_json_file(ROADS),
+                **example_input_dataset(),
+            }
+        },
+        "registered_input_dataset": {
+            "summary": "Registered input dataset",
+            "description": "Buildings and roads registered before at /processes/traffic-noise/inputs \
+                           are referenced by their 'input_id'",
+            "value": {
+                "input_id": "1b7f4c5d0b8b4e1b9f3c2a6d5e4f3a2b",
+                "max_speed": 42,
+                "traffic_quota": 40,
             }
         }
     }
+
+
+def add_openapi_examples(openapi_json: dict) -> None:
+    # the examples are added when openapi.json is requested, instead of loading them on import
+    for path, path_info in openapi_json["paths"].items():
+        if path.endswith("/processes/traffic-noise/execution"):
+            request_body = path_info["post"]["requestBody"]["content"]["application/json"]
+            request_body["examples"] = get_openapi_examples()
@@ -1,110 +1,545 @@
-import os
+import asyncio
+import functools
+import gzip
 import logging
-from typing import Annotated
+import os
+import time
+import uuid
 
+import orjson
 from celery.result import AsyncResult
-from fastapi import APIRouter, Body, Response, HTTPException
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.openapi.utils import get_openapi
+from fastapi.responses import StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST
 
 import noise_api.tasks as tasks
-from noise_api.api.documentation import get_processes, get_conformance, get_landingpage_json, get_openapi_examples
-from noise_api.dependencies import celery_app
-from noise_api.models.calculation_input import NoiseCalculationInput, NoiseTask
+from noise_api import admission, cost_model, job_events, jobs, queues
+from noise_api.api.documentation import (
+    get_conformance,
+    get_landingpage_json,
+    get_processes,
+)
+from noise_api.api.responses import (
+    JSON_MEDIA_TYPE,
+    PrecomputedJSON,
+    compressed_json_response,
+    etag_matches,
+    not_modified_response,
+    precompute_json,
+    precomputed_json_response,
+    preferred_wait_seconds,
+)
+from noise_api.api.routing import ORJSONRoute
+from noise_api.config import settings
+from noise_api.dependencies import (
+    broker_redis,
+    cache,
+    celery_app,
+    events_redis,
+    events_redis_async,
+    input_store,
+    job_store,
+    local_cache,
+)
+from noise_api.metrics import JOBS_SUBMITTED, render_metrics
+from noise_api.models.calculation_input import (
+    NoiseCalculationInput,
+    NoiseInputDataset,
+    NoiseTask,
+)
+from noise_api.models.cost_estimate import CostEstimate
+from noise_api.models.job_priority import JobPriority
 from noise_api.models.job_status_info import StatusInfo
+from noise_api.noise_analysis.comparison import compare_results
+from noise_api.noise_analysis.noisemap import run_noise_calculation
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(tags=["jobs"])
+router = APIRouter(tags=["jobs"], route_class=ORJSONRoute)
+
+# calculations run by the API itself for "Prefer: wait" requests
+sync_execution_slots = asyncio.Semaphore(settings.sync_execution.max_concurrency)
+
+
+def subscribe_local_cache_invalidations():
+    return cache.subscribe_invalidations(
+        on_invalidate=local_cache.invalidate, on_disconnect=local_cache.clear
+    )
+
+
+def local_job_key(job_id: str) -> str:
+    return f"jobs:{job_id}"
+
+
+async def lookup_celery_key(job_id: str) -> str | None:
+    if jobs.is_cached_job_id(job_id):
+        return jobs.lookup_celery_key(job_store, job_id)
+
+    local_key = local_job_key(job_id)
+    if celery_key := local_cache.get(local_key):
+        return celery_key
+
+    if celery_key := await run_in_threadpool(jobs.lookup_celery_key, job_store, job_id):
+        local_cache.put(local_key, celery_key, size=len(celery_key))
+
+    return celery_key
+
+
+async def resolve_celery_key(job_id_or_celery_key: str) -> str | None:
+    if celery_key := await lookup_celery_key(job_id_or_celery_key):
+        return celery_key
+
+    if jobs.is_celery_key(job_id_or_celery_key) and await result_is_cached(
+        job_id_or_celery_key
+    ):
+        return job_id_or_celery_key
+
+    return None
+
+
+async def get_results_document(celery_key: str) -> bytes | None:
+    if results_document := local_cache.get(celery_key):
+        return results_document
+
+    if results_document := await run_in_threadpool(
+        cache.get_compressed, key=celery_key
+    ):
+        local_cache.put(celery_key, results_document, size=len(results_document))
+
+    return results_document
+
+
+async def result_is_cached(celery_key: str) -> bool:
+    return local_cache.get(celery_key) is not None or await run_in_threadpool(
+        cache.exists, key=celery_key
+    )
+
+
+async def run_in_sync_execution_slot(func, *args, **kwargs):
+    async with sync_execution_slots:
+        return await run_in_threadpool(func, *args, **kwargs)
+
+
+# abandoned synchronous calculations, referenced until they stored their results
+abandoned_calculations = set()
+
+
+def store_synchronous_result(celery_key: str, result: dict, statistics: dict) -> dict:
+    if statistics:
+        jobs.store_statistics(cache, celery_key, statistics)
+
+    results_document = {"result": result}
+    cache.put(key=celery_key, value=results_document)
+    # ends the event streams of the requests attached to the calculation
+    job_events.publish(events_redis, jobs.cached_job_id(celery_key), StatusInfo.SUCCESS)
+
+    return results_document
+
+
+async def finish_abandoned_calculation(
+    calculation: asyncio.Future, celery_key: str, statistics: dict
+) -> None:
+    try:
+        result = await calculation
+        await run_in_threadpool(
+            store_synchronous_result, celery_key, result, statistics
+        )
+    except Exception as error:
+        # the job started instead calculates it anyway
+        logger.warning(f"Abandoned synchronous calculation failed: {error}")
+
+
+async def execute_synchronously(
+    calculation_task: NoiseTask, wait_seconds: float
+) -> Response | None:
+    """
+    Calculates small inputs right away and returns the results document,
+    returns None if the calculation should run as a job instead.
+    """
+    if sync_execution_slots.locked():
+        return None
+
+    if calculation_task.input_id is None:
+        # stored anyway, in case the calculation runs as a job
+        await run_in_threadpool(
+            jobs.store_input_dataset,
+            input_store,
+            calculation_task.hash,
+            calculation_task.input_dataset(),
+        )
+        input_dataset = calculation_task.input_dataset()
+    else:
+        input_dataset = await run_in_threadpool(
+            input_store.get, key=calculation_task.input_id
+        )
+
+    input_size = await run_in_threadpool(
+        input_store.entry_size, key=calculation_task.hash
+    )
+    if (
+        input_dataset is None
+        or (input_size or 0) > settings.sync_execution.max_input_bytes
+    ):
+        return None
+
+    features = await run_in_threadpool(
+        cost_model.extract_features, input_dataset["buildings"], input_dataset["roads"]
+    )
+    estimate = await run_in_threadpool(cost_model.estimate, job_store, features)
+    if estimate.duration_seconds > min(
+        wait_seconds, settings.sync_execution.max_estimated_seconds
+    ):
+        return None
+
+    # identical requests meanwhile are answered by the cached job ID, see get_job_status
+    sync_job_id = jobs.cached_job_id(calculation_task.celery_key)
+    if (
+        await run_in_threadpool(
+            jobs.claim_calculation, job_store, calculation_task.celery_key, sync_job_id
+        )
+        != sync_job_id
+    ):
+        # the request is attached to the job running the same calculation
+        return None
+
+    try:
+        logger.info(f"Calculating {calculation_task.celery_key} synchronously")
+        run_stats = {}
+        statistics = {}
+        start = time.monotonic()
+        calculation = asyncio.ensure_future(
+            run_in_sync_execution_slot(
+                run_noise_calculation,
+                {**calculation_task.to_task_def(), **input_dataset},
+                # small inputs only, like the jobs of the interactive queue
+                max_heap_mb=admission.heap_size_mb(
+                    estimate, settings.routing.interactive_queue
+                ),
+                run_stats=run_stats,
+                statistics=statistics,
+            )
+        )
+        try:
+            # the calculation keeps its slot until it ends, even if it is not waited for anymore
+            result = await asyncio.wait_for(asyncio.shield(calculation), wait_seconds)
+        except asyncio.TimeoutError:
+            # the result is still cached, whichever of the calculation and the job ends first
+            abandoned_calculation = asyncio.ensure_future(
+                finish_abandoned_calculation(
+                    calculation, calculation_task.celery_key, statistics
+                )
+            )
+            abandoned_calculations.add(abandoned_calculation)
+            abandoned_calculation.add_done_callback(abandoned_calculations.discard)
+            logger.info(
+                f"Calculation {calculation_task.celery_key} takes longer than wait, running it as a job"
+            )
+            return None
+        duration_seconds = time.monotonic() - start
+
+        results_document = await run_in_threadpool(
+            store_synchronous_result, calculation_task.celery_key, result, statistics
+        )
+    except Exception:
+        logger.exception(
+            f"Synchronous calculation {calculation_task.celery_key} failed, running it as a job"
+        )
+        return None
+    finally:
+        # handed over to the job started instead, see get_job_status
+        await run_in_threadpool(
+            jobs.release_calculation,
+            job_store,
+            calculation_task.celery_key,
+            sync_job_id,
+        )
+
+    await run_in_threadpool(
+        cost_model.record_run,
+        job_store,
+        features,
+        duration_seconds,
+        run_stats.get("memory_mb"),
+    )
+
+    return Response(
+        orjson.dumps(results_document),
+        media_type=JSON_MEDIA_TYPE,
+        headers={"Preference-Applied": f"wait={wait_seconds:g}"},
+    )
+
+
+def compare_results_documents(
+    base_results_document: bytes, results_document: bytes
+) -> dict:
+    return compare_results(
+        *(
+            orjson.loads(gzip.decompress(document))["result"]["geojson"]
+            for document in (base_results_document, results_document)
+        )
+    )
 
 
 def generate_openapi_json():
-    return get_openapi(title=os.environ["APP_TITLE"], version="1.0.0", routes=router.routes, openapi_version="3.0.0")
+    return get_openapi(
+        title=os.environ["APP_TITLE"],
+        version="1.0.0",
+        routes=router.routes,
+        openapi_version="3.0.0",
+    )
+
+
+@functools.cache
+def ogc_documents() -> dict[str, PrecomputedJSON]:
+    processes = get_processes(generate_openapi_json())
+    documents = {
+        "landing_page": precompute_json(get_landingpage_json()),
+        "conformance": precompute_json(get_conformance()),
+        "processes": precompute_json(processes),
+    }
+    for process in processes["processes"]:
+        documents[f"processes/{process['id']}"] = precompute_json(process)
+
+    return documents
 
 
 @router.get("/")
-async def get_landing_page() -> dict:
+async def get_landing_page(request: Request) -> dict:
     """
     OGC Processes 7.2 Retrieve the API Landing page | https://docs.ogc.org/is/18-062r2/18-062r2.html#toc23
     """
-    return get_landingpage_json()
+    return precomputed_json_response(request, ogc_documents()["landing_page"])
 
 
 @router.get("/conformance")
-async def get_conformances() -> dict:
+async def get_conformances(request: Request) -> dict:
     """
     OGC Processes 7.4 Declaration of conformances | https://docs.ogc.org/is/18-062r2/18-062r2.html#toc25
     """
-    return get_conformance()
+    return precomputed_json_response(request, ogc_documents()["conformance"])
 
 
 @router.get("/processes/{process_id}")
 @router.get("/processes")
-async def get_processes_json(process_id: str = None) -> dict:
+async def get_processes_json(request: Request, process_id: str = None) -> dict:
     """
     OGC Processes 7.9 Process List https://docs.ogc.org/is/18-062r2/18-062r2.html#toc30
     OGC Processes 7.10 Process Description https://docs.ogc.org/is/18-062r2/18-062r2.html#toc31
     """
-    processes = get_processes(generate_openapi_json())
-
-    if process_id:
-        for process in processes["processes"]:
-            print(process)
-            if process["id"] == process_id:
-                return process
+    documents = ogc_documents()
+    document = documents.get(f"processes/{process_id}", documents["processes"])
 
-    return processes
+    return precomputed_json_response(request, document)
 
 
 @router.post(
     path="/processes/traffic-noise/execution",
     tags=["process"],
     summary="Traffic Noise Simulation",
-    status_code=201
+    status_code=201,
 )
 async def process_job(
-        calculation_input: Annotated[
-            NoiseCalculationInput,
-            Body(
-                openapi_examples=get_openapi_examples()
-            )
-        ],
-        response: Response
+    # the request body examples are added to openapi.json on first request, see main.openapi
+    calculation_input: NoiseCalculationInput,
+    request: Request,
+    response: Response,
+    priority: JobPriority = JobPriority.INTERACTIVE,
+    profile: bool = False,
 ):
+    """
+    profile=true (if PROFILING_ENABLED) always starts a new job and records where its time is spent,
+    see /jobs/{jobId}/profile
+
+    With "Prefer: wait=<seconds>", cached results and small inputs are answered with the results document
+    (OGC sync-execute), everything else runs as a job.
+    """
+    if profile and not settings.profiling.enabled:
+        raise HTTPException(status_code=403, detail="profiling is disabled")
+
     response_content = {
-            "processID": "traffic-noise",
-            "type": "process",
+        "processID": "traffic-noise",
+        "type": "process",
     }
 
-    calculation_task = NoiseTask(**calculation_input.dict())
-    if _result := tasks.find_result_in_cache(celery_key=calculation_task.celery_key):
-        logger.info(
-            f"Result already cached with key: {calculation_task.celery_key}"
+    calculation_task = NoiseTask.from_input(calculation_input)
+    wait_seconds = None if profile else preferred_wait_seconds(request)
+    if wait_seconds is not None and (
+        results_document := await get_results_document(calculation_task.celery_key)
+    ):
+        results_response = await compressed_json_response(
+            request, results_document, jobs.results_etag(calculation_task.celery_key)
         )
+        results_response.headers["Preference-Applied"] = f"wait={wait_seconds:g}"
+        return results_response
 
-        # run fetching result as task with delay, to get a jobID (to keep the workflow)
-        job_id = tasks.find_result_in_cache.delay(celery_key=calculation_task.celery_key).id
+    if not profile and await result_is_cached(calculation_task.celery_key):
+        logger.info(f"Result already cached with key: {calculation_task.celery_key}")
 
-        response_content["jobID"] = job_id
+        # answer from the cache, the job ID is derived from the celery_key
+        response_content["jobID"] = jobs.cached_job_id(calculation_task.celery_key)
         response_content["status"] = StatusInfo.SUCCESS.value
 
         return response_content
 
+    if calculation_task.input_id is not None and not await run_in_threadpool(
+        input_store.exists, key=calculation_task.input_id
+    ):
+        raise HTTPException(status_code=404, detail="no such input dataset")
+
+    if wait_seconds is not None and (
+        sync_response := await execute_synchronously(calculation_task, wait_seconds)
+    ):
+        return sync_response
+
     logger.info(
         f"Result with key: {calculation_task.celery_key} not found in cache. Starting calculation ..."
     )
-    result = tasks.compute_task.delay(jsonable_encoder(calculation_task))
+    job_id = str(uuid.uuid4())
+    if profile:
+        # a profile is only meaningful for a calculation of its own
+        running_job_id = job_id
+    else:
+        running_job_id = await run_in_threadpool(
+            jobs.claim_calculation, job_store, calculation_task.celery_key, job_id
+        )
+
+    if running_job_id == job_id:
+        await run_in_threadpool(
+            jobs.remember_celery_key, job_store, job_id, calculation_task.celery_key
+        )
+        try:
+            if calculation_task.input_id is None:
+                # the broker message only carries the input_id, see NoiseTask.to_task_def
+                await run_in_threadpool(
+                    jobs.store_input_dataset,
+                    input_store,
+                    calculation_task.hash,
+                    calculation_task.input_dataset(),
+                )
+            await run_in_threadpool(
+                jobs.pin_input_dataset, input_store, calculation_task.hash, job_id
+            )
+            input_size = await run_in_threadpool(
+                input_store.entry_size, key=calculation_task.hash
+            )
+            queue = queues.select_queue(priority, input_size or 0)
+            logger.info(f"Job {job_id} is routed to queue {queue}")
+
+            task_def = calculation_task.to_task_def()
+            if profile:
+                task_def["profile"] = True
+
+            tasks.compute_task.apply_async(args=[task_def], task_id=job_id, queue=queue)
+            JOBS_SUBMITTED.labels(queue=queue).inc()
+        except Exception:
+            await run_in_threadpool(
+                jobs.unpin_input_dataset, input_store, calculation_task.hash, job_id
+            )
+            await run_in_threadpool(
+                jobs.release_calculation, job_store, calculation_task.celery_key, job_id
+            )
+            raise
+    else:
+        logger.info(
+            f"Calculation with key: {calculation_task.celery_key} already running as job {running_job_id}"
+        )
 
     # OGC Processes Requirement 34 | /req/core/process-execute-success-async
-    response_content["jobID"] = result.id
+    response_content["jobID"] = running_job_id
     response_content["status"] = StatusInfo.ACCEPTED.value
-    response.headers["Location"] = f"/noise/jobs/{result.id}"
+    response.headers["Location"] = f"/noise/jobs/{running_job_id}"
 
     return response_content
 
 
+@router.post(
+    path="/processes/traffic-noise/inputs",
+    summary="Register buildings and roads for the Traffic Noise Simulation",
+    status_code=201,
+)
+async def register_input_dataset(input_dataset: NoiseInputDataset) -> dict:
+    """
+    Stores buildings and roads once. Execution requests can reference them by the returned 'input_id',
+    so only the traffic settings need to be sent for each scenario.
+    """
+    input_id = input_dataset.hash
+    await run_in_threadpool(
+        jobs.store_input_dataset,
+        input_store,
+        input_id,
+        {"buildings": input_dataset.buildings, "roads": input_dataset.roads},
+    )
+
+    return {"input_id": input_id}
+
+
+@router.post(
+    path="/processes/traffic-noise/estimate",
+    summary="Expected duration and memory of a Traffic Noise Simulation",
+)
+async def estimate_job_cost(calculation_input: NoiseCalculationInput) -> CostEstimate:
+    """
+    Estimated from the number of roads, building vertices and the area of the input,
+    calibrated with the calculations run so far.
+    """
+    calculation_task = NoiseTask.from_input(calculation_input)
+    if calculation_task.input_id is not None:
+        input_dataset = await run_in_threadpool(
+            input_store.get, key=calculation_task.input_id
+        )
+        if input_dataset is None:
+            raise HTTPException(status_code=404, detail="no such input dataset")
+    else:
+        input_dataset = calculation_task.input_dataset()
+
+    features = await run_in_threadpool(
+        cost_model.extract_features, input_dataset["buildings"], input_dataset["roads"]
+    )
+
+    return await run_in_threadpool(cost_model.estimate, job_store, features)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats() -> dict:
+    """
+    Size, hit/miss and eviction counters of the result cache, the input dataset store
+    and the in-process cache of this API instance
+    """
+    return {
+        "results": await run_in_threadpool(cache.stats),
+        "inputs": await run_in_threadpool(input_store.stats),
+        "local": local_cache.stats(),
+    }
+
+
+@router.get("/metrics", tags=["ROOT"])
+async def get_metrics() -> Response:
+    """
+    Prometheus metrics of the API and (with PROMETHEUS_MULTIPROC_DIR) of the workers
+    """
+    queues = [settings.broker.task_default_queue, settings.routing.interactive_queue]
+    content = await run_in_threadpool(render_metrics, broker_redis, queues)
+
+    return Response(content, media_type=CONTENT_TYPE_LATEST)
+
+
 @router.get("/jobs/{job_id}/results")
-async def get_job(job_id: str):
+async def get_job(job_id: str, request: Request):
+    if celery_key := await lookup_celery_key(job_id):
+        etag = jobs.results_etag(celery_key)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
+        # serve the stored results document without decoding it
+        if results_document := await get_results_document(celery_key):
+            return await compressed_json_response(request, results_document, etag)
+
+    if jobs.is_cached_job_id(job_id):
+        # the cached result has expired since the job ID was handed out
+        raise HTTPException(status_code=404, detail="no such job")
+
     async_result = AsyncResult(job_id, app=celery_app)
 
     if async_result.state == "PENDING":
@@ -121,24 +556,183 @@ async def get_job(job_id: str):
     raise HTTPException(status_code=404, detail="no such job")
 
 
+@router.get("/jobs/{job_id}/statistics")
+async def get_job_statistics(job_id: str, request: Request):
+    """
+    Area and number of buildings per noise class of a result,
+    and the share of the study area and the buildings above the EXPOSURE_THRESHOLDS_DB levels
+    """
+    if celery_key := await lookup_celery_key(job_id):
+        etag = jobs.statistics_etag(celery_key)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
+        if statistics := await run_in_threadpool(
+            jobs.get_compressed_statistics, cache, celery_key
+        ):
+            return await compressed_json_response(request, statistics, etag)
+
+    raise HTTPException(status_code=404, detail="no statistics for this job")
+
+
+@router.get("/jobs/{job_id}/comparison")
+async def get_job_comparison(job_id: str, base: str, request: Request):
+    """
+    Difference of the noise classes of this result to the result of base (a job ID or celery_key),
+    with the change of the area per class and above the EXPOSURE_THRESHOLDS_DB levels
+    """
+    celery_key = await resolve_celery_key(job_id)
+    base_celery_key = await resolve_celery_key(base)
+    if celery_key is None or base_celery_key is None:
+        raise HTTPException(status_code=404, detail="no result for one of the jobs")
+
+    etag = jobs.comparison_etag(base_celery_key, celery_key)
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+
+    if comparison := await run_in_threadpool(
+        jobs.get_compressed_comparison, cache, base_celery_key, celery_key
+    ):
+        return await compressed_json_response(request, comparison, etag)
+
+    base_results_document = await get_results_document(base_celery_key)
+    results_document = await get_results_document(celery_key)
+    if base_results_document is None or results_document is None:
+        # expired since the job IDs were resolved
+        raise HTTPException(status_code=404, detail="no result for one of the jobs")
+
+    comparison = await run_in_threadpool(
+        compare_results_documents, base_results_document, results_document
+    )
+    await run_in_threadpool(
+        jobs.store_comparison, cache, base_celery_key, celery_key, comparison
+    )
+
+    return Response(
+        orjson.dumps(comparison), media_type=JSON_MEDIA_TYPE, headers={"ETag": etag}
+    )
+
+
+@router.get("/jobs/{job_id}/profile")
+async def get_job_profile(job_id: str, request: Request):
+    """
+    Sampled Python stacks and SQL statement timings of a job submitted with profile=true
+    """
+    etag = jobs.profile_etag(job_id)
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+
+    if profile := await run_in_threadpool(
+        jobs.get_compressed_profile, job_store, job_id
+    ):
+        return await compressed_json_response(request, profile, etag)
+
+    raise HTTPException(status_code=404, detail="no profile for this job")
+
+
 @router.get("/jobs/{job_id}")
 async def get_job_status(job_id: str):
-    async_result = AsyncResult(job_id, app=celery_app)
-
     response = {
         "type": "process",
         "jobID": job_id,
     }
+
+    if jobs.is_cached_job_id(job_id):
+        celery_key = await lookup_celery_key(job_id)
+        if await result_is_cached(celery_key):
+            response["status"] = StatusInfo.SUCCESS.value
+        elif (
+            await run_in_threadpool(jobs.running_job_id, job_store, celery_key)
+            is not None
+        ):
+            # calculated synchronously for another request (see execute_synchronously),
+            # or by the job that took over when it failed or took longer than wait
+            response["status"] = StatusInfo.PENDING.value
+        else:
+            raise HTTPException(status_code=404, detail="no such job")
+
+        return response
+
+    async_result = AsyncResult(job_id, app=celery_app)
     if async_result.state == "FAILURE":
         response["status"] = StatusInfo.FAILURE.value
-        response["message"] = {str(async_result.get())}
+        response["message"] = str(async_result.result)
 
         return response
 
-    if async_result.state == "PENDING":
+    if async_result.state in ("PENDING", "STARTED"):
         response["status"] = StatusInfo.PENDING.value
 
+    if async_result.state == "RETRY":
+        # the job waits in the queue until the worker admits it (see tasks.compute_task)
+        response["status"] = StatusInfo.ACCEPTED.value
+
     if async_result.state == "SUCCESS":
         response["status"] = StatusInfo.SUCCESS.value
 
+    if async_result.state == "REVOKED":
+        response["status"] = StatusInfo.DISMISSED.value
+
     return response
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str) -> StreamingResponse:
+    """
+    Server-Sent Events with the status of the job: the current status, the stages of the calculation
+    while it runs and the final status ('successful', 'failed' or 'dismissed'), then the stream ends.
+    """
+    if await lookup_celery_key(job_id) is None:
+        # unknown jobs have no events, the stream would wait for them forever
+        raise HTTPException(status_code=404, detail="no such job")
+
+    pubsub = events_redis_async.pubsub()
+    # subscribe first, so no event is missed between looking up the status and listening
+    await pubsub.subscribe(job_events.channel(job_id))
+    try:
+        current_status = await get_job_status(job_id)
+    except Exception:
+        await pubsub.unsubscribe()
+        await pubsub.close()
+        raise
+
+    return StreamingResponse(
+        job_events.stream(
+            pubsub, current_status, settings.job_events.keepalive_seconds
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete("/jobs/{job_id}")
+async def dismiss_job(job_id: str):
+    """
+    OGC Processes 7.14 Dismiss a job | https://docs.ogc.org/is/18-062r2/18-062r2.html#toc35
+    Queued jobs are removed from the queue, running jobs are terminated together with their H2 database.
+    Requests that were attached to the same calculation are dismissed as well.
+    """
+    if jobs.is_cached_job_id(job_id):
+        # cached results are shared with every identical request
+        raise HTTPException(
+            status_code=409,
+            detail="job was answered from the cache and cannot be dismissed",
+        )
+
+    celery_key = await lookup_celery_key(job_id)
+    if celery_key is None:
+        raise HTTPException(status_code=404, detail="no such job")
+
+    await run_in_threadpool(tasks.revoke_job, job_id)
+    await run_in_threadpool(jobs.forget_job, job_store, job_id, celery_key)
+    local_cache.invalidate(local_job_key(job_id))
+    await run_in_threadpool(
+        job_events.publish, events_redis, job_id, StatusInfo.DISMISSED
+    )
+
+    return {
+        "type": "process",
+        "jobID": job_id,
+        "status": StatusInfo.DISMISSED.value,
+        "message": "Job dismissed",
+    }
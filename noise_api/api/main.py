@@ -1,14 +1,38 @@
+import logging
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
+from redis.exceptions import ConnectionError as RedisConnectionError
 
+from noise_api.api.documentation import add_openapi_examples
 from noise_api.api.endpoints import router as tasks_router
+from noise_api.api.endpoints import subscribe_local_cache_invalidations
 from noise_api.config import settings
 from noise_api.logs import setup_logging
 
 setup_logging()
 
+logger = logging.getLogger(__name__)
+
 API_PREFIX = "/noise"
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        invalidations_listener = subscribe_local_cache_invalidations()
+    except RedisConnectionError as e:
+        # cached results never change for a celery_key, local entries just expire later
+        logger.warning(f"Could not subscribe to cache invalidations: {e}")
+        invalidations_listener = None
+
+    yield
+
+    if invalidations_listener is not None:
+        invalidations_listener.stop()
+
+
 app = FastAPI(
     title=settings.title,
     descriprition=settings.description,
@@ -16,6 +40,7 @@ app = FastAPI(
     redoc_url=f"{API_PREFIX}/redoc",
     docs_url=f"{API_PREFIX}/docs",
     openapi_url=f"{API_PREFIX}/openapi.json",
+    lifespan=lifespan,
 )
 
 
@@ -27,5 +52,16 @@ async def health_check():
 app.include_router(tasks_router, prefix=API_PREFIX)
 
 
+def openapi() -> dict:
+    # FastAPI generates the schema once and keeps it in app.openapi_schema
+    if app.openapi_schema is None:
+        add_openapi_examples(FastAPI.openapi(app))
+
+    return app.openapi_schema
+
+
+app.openapi = openapi
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=80)
@@ -0,0 +1,121 @@
+import gzip
+import hashlib
+from typing import NamedTuple
+
+import brotli
+import orjson
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+from noise_api.metrics import RESPONSE_BODY_SIZE
+
+"""
+Responses for payloads that are stored gzip compressed (see noise_api.cache.Cache).
+The stored bytes are sent as they are whenever the client accepts gzip,
+otherwise they are decompressed (and brotli compressed) in the threadpool.
+Static documents are serialized once and served with an ETag of their content.
+"""
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def accepted_encodings(request: Request) -> dict[str, float]:
+    encodings = {}
+    for item in request.headers.get("accept-encoding", "").split(","):
+        encoding, _, params = item.strip().partition(";")
+        if not encoding:
+            continue
+
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+
+        encodings[encoding.strip().lower()] = quality
+
+    return encodings
+
+
+def preferred_wait_seconds(request: Request) -> float | None:
+    # "Prefer: wait=<seconds>" asks for a synchronous response | RFC 7240 4.3
+    for preference in request.headers.get("prefer", "").split(","):
+        name, _, value = preference.strip().partition("=")
+        if name.strip().lower() == "wait":
+            try:
+                return float(value.strip().strip('"'))
+            except ValueError:
+                return None
+
+    return None
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+
+    # If-None-Match uses the weak comparison function | RFC 9110 13.1.2
+    candidates = {
+        candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")
+    }
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+async def compressed_json_response(
+    request: Request, gzipped_body: bytes, etag: str
+) -> Response:
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    encodings = accepted_encodings(request)
+
+    if encodings.get("gzip", encodings.get("*", 0)) > 0:
+        headers["Content-Encoding"] = "gzip"
+        RESPONSE_BODY_SIZE.labels(encoding="gzip").observe(len(gzipped_body))
+        return Response(gzipped_body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+    if encodings.get("br", 0) > 0:
+        headers["Content-Encoding"] = "br"
+    # results are several MB, decoding them would block the event loop
+    body = await run_in_threadpool(
+        transcode, gzipped_body, headers.get("Content-Encoding")
+    )
+
+    RESPONSE_BODY_SIZE.labels(
+        encoding=headers.get("Content-Encoding", "identity")
+    ).observe(len(body))
+    return Response(body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+
+def transcode(gzipped_body: bytes, encoding: str | None) -> bytes:
+    body = gzip.decompress(gzipped_body)
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+
+    return body
+
+
+class PrecomputedJSON(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def precompute_json(document: dict) -> PrecomputedJSON:
+    body = orjson.dumps(document)
+    return PrecomputedJSON(body=body, etag=f'"{hashlib.md5(body).hexdigest()}"')
+
+
+def precomputed_json_response(request: Request, document: PrecomputedJSON) -> Response:
+    if etag_matches(request, document.etag):
+        return not_modified_response(document.etag)
+
+    return Response(
+        document.body, media_type=JSON_MEDIA_TYPE, headers={"ETag": document.etag}
+    )
@@ -0,0 +1,37 @@
+from typing import Any, Callable
+
+import orjson
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from noise_api.metrics import REQUEST_BODY_SIZE
+
+"""
+Request bodies are parsed with orjson. Execution requests carry city scale GeoJSON,
+parsing them with the standard library json module is a noticeable part of the request time.
+"""
+
+
+class ORJSONRequest(Request):
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError, invalid bodies are still answered with 422
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+        request_body_size = REQUEST_BODY_SIZE.labels(route=self.path_format)
+
+        async def orjson_route_handler(request: Request) -> Response:
+            request = ORJSONRequest(request.scope, request.receive)
+            response = await route_handler(request)
+            if request.method in ("POST", "PUT"):
+                # the body was read by the route handler already
+                request_body_size.observe(len(await request.body()))
+
+            return response
+
+        return orjson_route_handler
@@ -1,14 +1,49 @@
-import json
+import gzip
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Literal
 
+import orjson
 from fastapi.encoders import jsonable_encoder
 
 import redis
 from noise_api.config import RedisConnectionConfig
+from noise_api.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC_NUMBER = b"\x1f\x8b"
+COMPRESSION_LEVEL = 6
+
+EvictionPolicy = Literal["lru", "lfu"]
 
 
 class Cache:
+    """
+    Values are stored as gzip compressed JSON, so they can be handed to clients
+    (Content-Encoding: gzip) without being decoded and encoded again.
+
+    Entries that are overwritten, deleted or evicted are announced on a pub/sub channel,
+    see subscribe_invalidations.
+
+    With max_bytes set, the compressed size of every entry is tracked and entries are evicted
+    once the budget is exceeded:
+    - "lru": least recently used entries first
+    - "lfu": entries with the fewest accesses per byte first, so large one-off results go before hot ones
+    Entries whose TTL ran out are dropped from the bookkeeping before anything is evicted,
+    pinned entries (see pin) are not evicted.
+    Without max_bytes, entries are left to their TTL and no bookkeeping is kept.
+    """
+
     def __init__(
-        self, connection_config: RedisConnectionConfig, key_prefix: str, ttl_days: int
+        self,
+        connection_config: RedisConnectionConfig,
+        key_prefix: str,
+        ttl_days: int,
+        max_bytes: int = 0,
+        eviction_policy: EvictionPolicy = "lru",
     ):
         self._redis = redis.Redis(
             host=connection_config.host,
@@ -17,26 +52,402 @@ class Cache:
             username=connection_config.username,
             password=connection_config.password,
             ssl=connection_config.ssl,
-            decode_responses=True,
         )
         self._key_prefix = key_prefix
         self._ttl_days = ttl_days
+        self._max_bytes = max_bytes
+        self._eviction_policy = eviction_policy
 
-    def get(self, *, key: str) -> dict:
-        key = self._make_key(key)
-        serialized_value = self._redis.get(key)
-        return None if serialized_value is None else json.loads(serialized_value)
+        # bookkeeping for eviction and statistics
+        self._entries_key = self._make_key("__entries")  # sorted by eviction priority
+        self._expiries_key = self._make_key("__expiries")  # sorted by expiry time
+        self._sizes_key = self._make_key("__sizes")
+        self._stats_key = self._make_key("__stats")
+        self._invalidations_key = self._make_key("__invalidations")
+
+    def get(self, *, key: str) -> dict | None:
+        compressed_value = self.get_compressed(key=key)
+        if compressed_value is None:
+            return None
+
+        return orjson.loads(gzip.decompress(compressed_value))
+
+    def get_compressed(self, *, key: str) -> bytes | None:
+        compressed_value = self._redis.get(self._make_key(key))
+        if compressed_value is None or not compressed_value.startswith(
+            GZIP_MAGIC_NUMBER
+        ):
+            # values written before compression was introduced count as a miss
+            self._record_miss()
+            return None
+
+        self._record_hit(key)
+        return compressed_value
+
+    def exists(self, *, key: str) -> bool:
+        # only reads the first two bytes, to tell compressed values from legacy ones
+        if self._redis.getrange(self._make_key(key), 0, 1) != GZIP_MAGIC_NUMBER:
+            self._record_miss()
+            return False
+
+        self._record_hit(key)
+        return True
+
+    def touch(self, *, key: str) -> bool:
+        """Resets the TTL of an entry, returns whether it exists."""
+        ttl = self._ttl_days * 86400
+        if not self._redis.expire(self._make_key(key), ttl):
+            self._record_miss()
+            return False
+
+        if self._max_bytes:
+            self._redis.zadd(self._expiries_key, {key: time.time() + ttl}, xx=True)
+        self._record_hit(key)
+        return True
 
     def put(self, *, key: str, value: dict) -> None:
-        key = self._make_key(key)
-        jsonable_value = jsonable_encoder(value)
-        serialized_value = json.dumps(jsonable_value)
+        # jsonable_encoder only handles what orjson cannot serialize natively (pydantic models, ...)
+        serialized_value = orjson.dumps(
+            value,
+            default=jsonable_encoder,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+        # mtime=0 keeps the compressed bytes stable for identical values
+        compressed_value = gzip.compress(
+            serialized_value, compresslevel=COMPRESSION_LEVEL, mtime=0
+        )
         ttl = self._ttl_days * 86400
-        self._redis.setex(key, ttl, serialized_value)
 
-    def delete(self, *, key: str) -> None:
+        if not self._max_bytes:
+            with self._redis.pipeline() as pipe:
+                pipe.exists(self._make_key(key))
+                pipe.setex(self._make_key(key), ttl, compressed_value)
+                existed, _ = pipe.execute()
+            if existed:
+                self._redis.publish(self._invalidations_key, key)
+            return
+
+        size = len(compressed_value)
+        previous_size = self.entry_size(key=key) or 0
+
+        with self._redis.pipeline() as pipe:
+            pipe.setex(self._make_key(key), ttl, compressed_value)
+            pipe.hset(self._sizes_key, key, size)
+            pipe.hincrby(self._stats_key, "bytes", size - previous_size)
+            pipe.zadd(self._entries_key, {key: self._initial_priority(size)})
+            pipe.zadd(self._expiries_key, {key: time.time() + ttl})
+            if previous_size:
+                pipe.publish(self._invalidations_key, key)
+            pipe.execute()
+
+        self._evict()
+
+    def claim(self, *, key: str, owner: str, ttl_seconds: int) -> str:
+        """
+        Sets the key to owner, unless another owner holds it already.
+        Returns the owner holding the key afterwards.
+        """
+        key = self._make_key(key)
+        while not self._redis.set(key, owner, nx=True, ex=ttl_seconds):
+            if (current_owner := self._redis.get(key)) is not None:
+                return current_owner.decode()
+
+        return owner
+
+    def owner(self, *, key: str) -> str | None:
+        """Returns the owner holding the key (see claim)."""
+        owner = self._redis.get(self._make_key(key))
+
+        return owner.decode() if owner is not None else None
+
+    def release(self, *, key: str, owner: str) -> None:
+        key = self._make_key(key)
+
+        def _delete_if_owned(pipe):
+            if pipe.get(key) == owner.encode():
+                pipe.multi()
+                pipe.delete(key)
+
+        self._redis.transaction(_delete_if_owned, key)
+
+    def reserve(
+        self,
+        *,
+        key: str,
+        owner: str,
+        amounts: dict[str, float],
+        limits: dict[str, float],
+        ttl_seconds: int,
+    ) -> bool:
+        """
+        Adds a reservation of amounts for owner, if all reservations together stay within limits.
+        Reservations are granted when no other reservation is held, so demands above the limits are served alone.
+        A reservation expires after ttl_seconds, in case its owner dies without releasing it.
+        """
         key = self._make_key(key)
-        self._redis.delete(key)
+
+        def _reserve_if_within_limits(pipe) -> bool:
+            now = time.time()
+            reservations = {
+                reservation_owner.decode(): orjson.loads(reservation)
+                for reservation_owner, reservation in pipe.hgetall(key).items()
+            }
+            expired = [o for o, r in reservations.items() if r["expires_at"] <= now]
+            held = [
+                r["amounts"]
+                for o, r in reservations.items()
+                if o not in expired and o != owner
+            ]
+
+            for name, limit in limits.items():
+                if (
+                    held
+                    and sum(r.get(name, 0) for r in held) + amounts.get(name, 0) > limit
+                ):
+                    return False
+
+            pipe.multi()
+            if expired:
+                pipe.hdel(key, *expired)
+            pipe.hset(
+                key,
+                owner,
+                orjson.dumps({"amounts": amounts, "expires_at": now + ttl_seconds}),
+            )
+            return True
+
+        return self._redis.transaction(
+            _reserve_if_within_limits, key, value_from_callable=True
+        )
+
+    def pin(self, *, key: str, owner: str, ttl_seconds: int) -> None:
+        """
+        Keeps the entry from being evicted until owner unpins it.
+        The pin expires after ttl_seconds, in case its owner never unpins it.
+        """
+        pins_key = self._pins_key(key)
+        with self._redis.pipeline() as pipe:
+            pipe.hset(pins_key, owner, time.time() + ttl_seconds)
+            pipe.expire(pins_key, ttl_seconds)
+            pipe.execute()
+
+    def unpin(self, *, key: str, owner: str) -> None:
+        self._redis.hdel(self._pins_key(key), owner)
+
+    def release_reservation(self, *, key: str, owner: str) -> None:
+        self._redis.hdel(self._make_key(key), owner)
+
+    def append(self, *, key: str, value: dict, max_length: int) -> None:
+        """Appends value to a list, only the last max_length values are kept."""
+        key = self._make_key(key)
+        with self._redis.pipeline() as pipe:
+            pipe.rpush(key, orjson.dumps(value, default=jsonable_encoder))
+            pipe.ltrim(key, -max_length, -1)
+            pipe.execute()
+
+    def get_list(self, *, key: str) -> list[dict]:
+        return [
+            orjson.loads(value)
+            for value in self._redis.lrange(self._make_key(key), 0, -1)
+        ]
+
+    def delete(self, *, key: str) -> None:
+        self._remove_entry(key)
+
+    def entry_size(self, *, key: str) -> int | None:
+        if not self._max_bytes:
+            return self._redis.strlen(self._make_key(key)) or None
+
+        size = self._redis.hget(self._sizes_key, key)
+        return None if size is None else int(size)
+
+    def stats(self) -> dict:
+        with self._redis.pipeline() as pipe:
+            pipe.hgetall(self._stats_key)
+            pipe.zcard(self._entries_key)
+            counters, entries = pipe.execute()
+
+        counters = {name.decode(): int(value) for name, value in counters.items()}
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+
+        return {
+            "entries": entries,
+            "bytes": counters.get("bytes", 0),
+            "max_bytes": self._max_bytes,
+            "eviction_policy": self._eviction_policy,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else None,
+            "evictions": counters.get("evictions", 0),
+        }
+
+    def subscribe_invalidations(
+        self, on_invalidate: Callable[[str], None], on_disconnect: Callable[[], None]
+    ):
+        """
+        Calls on_invalidate with the key of every entry that is overwritten, deleted or evicted.
+        Invalidations might be missed while the connection is lost, on_disconnect is called then.
+        Returns the listener thread, call its stop() to unsubscribe.
+        """
+
+        def _handle_message(message):
+            on_invalidate(message["data"].decode())
+
+        def _handle_exception(exception, pubsub, thread):
+            logger.warning(f"Lost subscription to cache invalidations: {exception}")
+            on_disconnect()
+            time.sleep(1)
+
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self._invalidations_key: _handle_message})
+
+        return pubsub.run_in_thread(
+            sleep_time=1, daemon=True, exception_handler=_handle_exception
+        )
+
+    def _initial_priority(self, size: int) -> float:
+        if self._eviction_policy == "lfu":
+            return 1 / max(size, 1)
+
+        return time.time()
+
+    def _record_hit(self, key: str) -> None:
+        CACHE_LOOKUPS.labels(cache=self._key_prefix, result="hit").inc()
+        if not self._max_bytes:
+            self._redis.hincrby(self._stats_key, "hits", 1)
+            return
+
+        size = self.entry_size(key=key) if self._eviction_policy == "lfu" else None
+        with self._redis.pipeline() as pipe:
+            pipe.hincrby(self._stats_key, "hits", 1)
+            if size:
+                pipe.zincrby(self._entries_key, 1 / size, key)
+            elif self._eviction_policy == "lru":
+                pipe.zadd(self._entries_key, {key: time.time()}, xx=True)
+            pipe.execute()
+
+    def _record_miss(self) -> None:
+        CACHE_LOOKUPS.labels(cache=self._key_prefix, result="miss").inc()
+        self._redis.hincrby(self._stats_key, "misses", 1)
+
+    def _drop_expired(self) -> None:
+        for key in self._redis.zrangebyscore(self._expiries_key, 0, time.time()):
+            self._remove_entry(key.decode())
+
+    def _is_pinned(self, key: str) -> bool:
+        now = time.time()
+        return any(
+            float(expires_at) > now
+            for expires_at in self._redis.hvals(self._pins_key(key))
+        )
+
+    def _evict(self) -> None:
+        self._drop_expired()
+
+        # pinned entries are skipped, the budget may be exceeded while they are pinned
+        skipped = 0
+        while int(self._redis.hget(self._stats_key, "bytes") or 0) > self._max_bytes:
+            lowest_priority = self._redis.zrange(self._entries_key, skipped, skipped)
+            if not lowest_priority:
+                break
+
+            key = lowest_priority[0].decode()
+            if self._is_pinned(key):
+                skipped += 1
+                continue
+
+            self._remove_entry(key, evicted=True)
+
+    def _remove_entry(self, key: str, evicted: bool = False) -> None:
+        size = self.entry_size(key=key) or 0
+
+        # only the client removing the entry from the index adjusts the counters
+        if not self._redis.zrem(self._entries_key, key):
+            self._redis.delete(self._make_key(key))
+            self._redis.publish(self._invalidations_key, key)
+            return
+
+        with self._redis.pipeline() as pipe:
+            pipe.delete(self._make_key(key))
+            pipe.zrem(self._expiries_key, key)
+            pipe.hdel(self._sizes_key, key)
+            pipe.hincrby(self._stats_key, "bytes", -size)
+            pipe.publish(self._invalidations_key, key)
+            deleted, *_ = pipe.execute()
+
+        # entries that expired on their own do not count as evicted
+        if evicted and deleted:
+            self._redis.hincrby(self._stats_key, "evictions", 1)
+
+    def _pins_key(self, key: str) -> str:
+        return self._make_key(f"__pins:{key}")
 
     def _make_key(self, key: str) -> str:
         return f"{self._key_prefix}:{key}"
+
+
+class LocalCache:
+    """
+    Size bounded, in-process LRU cache in front of the Redis cache.
+    Entries are dropped when the Redis entry is invalidated (see Cache.subscribe_invalidations)
+    and after max_age_seconds at the latest, in case an invalidation was missed.
+    """
+
+    def __init__(self, max_bytes: int, max_age_seconds: int):
+        self._max_bytes = max_bytes
+        self._max_age_seconds = max_age_seconds
+        self._entries: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self._max_age_seconds:
+                if entry is not None:
+                    self._remove(key)
+                self._misses += 1
+                CACHE_LOOKUPS.labels(cache="local", result="miss").inc()
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            CACHE_LOOKUPS.labels(cache="local", result="hit").inc()
+            return entry[2]
+
+    def put(self, key: str, value: Any, size: int) -> None:
+        if size > self._max_bytes:
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic(), size, value)
+            self._bytes += size
+
+            while self._bytes > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+    def _remove(self, key: str) -> None:
+        if (entry := self._entries.pop(key, None)) is not None:
+            self._bytes -= entry[1]
@@ -1,3 +1,5 @@
+import os
+import socket
 from typing import Literal, Optional
 
 from pydantic import BaseSettings, Field
@@ -16,6 +18,19 @@ class CacheRedis(BaseSettings):
     connection: RedisConnectionConfig = Field(default_factory=RedisConnectionConfig)
     key_prefix: str = "noise_simulations"
     ttl_days: int = Field(30, env="REDIS_CACHE_TTL_DAYS")
+    max_bytes: int = Field(1024**3, env="REDIS_CACHE_MAX_BYTES")  # 0 for no limit
+    eviction_policy: Literal["lru", "lfu"] = Field(
+        "lfu", env="REDIS_CACHE_EVICTION_POLICY"
+    )
+    # input coordinates (WGS84) closer than this are considered equal, ~1cm
+    coordinate_tolerance: float = Field(1e-7, env="REDIS_CACHE_COORDINATE_TOLERANCE")
+    inputs_key_prefix: str = "noise_inputs"
+    inputs_ttl_days: int = Field(7, env="REDIS_INPUTS_TTL_DAYS")
+    # 0 for no limit
+    inputs_max_bytes: int = Field(512 * 1024**2, env="REDIS_INPUTS_MAX_BYTES")
+    jobs_key_prefix: str = "noise_jobs"
+    # upper bound for a calculation (see CELERY_TASK_TIME_LIMIT), identical requests are attached to it meanwhile
+    inflight_ttl_seconds: int = Field(3600, env="REDIS_INFLIGHT_TTL_SECONDS")
 
     @property
     def redis_url(self) -> str:
@@ -30,12 +45,126 @@ class CacheRedis(BaseSettings):
         return f"{self.redis_url}/1"
 
 
+class CacheLocal(BaseSettings):
+    # in-process cache of the API in front of the redis cache
+    max_bytes: int = Field(256 * 1024**2, env="LOCAL_CACHE_MAX_BYTES")
+    max_age_seconds: int = Field(600, env="LOCAL_CACHE_MAX_AGE_SECONDS")
+    # input datasets held by each worker process, measured as serialized JSON
+    inputs_max_bytes: int = Field(64 * 1024**2, env="LOCAL_CACHE_INPUTS_MAX_BYTES")
+
+
 class BrokerCelery(BaseSettings):
     worker_concurrency: int = 10
     result_expires: bool = None  # Do not delete results from cache.
     result_persistent: bool = True
     enable_utc: bool = True
     task_default_queue: str = Field(..., env="CELERY_DEFAULT_QUEUE")
+    # calculations run for minutes, a worker process should not reserve the next one meanwhile
+    worker_prefetch_multiplier: int = 1
+    # the soft limit interrupts the calculation and shuts down its H2 database,
+    # the hard limit kills the worker process if that does not succeed in time
+    task_soft_time_limit: int = Field(3000, env="CELERY_TASK_SOFT_TIME_LIMIT")
+    task_time_limit: int = Field(3060, env="CELERY_TASK_TIME_LIMIT")
+    # reports running jobs as STARTED, see /jobs/{jobId}
+    task_track_started: bool = True
+
+
+class JobRouting(BaseSettings):
+    # small interactive calculations have their own queue and workers, large ones go to the default queue
+    interactive_queue: str = Field("noise-interactive", env="CELERY_INTERACTIVE_QUEUE")
+    # gzip compressed size of buildings and roads, as stored in the input store
+    interactive_max_input_bytes: int = Field(
+        256 * 1024, env="CELERY_INTERACTIVE_MAX_INPUT_BYTES"
+    )
+
+
+class SyncExecution(BaseSettings):
+    # execution requests with "Prefer: wait=<seconds>" are calculated by the API and answered with the results,
+    # if the input is small and expected to finish within the wait time, otherwise they run as jobs
+    max_input_bytes: int = Field(64 * 1024, env="SYNC_EXECUTE_MAX_INPUT_BYTES")
+    max_estimated_seconds: float = Field(30, env="SYNC_EXECUTE_MAX_ESTIMATED_SECONDS")
+    max_concurrency: int = Field(2, env="SYNC_EXECUTE_CONCURRENCY")
+
+
+class JobEvents(BaseSettings):
+    # comment lines sent on idle /jobs/{jobId}/events streams
+    keepalive_seconds: float = Field(15, env="JOB_EVENTS_KEEPALIVE_SECONDS")
+
+
+class CostModel(BaseSettings):
+    # runs recorded by the workers to calibrate the cost model
+    min_recorded_runs: int = Field(10, env="COST_MODEL_MIN_RECORDED_RUNS")
+    max_recorded_runs: int = Field(500, env="COST_MODEL_MAX_RECORDED_RUNS")
+
+
+class WorkerAdmission(BaseSettings):
+    # budgets per worker host, jobs wait in the queue until their estimated demand fits in
+    cpu_budget: float = Field(default_factory=os.cpu_count, env="WORKER_CPU_BUDGET")
+    memory_budget_mb: int = Field(8192, env="WORKER_MEMORY_BUDGET_MB")
+    cpus_per_job: float = 1.0  # H2 / NoiseModelling mostly runs on one thread
+    retry_countdown_seconds: int = Field(15, env="WORKER_ADMISSION_RETRY_SECONDS")
+    # JVM heap of a job: estimated memory * heap_headroom, within min_heap_mb and max_heap_mb
+    heap_headroom: float = 1.5
+    min_heap_mb: int = 512
+    max_heap_mb: int = Field(8192, env="WORKER_MAX_HEAP_MB")
+    # kept back for jobs of the interactive queue, jobs of other queues cannot use it
+    interactive_cpus: float = Field(1, env="WORKER_INTERACTIVE_CPUS")
+    interactive_memory_mb: int = Field(2048, env="WORKER_INTERACTIVE_MEMORY_MB")
+    # workers sharing one budget have to use the same host name, e.g. containers on one machine
+    host: str = Field(default_factory=socket.gethostname, env="WORKER_ADMISSION_HOST")
+
+
+class Profiling(BaseSettings):
+    # execution requests may ask for a profile of their job (?profile=true), profiled jobs run slower
+    enabled: bool = Field(False, env="PROFILING_ENABLED")
+    sample_interval_seconds: float = Field(
+        0.01, env="PROFILING_SAMPLE_INTERVAL_SECONDS"
+    )
+    max_stacks: int = 200
+    max_statements: int = 50
+
+
+class Logging(BaseSettings):
+    # records are formatted and written by a background thread, records beyond queue_size are dropped
+    queue_size: int = Field(10000, env="LOG_QUEUE_SIZE")
+    # per call site, for records logged with extra={"rate_limit": True} (e.g. once per road)
+    rate_limit_records: int = Field(20, env="LOG_RATE_LIMIT_RECORDS")
+    rate_limit_interval_seconds: float = Field(
+        60, env="LOG_RATE_LIMIT_INTERVAL_SECONDS"
+    )
+
+
+class Prefilter(BaseSettings):
+    # drops buildings and roads that cannot change the result (see noise_api.noise_analysis.prefilter)
+    enabled: bool = Field(True, env="PREFILTER_ENABLED")
+    # roads outside the extent of the buildings with less traffic are dropped as well, 0 keeps them
+    min_outside_daily_vehicles: float = Field(
+        0, env="PREFILTER_MIN_OUTSIDE_DAILY_VEHICLES"
+    )
+
+
+class SourceMerging(BaseSettings):
+    # contiguous road segments with equal traffic are merged into one source
+    # (see noise_api.noise_analysis.source_merging), ends closer than the tolerance meet
+    enabled: bool = Field(True, env="SOURCE_MERGING_ENABLED")
+    tolerance_meters: float = Field(1.0, env="SOURCE_MERGING_TOLERANCE_METERS")
+
+
+class BuildingIngest(BaseSettings):
+    # "multipolygon": all buildings as one row, "individual": one row per building with a spatial index,
+    # "auto": individual from individual_min_buildings on, the threshold has to be measured on the
+    # worker hardware with benchmarks/building_ingest.py before "auto" is enabled
+    strategy: Literal["auto", "multipolygon", "individual"] = Field(
+        "multipolygon", env="BUILDING_INGEST_STRATEGY"
+    )
+    individual_min_buildings: int = Field(
+        2000, env="BUILDING_INGEST_INDIVIDUAL_MIN_BUILDINGS"
+    )
+
+
+class ExposureStatistics(BaseSettings):
+    # share of the study area and number of buildings above these levels, e.g. EXPOSURE_THRESHOLDS_DB=[55,65]
+    thresholds_db: list[int] = Field([55, 65], env="EXPOSURE_THRESHOLDS_DB")
 
 
 class Computation(BaseSettings):
@@ -57,8 +186,20 @@ class Settings(BaseSettings):
     debug: bool = Field(..., env="DEBUG")
     log_level: Optional[Literal["DEBUG", "INFO"]] = Field("INFO", env="LOG_LEVEL")
     environment: Optional[Literal["LOCALDEV", "PROD"]] = Field(..., env="ENVIRONMENT")
+    logging: Logging = Field(default_factory=Logging)
     cache: CacheRedis = Field(default_factory=CacheRedis)
+    local_cache: CacheLocal = Field(default_factory=CacheLocal)
     broker: BrokerCelery = Field(default_factory=BrokerCelery)
+    routing: JobRouting = Field(default_factory=JobRouting)
+    job_events: JobEvents = Field(default_factory=JobEvents)
+    sync_execution: SyncExecution = Field(default_factory=SyncExecution)
+    cost_model: CostModel = Field(default_factory=CostModel)
+    admission: WorkerAdmission = Field(default_factory=WorkerAdmission)
+    profiling: Profiling = Field(default_factory=Profiling)
+    prefilter: Prefilter = Field(default_factory=Prefilter)
+    source_merging: SourceMerging = Field(default_factory=SourceMerging)
+    building_ingest: BuildingIngest = Field(default_factory=BuildingIngest)
+    exposure_statistics: ExposureStatistics = Field(default_factory=ExposureStatistics)
     computation: Computation = Field(default_factory=Computation)
 
 
@@ -0,0 +1,138 @@
+import math
+
+import numpy as np
+
+from noise_api.cache import Cache
+from noise_api.config import settings
+from noise_api.models.cost_estimate import CostEstimate
+
+"""
+Estimates the runtime and memory of a calculation from its input.
+Both grow roughly linearly with the number of roads, the number of building vertices
+and the area covered by the input. The coefficients are fitted to the recorded runs
+(least squares), until enough runs are recorded rough defaults are used.
+"""
+
+FEATURES = ("roads", "building_vertices", "envelope_km2")
+
+# intercept followed by one coefficient per feature
+DEFAULT_DURATION_COEFFICIENTS = (20.0, 0.05, 0.002, 5.0)  # seconds
+DEFAULT_MEMORY_COEFFICIENTS = (512.0, 0.2, 0.02, 50.0)  # MB
+
+RUNS_KEY = "cost_model:runs"
+
+METERS_PER_DEGREE = 111_320
+
+
+def extract_features(buildings: dict, roads: dict) -> dict[str, float]:
+    building_positions = _positions(buildings)
+    road_positions = _positions(roads)
+
+    return {
+        "roads": float(len(roads["features"])),
+        "building_vertices": float(len(building_positions)),
+        "envelope_km2": _envelope_km2(building_positions + road_positions),
+    }
+
+
+def _positions(feature_collection: dict) -> list:
+    positions = []
+    for feature in feature_collection["features"]:
+        _collect_geometry_positions(feature.get("geometry"), positions)
+
+    return positions
+
+
+def _collect_geometry_positions(geometry: dict | None, positions: list) -> None:
+    # features may have no geometry | RFC 7946 3.2
+    if geometry is None:
+        return
+
+    if geometry["type"] == "GeometryCollection":
+        for part in geometry.get("geometries", []):
+            _collect_geometry_positions(part, positions)
+        return
+
+    _collect_positions(geometry.get("coordinates", []), positions)
+
+
+def _collect_positions(coordinates: list, positions: list) -> None:
+    if not coordinates:
+        return
+
+    if isinstance(coordinates[0], (int, float)):
+        positions.append(coordinates[:2])
+        return
+
+    for part in coordinates:
+        _collect_positions(part, positions)
+
+
+def _envelope_km2(positions: list) -> float:
+    if not positions:
+        return 0.0
+
+    # equirectangular approximation of the bounding box of WGS84 positions
+    (min_lon, min_lat), (max_lon, max_lat) = np.min(positions, axis=0), np.max(
+        positions, axis=0
+    )
+    width = (
+        (max_lon - min_lon)
+        * METERS_PER_DEGREE
+        * math.cos(math.radians((min_lat + max_lat) / 2))
+    )
+    height = (max_lat - min_lat) * METERS_PER_DEGREE
+
+    return float(width * height / 1e6)
+
+
+def record_run(
+    job_store: Cache, features: dict, duration_seconds: float, memory_mb: float | None
+) -> None:
+    job_store.append(
+        key=RUNS_KEY,
+        value={
+            "features": features,
+            "duration_seconds": duration_seconds,
+            "memory_mb": memory_mb,
+        },
+        max_length=settings.cost_model.max_recorded_runs,
+    )
+
+
+def estimate(job_store: Cache, features: dict) -> CostEstimate:
+    runs = job_store.get_list(key=RUNS_KEY)
+    duration_coefficients = (
+        _fit(runs, "duration_seconds") or DEFAULT_DURATION_COEFFICIENTS
+    )
+    memory_coefficients = _fit(runs, "memory_mb") or DEFAULT_MEMORY_COEFFICIENTS
+
+    return CostEstimate(
+        duration_seconds=_predict(duration_coefficients, features),
+        memory_mb=_predict(memory_coefficients, features),
+        features=features,
+        recorded_runs=len(runs),
+    )
+
+
+def _fit(runs: list[dict], target: str) -> tuple[float, ...] | None:
+    runs = [run for run in runs if run.get(target) is not None]
+    if len(runs) < settings.cost_model.min_recorded_runs:
+        return None
+
+    x = np.array(
+        [[1.0, *(run["features"][feature] for feature in FEATURES)] for run in runs]
+    )
+    y = np.array([run[target] for run in runs])
+    coefficients, *_ = np.linalg.lstsq(x, y, rcond=None)
+
+    # negative coefficients are fitting noise, more input never makes a calculation cheaper
+    return tuple(np.maximum(coefficients, 0.0))
+
+
+def _predict(coefficients: tuple[float, ...], features: dict) -> float:
+    intercept, *weights = coefficients
+    return float(
+        intercept
+        + sum(weight * features[feature] for weight, feature in zip(weights, FEATURES))
+    )
@@ -1,14 +1,54 @@
+import redis
+import redis.asyncio
 from celery import Celery
 
-from noise_api.cache import Cache
+from noise_api.cache import Cache, LocalCache
 from noise_api.config import settings
 
 cache = Cache(
     connection_config=settings.cache.connection,
     key_prefix=settings.cache.key_prefix,
     ttl_days=settings.cache.ttl_days,
+    max_bytes=settings.cache.max_bytes,
+    eviction_policy=settings.cache.eviction_policy,
+)
+
+# input datasets registered once and referenced by their hash in execution requests
+input_store = Cache(
+    connection_config=settings.cache.connection,
+    key_prefix=settings.cache.inputs_key_prefix,
+    ttl_days=settings.cache.inputs_ttl_days,
+    max_bytes=settings.cache.inputs_max_bytes,
+    eviction_policy="lru",
+)
+
+# references from job IDs to celery_keys and claims of running calculations, never evicted
+job_store = Cache(
+    connection_config=settings.cache.connection,
+    key_prefix=settings.cache.jobs_key_prefix,
+    ttl_days=settings.cache.ttl_days,
+)
+
+# encoded results and job references, held by the API process
+local_cache = LocalCache(
+    max_bytes=settings.local_cache.max_bytes,
+    max_age_seconds=settings.local_cache.max_age_seconds,
+)
+
+# input datasets held by the worker processes, execution requests only carry their input_id
+local_input_cache = LocalCache(
+    max_bytes=settings.local_cache.inputs_max_bytes,
+    max_age_seconds=settings.local_cache.max_age_seconds,
 )
 
 celery_app = Celery(
     __name__, broker=settings.cache.broker_url, backend=settings.cache.result_backend
 )
+celery_app.conf.update(settings.broker.dict())
+
+# read only access to the broker, for the depth of the queues
+broker_redis = redis.Redis.from_url(settings.cache.broker_url)
+
+# pub/sub of job status events, published by the workers and streamed by the API
+events_redis = redis.Redis.from_url(settings.cache.broker_url)
+events_redis_async = redis.asyncio.Redis.from_url(settings.cache.broker_url)
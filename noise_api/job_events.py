@@ -0,0 +1,69 @@
+import logging
+from typing import AsyncIterator
+
+import orjson
+from redis import Redis, RedisError
+from redis.asyncio.client import PubSub
+
+from noise_api.models.job_status_info import StatusInfo
+
+"""
+Job status events, published by the workers (and the API for dismissed jobs) over Redis pub/sub
+and streamed to clients as Server-Sent Events from /jobs/{jobId}/events.
+Events are not stored, clients that connect get the current status first.
+"""
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = {
+    StatusInfo.SUCCESS.value,
+    StatusInfo.FAILURE.value,
+    StatusInfo.DISMISSED.value,
+}
+
+
+def channel(job_id: str) -> str:
+    return f"job_events:{job_id}"
+
+
+def publish(redis_client: Redis, job_id: str, status: StatusInfo, **fields) -> None:
+    event = {"type": "process", "jobID": job_id, "status": status.value, **fields}
+    try:
+        redis_client.publish(channel(job_id), orjson.dumps(event))
+    except RedisError as e:
+        # clients fall back to the status endpoint
+        logger.warning(f"Could not publish event of job {job_id}: {e}")
+
+
+def format_event(event: dict) -> str:
+    return f"event: status\ndata: {orjson.dumps(event).decode()}\n\n"
+
+
+async def stream(
+    pubsub: PubSub, current_status: dict, keepalive_seconds: float
+) -> AsyncIterator[str]:
+    """
+    Yields the current status and then every event published for the job until it reached a final status.
+    pubsub has to be subscribed to the channel of the job before current_status is looked up.
+    """
+    try:
+        yield format_event(current_status)
+        if current_status.get("status") in FINAL_STATUSES:
+            return
+
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=keepalive_seconds
+            )
+            if message is None:
+                # keeps proxies from closing the idle connection
+                yield ": keepalive\n\n"
+                continue
+
+            event = orjson.loads(message["data"])
+            yield format_event(event)
+            if event["status"] in FINAL_STATUSES:
+                return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.close()
@@ -0,0 +1,157 @@
+import re
+
+from noise_api.cache import Cache
+from noise_api.config import settings
+
+"""
+Bookkeeping that maps the job IDs handed out by the API to the celery_key
+of the calculation, so results can be served straight from the cache.
+
+Jobs answered from the cache never reach Celery, their job ID is derived from the celery_key.
+Identical calculations submitted while one is running are attached to the running job.
+"""
+
+CACHED_JOB_ID_PREFIX = "cached-"
+# <input hash>_<scenario hash>, see NoiseTask.celery_key
+CELERY_KEY_PATTERN = re.compile(r"[^_:]+_[^_:]+")
+
+
+def _job_reference_key(job_id: str) -> str:
+    return f"jobs:{job_id}"
+
+
+def _inflight_key(celery_key: str) -> str:
+    return f"inflight:{celery_key}"
+
+
+def _profile_key(job_id: str) -> str:
+    return f"profiles:{job_id}"
+
+
+def _statistics_key(celery_key: str) -> str:
+    return f"statistics:{celery_key}"
+
+
+def _comparison_key(base_celery_key: str, celery_key: str) -> str:
+    return f"comparisons:{base_celery_key}:{celery_key}"
+
+
+def store_input_dataset(input_store: Cache, input_id: str, input_dataset: dict) -> None:
+    # input datasets are stored under their hash, existing ones never change
+    if not input_store.touch(key=input_id):
+        input_store.put(key=input_id, value=input_dataset)
+
+
+def pin_input_dataset(input_store: Cache, input_id: str, job_id: str) -> None:
+    # the input dataset must not be evicted while the job waits in the queue or for admission
+    input_store.pin(
+        key=input_id,
+        owner=job_id,
+        ttl_seconds=settings.cache.inputs_ttl_days * 86400,
+    )
+
+
+def unpin_input_dataset(input_store: Cache, input_id: str, job_id: str) -> None:
+    input_store.unpin(key=input_id, owner=job_id)
+
+
+def remember_celery_key(job_store: Cache, job_id: str, celery_key: str) -> None:
+    job_store.put(key=_job_reference_key(job_id), value={"celery_key": celery_key})
+
+
+def cached_job_id(celery_key: str) -> str:
+    return f"{CACHED_JOB_ID_PREFIX}{celery_key}"
+
+
+def is_cached_job_id(job_id: str) -> bool:
+    return job_id.startswith(CACHED_JOB_ID_PREFIX)
+
+
+def is_celery_key(key: str) -> bool:
+    # the other entries of the results cache (statistics, comparisons, bookkeeping) are no results
+    return CELERY_KEY_PATTERN.fullmatch(key) is not None
+
+
+def lookup_celery_key(job_store: Cache, job_id: str) -> str | None:
+    if is_cached_job_id(job_id):
+        celery_key = job_id.removeprefix(CACHED_JOB_ID_PREFIX)
+        return celery_key if is_celery_key(celery_key) else None
+
+    if job_reference := job_store.get(key=_job_reference_key(job_id)):
+        return job_reference["celery_key"]
+
+    return None
+
+
+def claim_calculation(job_store: Cache, celery_key: str, job_id: str) -> str:
+    """
+    Returns job_id if the calculation was claimed for it,
+    otherwise the ID of the job already running the same calculation.
+    """
+    return job_store.claim(
+        key=_inflight_key(celery_key),
+        owner=job_id,
+        ttl_seconds=settings.cache.inflight_ttl_seconds,
+    )
+
+
+def running_job_id(job_store: Cache, celery_key: str) -> str | None:
+    return job_store.owner(key=_inflight_key(celery_key))
+
+
+def release_calculation(job_store: Cache, celery_key: str, job_id: str) -> None:
+    job_store.release(key=_inflight_key(celery_key), owner=job_id)
+
+
+def forget_job(job_store: Cache, job_id: str, celery_key: str) -> None:
+    # identical requests start a new calculation from now on
+    release_calculation(job_store, celery_key, job_id)
+    job_store.delete(key=_job_reference_key(job_id))
+
+
+def store_profile(job_store: Cache, job_id: str, profile: dict) -> None:
+    job_store.put(key=_profile_key(job_id), value=profile)
+
+
+def get_compressed_profile(job_store: Cache, job_id: str) -> bytes | None:
+    return job_store.get_compressed(key=_profile_key(job_id))
+
+
+def profile_etag(job_id: str) -> str:
+    # a job is profiled once, its profile never changes
+    return f'W/"profile-{job_id}"'
+
+
+def store_statistics(result_store: Cache, celery_key: str, statistics: dict) -> None:
+    # stored next to the results document, so they expire together
+    result_store.put(key=_statistics_key(celery_key), value=statistics)
+
+
+def get_compressed_statistics(result_store: Cache, celery_key: str) -> bytes | None:
+    return result_store.get_compressed(key=_statistics_key(celery_key))
+
+
+def statistics_etag(celery_key: str) -> str:
+    return f'W/"statistics-{celery_key}"'
+
+
+def store_comparison(
+    result_store: Cache, base_celery_key: str, celery_key: str, comparison: dict
+) -> None:
+    result_store.put(key=_comparison_key(base_celery_key, celery_key), value=comparison)
+
+
+def get_compressed_comparison(
+    result_store: Cache, base_celery_key: str, celery_key: str
+) -> bytes | None:
+    return result_store.get_compressed(key=_comparison_key(base_celery_key, celery_key))
+
+
+def comparison_etag(base_celery_key: str, celery_key: str) -> str:
+    # both results are fully determined by their celery_key, so is their comparison
+    return f'W/"comparison-{base_celery_key}-{celery_key}"'
+
+
+def results_etag(celery_key: str) -> str:
+    # results are fully determined by the inputs, which the celery_key is a hash of
+    return f'W/"{celery_key}"'
@@ -1,17 +1,31 @@
-import dataclasses
+import atexit
 import datetime
-import enum
-import json
 import logging.config
-import uuid
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
 from typing import Any
 
+import orjson
 from pydantic import BaseModel
 
 from noise_api.config import settings
+from noise_api.metrics import LOG_RECORDS_DROPPED
+
+"""
+Records are put on a queue by the logging thread and formatted / written to stdout by a listener thread,
+so logging does not block the calculation or the event loop.
+"""
+
+_listener: logging.handlers.QueueListener | None = None
 
 
 def setup_logging():
+    global _listener
+
     logging.captureWarnings(True)
     logging.config.dictConfig(
         {
@@ -22,13 +36,20 @@ def setup_logging():
                     "class": "noise_api.logs.StructuredLogFormatter"
                 },
             },
+            "filters": {
+                "rate_limit": {
+                    "()": "noise_api.logs.RateLimitFilter",
+                    "max_records": settings.logging.rate_limit_records,
+                    "interval_seconds": settings.logging.rate_limit_interval_seconds,
+                },
+            },
             "handlers": {
                 "default": {
                     "level": settings.log_level,
-                    "class": "logging.StreamHandler",
-                    "stream": "ext://sys.stdout",
-                    "formatter": "structured_log_formatter",
-                }
+                    "class": "noise_api.logs.NonBlockingQueueHandler",
+                    "queue": queue.Queue(settings.logging.queue_size),
+                    "filters": ["rate_limit"],
+                },
             },
             "loggers": {
                 "root": {
@@ -39,25 +60,112 @@ def setup_logging():
         }
     )
 
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(StructuredLogFormatter())
+
+    if _listener is not None:
+        _listener.stop()
+    queue_handler = logging.getLogger().handlers[0]
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler)
+    _listener.start()
+
+
+def stop_logging():
+    # writes the records still in the queue
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_listener_after_fork():
+    # the listener thread does not survive a fork (Celery prefork pool), the queue may be left locked
+    global _listener
+
+    if _listener is None:
+        return
+
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, NonBlockingQueueHandler):
+            handler.queue = queue.Queue(settings.logging.queue_size)
+            _listener = logging.handlers.QueueListener(
+                handler.queue, *_listener.handlers
+            )
+            _listener.start()
+
 
-class StructuredLogJSONEncoder(json.JSONEncoder):
-    def default(self, o: Any) -> Any:
-        if isinstance(o, (datetime.datetime, datetime.date)):
-            return o.isoformat()
-        if isinstance(o, uuid.UUID):
-            return str(o)
-        if isinstance(o, enum.Enum):
-            return o.value
-        if isinstance(o, BaseModel):
-            return o.dict()
-        if dataclasses.is_dataclass(o):
-            return dataclasses.asdict(o)
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+atexit.register(stop_logging)
 
-        return super().default(o)
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # only what cannot be done later, extras are passed on as they are
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Passes max_records per interval and call site of records logged with extra={"rate_limit": True},
+    the next record passed reports how many were suppressed.
+    """
+
+    def __init__(self, max_records: int, interval_seconds: float):
+        super().__init__()
+        self._max_records = max_records
+        self._interval_seconds = interval_seconds
+        self._call_sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "rate_limit", False):
+            return True
+
+        call_site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window_start, passed, suppressed = self._call_sites.get(
+                call_site, (now, 0, 0)
+            )
+            if now - window_start >= self._interval_seconds:
+                window_start, passed = now, 0
+
+            if passed >= self._max_records:
+                self._call_sites[call_site] = (window_start, passed, suppressed + 1)
+                return False
+
+            self._call_sites[call_site] = (window_start, passed + 1, 0)
+
+        if suppressed:
+            record.suppressed_records = suppressed
+
+        return True
+
+
+def _encode_default(o: Any) -> Any:
+    # orjson serializes datetimes, UUIDs, enums and dataclasses natively
+    if isinstance(o, BaseModel):
+        return o.dict()
+
+    return str(o)
 
 
 class StructuredLogFormatter(logging.Formatter):
-    _log_record_fields = [
+    _log_record_fields = {
         "name",
         "msg",
         "args",
@@ -78,30 +186,37 @@ class StructuredLogFormatter(logging.Formatter):
         "threadName",
         "processName",
         "process",
-    ]
+        "message",
+        "rate_limit",
+        "taskName",
+    }
 
     def format(self, record) -> str:
-        return json.dumps(
+        exc_text = record.exc_text
+        if record.exc_info:
+            exc_text = self.formatException(record.exc_info)
+
+        return orjson.dumps(
             {
-                "message": record.msg,
+                "message": record.getMessage(),
                 "extra": {
                     k: v
                     for k, v in record.__dict__.items()
                     if k not in self._log_record_fields
                 },
                 "metadata": {
-                    "created_at": datetime.datetime.now(
-                        datetime.timezone.utc
+                    "created_at": datetime.datetime.fromtimestamp(
+                        record.created, datetime.timezone.utc
                     ).isoformat(),
                     "logger_name": record.name,
                     "log_level": record.levelname,
                     "pathname": record.pathname,
                     "lineno": record.lineno,
-                    "exc_info": record.exc_info
-                    and self.formatException(record.exc_info),
+                    "exc_info": exc_text,
                     "stack_info": record.stack_info
                     and self.formatStack(record.stack_info),
                 },
             },
-            cls=StructuredLogJSONEncoder,
-        )
+            default=_encode_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        ).decode()
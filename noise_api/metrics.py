@@ -0,0 +1,131 @@
+import glob
+import logging
+import os
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+from redis import Redis, RedisError
+
+"""
+Prometheus metrics of the API and the workers, served on /noise/metrics.
+
+Celery runs the jobs in worker processes of their own. With PROMETHEUS_MULTIPROC_DIR set
+(one directory per service, next to each other in a directory shared by the API and the workers),
+every process writes its metrics there and the API serves them together.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def clear_multiprocess_dir() -> None:
+    # metrics of an earlier run of the service, they have to be gone before the first metric is created
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir is None:
+        return
+
+    os.makedirs(multiproc_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+        os.remove(path)
+
+
+# the API and the Celery main process import this module once when they boot,
+# the Celery worker processes are forked from the main process
+clear_multiprocess_dir()
+
+# calculations take seconds to hours
+DURATION_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+SIZE_BUCKETS = tuple(4**exponent * 1024 for exponent in range(12))  # 1 KiB to 4 GiB
+
+JOB_DURATION = Histogram(
+    "noise_job_duration_seconds",
+    "Duration of noise calculations",
+    ["queue"],
+    buckets=DURATION_BUCKETS,
+)
+STAGE_DURATION = Histogram(
+    "noise_stage_duration_seconds",
+    "Duration of the stages of noise calculations",
+    ["stage"],
+    buckets=DURATION_BUCKETS,
+)
+H2_BOOT_DURATION = Histogram(
+    "noise_h2_boot_seconds", "Time to boot and connect the H2 database of a job"
+)
+JOBS_SUBMITTED = Counter(
+    "noise_jobs_submitted_total", "Calculations put on a queue", ["queue"]
+)
+JOBS_FINISHED = Counter(
+    "noise_jobs_finished_total", "Calculations finished, by final state", ["state"]
+)
+CACHE_LOOKUPS = Counter(
+    "noise_cache_lookups_total", "Lookups in the caches", ["cache", "result"]
+)
+LOG_RECORDS_DROPPED = Counter(
+    "noise_log_records_dropped_total",
+    "Log records dropped because the log queue was full",
+)
+REQUEST_BODY_SIZE = Histogram(
+    "noise_request_body_bytes",
+    "Size of request bodies",
+    ["route"],
+    buckets=SIZE_BUCKETS,
+)
+RESPONSE_BODY_SIZE = Histogram(
+    "noise_results_response_bytes",
+    "Size of results responses",
+    ["encoding"],
+    buckets=SIZE_BUCKETS,
+)
+
+
+def mark_process_dead(pid: int) -> None:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
+
+
+class ServicesCollector:
+    """Metrics of the processes of all services, read from the directories next to PROMETHEUS_MULTIPROC_DIR."""
+
+    def __init__(self, multiproc_dir: str):
+        self._services_dir = os.path.dirname(os.path.normpath(multiproc_dir))
+
+    def collect(self):
+        files = glob.glob(os.path.join(self._services_dir, "*", "*.db"))
+        return multiprocess.MultiProcessCollector.merge(files, accumulate=True)
+
+
+class QueueDepthCollector:
+    """Number of jobs waiting in the Celery queues, read from the broker on every scrape."""
+
+    def __init__(self, broker: Redis, queues: list[str]):
+        self._broker = broker
+        self._queues = queues
+
+    def collect(self):
+        queue_depth = GaugeMetricFamily(
+            "noise_queue_depth", "Jobs waiting in the Celery queues", labels=["queue"]
+        )
+        for queue in self._queues:
+            try:
+                queue_depth.add_metric([queue], self._broker.llen(queue))
+            except RedisError as e:
+                logger.warning(f"Could not read the depth of queue {queue}: {e}")
+
+        yield queue_depth
+
+
+def render_metrics(broker: Redis, queues: list[str]) -> bytes:
+    registry = CollectorRegistry()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry.register(ServicesCollector(os.environ["PROMETHEUS_MULTIPROC_DIR"]))
+    else:
+        registry.register(REGISTRY)
+    registry.register(QueueDepthCollector(broker, queues))
+
+    return generate_latest(registry)
@@ -1,5 +1,6 @@
+import functools
 from enum import Enum
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 import pydantic
 
@@ -9,7 +10,25 @@ class StrEnum(str, Enum):
         return name
 
 
+def memoized_property(method: Callable[[Any], Any]) -> property:
+    """
+    Property that is computed once per instance, for fingerprints of large inputs.
+    Only for BaseModelStrict, whose instances are immutable.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self):
+        if name not in self._memo:
+            self._memo[name] = method(self)
+        return self._memo[name]
+
+    return property(wrapper)
+
+
 class BaseModelStrict(pydantic.BaseModel):
+    _memo: dict = pydantic.PrivateAttr(default_factory=dict)
+
     @classmethod
     def get_properties(cls):
         return [
@@ -1,19 +1,68 @@
+import functools
 from pathlib import Path
 from typing import Optional
 
-from pydantic import Field
+from pydantic import Field, root_validator
 
-from noise_api.models.base import BaseModelStrict
-from noise_api.utils import hash_dict, load_json_file
+from noise_api.config import settings
+from noise_api.models.base import BaseModelStrict, memoized_property
+from noise_api.utils import hash_dict, hash_feature_collection, load_json_file
 
 JSONS_DIR = Path(__file__).parent / "jsons"
 BUILDINGS = JSONS_DIR / "buildings.json"
 ROADS = JSONS_DIR / "roads.json"
 
 
-class NoiseCalculationInput(BaseModelStrict):
+@functools.cache
+def example_input_dataset() -> dict:
+    # the example geometries are only loaded when the OpenAPI schema is generated
+    return {"buildings": load_json_file(BUILDINGS), "roads": load_json_file(ROADS)}
+
+
+# road properties that change the calculation result, all other properties are ignored for hashing
+ROAD_PROPERTIES = (
+    "road_type",
+    "max_speed",
+    "car_traffic_daily",
+    "truck_traffic_daily",
+    "train_speed",
+    "trains_per_hour",
+    "ground_type",
+    "has_anti_vibration",
+    "traffic_settings_adjustable",
+)
+
+
+class NoiseInputDataset(BaseModelStrict):
     buildings: dict
     roads: dict
+
+    @property
+    def hash(self) -> str:
+        # semantically identical inputs (feature order, irrelevant properties, ...) get the same hash
+        tolerance = settings.cache.coordinate_tolerance
+        return hash_dict(
+            {
+                "buildings": hash_feature_collection(self.buildings, (), tolerance),
+                "roads": hash_feature_collection(
+                    self.roads, ROAD_PROPERTIES, tolerance
+                ),
+            }
+        )
+
+    class Config:
+        @staticmethod
+        def schema_extra(schema: dict) -> None:
+            schema["example"] = example_input_dataset()
+
+
+class NoiseCalculationInput(BaseModelStrict):
+    input_id: Optional[str] = Field(
+        None,
+        description="OPTIONAL: ID of an input dataset registered before, replaces 'buildings' and 'roads'",
+    )
+    buildings: Optional[dict] = None
+    roads: Optional[dict] = None
     max_speed: Optional[int] = Field(
         None, ge=0, le=70, description="OPTIONAL: Maximum speed in km/h (0-70)"
     )
@@ -21,23 +70,50 @@ class NoiseCalculationInput(BaseModelStrict):
         None, ge=0, le=100, description="OPTIONAL: Traffic quota in percent (0-100)"
     )
 
+    @root_validator(skip_on_failure=True)
+    def check_input_dataset(cls, values):
+        has_geometries = values["buildings"] is not None or values["roads"] is not None
+
+        if values["input_id"] is not None and has_geometries:
+            raise ValueError(
+                "Provide either 'input_id' or 'buildings' and 'roads', not both"
+            )
+        if values["input_id"] is None and (
+            values["buildings"] is None or values["roads"] is None
+        ):
+            raise ValueError(
+                "Provide 'buildings' and 'roads' or the 'input_id' of a registered input dataset"
+            )
+
+        return values
+
     class Config:
-        schema_extra = {
-            "example": {
+        @staticmethod
+        def schema_extra(schema: dict) -> None:
+            schema["example"] = {
                 "max_speed": 42,
                 "traffic_quota": 40,
-                "buildings": load_json_file(BUILDINGS),
-                "roads": load_json_file(ROADS),
+                **example_input_dataset(),
             }
-        }
 
 
 class NoiseTask(NoiseCalculationInput):
-    @property
+    @classmethod
+    def from_input(cls, calculation_input: NoiseCalculationInput) -> "NoiseTask":
+        # the input is validated already, construct() avoids copying the geometries again
+        return cls.construct(
+            _fields_set=calculation_input.__fields_set__, **dict(calculation_input)
+        )
+
+    @memoized_property
     def hash(self) -> str:
-        return hash_dict({"buildings": self.buildings, "roads": self.roads})
+        if self.input_id is not None:
+            # registered input datasets are stored under their hash
+            return self.input_id
 
-    @property
+        return NoiseInputDataset(buildings=self.buildings, roads=self.roads).hash
+
+    @memoized_property
     def scenario_hash(self) -> str:
         return hash_dict(
             {
@@ -48,6 +124,22 @@ class NoiseTask(NoiseCalculationInput):
             }
         )
 
-    @property
+    @memoized_property
     def celery_key(self) -> str:
         return f"{self.hash}_{self.scenario_hash}"
+
+    def input_dataset(self) -> dict:
+        return {"buildings": self.buildings, "roads": self.roads}
+
+    def to_task_def(self) -> dict:
+        """
+        Task definition sent through the broker. Buildings and roads are passed by reference,
+        the worker loads them from the input store by input_id (see jobs.store_input_dataset).
+        """
+        task_def = {
+            name: value for name, value in self if name not in ("buildings", "roads")
+        }
+        task_def["input_id"] = self.hash
+        task_def.update({prop: getattr(self, prop) for prop in self.get_properties()})
+
+        return task_def
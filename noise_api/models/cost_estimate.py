@@ -0,0 +1,10 @@
+from noise_api.models.base import BaseModelStrict
+
+
+class CostEstimate(BaseModelStrict):
+    duration_seconds: float
+    memory_mb: float
+    # input features the estimate is based on, see noise_api.cost_model.FEATURES
+    features: dict[str, float]
+    # runs the model is calibrated with, rough defaults are used for few runs
+    recorded_runs: int
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class JobPriority(str, Enum):
+    # interactive jobs are routed to the interactive queue, unless their input is too large
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
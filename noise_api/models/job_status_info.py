@@ -7,3 +7,4 @@ class StatusInfo(Enum):
     PENDING = "running"
     SUCCESS = "successful"
     ACCEPTED = "accepted"
+    DISMISSED = "dismissed"
@@ -0,0 +1,99 @@
+import json
+
+import geopandas as gpd
+
+from noise_api.config import settings
+from noise_api.noise_analysis.exposure_statistics import (
+    NOISE_CLASSES,
+    lowest_class_above,
+)
+from noise_api.noise_analysis.geo_helpers import (
+    WGS84,
+    geojson_to_gdf,
+    metric_crs_for_extent,
+    reproject,
+)
+
+"""
+Compares the results of two calculations, e.g. a planning variant with its baseline.
+Both contour maps are intersected in one vectorized overlay, every part of the map gets the classes of both
+results and their difference (variant - base). Parts covered by one of the results only are left out of the map,
+but count in the area deltas per class.
+"""
+
+
+def _result_gdf(result_geojson: dict) -> gpd.GeoDataFrame:
+    if not result_geojson["features"]:
+        return gpd.GeoDataFrame({"value": []}, geometry=[], crs=f"EPSG:{WGS84}")
+
+    return geojson_to_gdf(result_geojson)[["value", "geometry"]]
+
+
+def _area_per_class(result_gdf: gpd.GeoDataFrame) -> gpd.pd.Series:
+    return gpd.pd.Series(0.0, index=NOISE_CLASSES).add(
+        result_gdf.geometry.area.groupby(result_gdf["value"]).sum(), fill_value=0
+    )
+
+
+def _overlay(
+    base_gdf: gpd.GeoDataFrame, variant_gdf: gpd.GeoDataFrame
+) -> gpd.GeoDataFrame:
+    if base_gdf.empty or variant_gdf.empty:
+        return gpd.GeoDataFrame(
+            {"base_value": [], "variant_value": [], "difference": []},
+            geometry=[],
+            crs=base_gdf.crs,
+        )
+
+    overlay_gdf = gpd.overlay(
+        base_gdf.rename(columns={"value": "base_value"}),
+        variant_gdf.rename(columns={"value": "variant_value"}),
+        how="intersection",
+        keep_geom_type=True,
+    )
+    overlay_gdf["difference"] = (
+        overlay_gdf["variant_value"] - overlay_gdf["base_value"]
+    ).astype(int)
+
+    return overlay_gdf
+
+
+def compare_results(base_geojson: dict, variant_geojson: dict) -> dict:
+    base_gdf = _result_gdf(base_geojson)
+    variant_gdf = _result_gdf(variant_geojson)
+    both_gdf = gpd.pd.concat([base_gdf, variant_gdf])
+    # any metric crs does for two empty results
+    bounds = both_gdf.total_bounds if len(both_gdf) else (0, 0, 0, 0)
+    metric_crs = metric_crs_for_extent(bounds)
+    base_gdf = reproject(base_gdf, metric_crs)
+    variant_gdf = reproject(variant_gdf, metric_crs)
+
+    overlay_gdf = _overlay(base_gdf, variant_gdf)
+    difference_areas = overlay_gdf.geometry.area.groupby(
+        overlay_gdf["difference"]
+    ).sum()
+
+    area_per_class_delta = _area_per_class(variant_gdf) - _area_per_class(base_gdf)
+    thresholds = {}
+    for level_db in settings.exposure_statistics.thresholds_db:
+        lowest_class = lowest_class_above(level_db)
+        louder_classes = NOISE_CLASSES[lowest_class:]
+        thresholds[str(level_db)] = {
+            "area_m2_delta": float(area_per_class_delta[louder_classes].sum())
+        }
+
+    return {
+        "geojson": json.loads(reproject(overlay_gdf, WGS84).to_json()),
+        "summary": {
+            "area_m2_louder": float(difference_areas[difference_areas.index > 0].sum()),
+            "area_m2_quieter": float(
+                difference_areas[difference_areas.index < 0].sum()
+            ),
+            "area_m2_unchanged": float(difference_areas.get(0, 0.0)),
+            "area_m2_per_class_delta": {
+                str(noise_class): float(area)
+                for noise_class, area in area_per_class_delta.items()
+            },
+            "thresholds": thresholds,
+        },
+    }
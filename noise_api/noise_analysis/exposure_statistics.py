@@ -0,0 +1,69 @@
+import math
+
+import geopandas as gpd
+from shapely.geometry import box
+
+from noise_api.config import settings
+
+"""
+Aggregates of a noise result that dashboards need without downloading the contours:
+the area per noise class, the number of buildings per noise class
+and the share of the study area (the extent of the buildings) above the configured levels.
+A building is counted in the loudest class touching its footprint.
+"""
+
+# "value" of the result contours, see "Results" in the README
+NOISE_CLASSES = range(8)
+
+
+def lowest_class_above(level_db: int) -> int:
+    # class 0 is below 45 dB(A), every further class spans 5 dB(A)
+    return min(max(math.ceil((level_db - 40) / 5), 0), NOISE_CLASSES[-1])
+
+
+def exposure_statistics(
+    result_gdf: gpd.GeoDataFrame, buildings_gdf: gpd.GeoDataFrame
+) -> dict:
+    # both in the metric crs of the calculation
+    study_area_m2 = box(*buildings_gdf.total_bounds).area
+
+    area_per_class = gpd.pd.Series(0.0, index=NOISE_CLASSES)
+    buildings_per_class = gpd.pd.Series(0, index=NOISE_CLASSES)
+    if len(result_gdf):
+        area_per_class = area_per_class.add(
+            result_gdf.geometry.area.groupby(result_gdf["value"]).sum(), fill_value=0
+        )
+        exposed_buildings = gpd.sjoin(
+            buildings_gdf[["geometry"]],
+            result_gdf[["value", "geometry"]],
+            predicate="intersects",
+        )
+        building_classes = exposed_buildings.groupby(level=0)["value"].max()
+        buildings_per_class = buildings_per_class.add(
+            building_classes.value_counts(), fill_value=0
+        )
+
+    thresholds = {}
+    for level_db in settings.exposure_statistics.thresholds_db:
+        lowest_class = lowest_class_above(level_db)
+        louder_classes = NOISE_CLASSES[lowest_class:]
+        thresholds[str(level_db)] = {
+            "area_share": float(area_per_class[louder_classes].sum()) / study_area_m2
+            if study_area_m2
+            else 0.0,
+            "buildings": int(buildings_per_class[louder_classes].sum()),
+        }
+
+    return {
+        "study_area_m2": study_area_m2,
+        "buildings": len(buildings_gdf),
+        "area_m2_per_class": {
+            str(noise_class): float(area)
+            for noise_class, area in area_per_class.items()
+        },
+        "buildings_per_class": {
+            str(noise_class): int(count)
+            for noise_class, count in buildings_per_class.items()
+        },
+        "thresholds": thresholds,
+    }
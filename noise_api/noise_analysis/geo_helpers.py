@@ -1,13 +1,68 @@
+import functools
+
 import geopandas as gpd
+import numpy as np
+import shapely
+from pyproj import Transformer
 from shapely import get_coordinates, wkb
 from shapely.geometry import LineString, MultiLineString, Polygon
 
+WGS84 = 4326
+# area of use of ETRS89 (EPSG:4258) as (min_lon, min_lat, max_lon, max_lat), UTM zones 28 to 38
+ETRS89_EXTENT = (-16.1, 32.88, 40.18, 84.73)
+
+
+def metric_crs_for_extent(bounds_wgs: tuple) -> int:
+    """
+    EPSG code of the UTM zone of the center of the given WGS84 bounds.
+    ETRS89 / UTM inside Europe, WGS84 / UTM elsewhere.
+    """
+    min_lon, min_lat, max_lon, max_lat = bounds_wgs
+    lon, lat = (min_lon + max_lon) / 2, (min_lat + max_lat) / 2
+    zone = min(int((lon + 180) // 6) + 1, 60)
+
+    min_europe_lon, min_europe_lat, max_europe_lon, max_europe_lat = ETRS89_EXTENT
+    if (
+        min_europe_lon <= lon <= max_europe_lon
+        and min_europe_lat <= lat <= max_europe_lat
+    ):
+        return 25800 + zone
+
+    return (32600 if lat >= 0 else 32700) + zone
+
+
+@functools.lru_cache(maxsize=None)
+def transformer(from_epsg: int, to_epsg: int) -> Transformer:
+    # creating a transformer is far more expensive than using it, they are shared by the whole process
+    return Transformer.from_crs(from_epsg, to_epsg, always_xy=True)
 
-def geojson_to_gdf_with_metric_crs(geojson_wgs: dict) -> gpd.GeoDataFrame:
+
+def reproject(gdf: gpd.GeoDataFrame, to_epsg: int) -> gpd.GeoDataFrame:
+    # transforms all coordinates at once, z values are dropped (see all_z_values_to_zero)
+    transform = transformer(gdf.crs.to_epsg(), to_epsg).transform
+
+    def _transform_xy(coordinates: np.ndarray) -> np.ndarray:
+        return np.column_stack(transform(coordinates[:, 0], coordinates[:, 1]))
+
+    geometries = shapely.transform(gdf.geometry.to_numpy(), _transform_xy)
+    return gdf.set_geometry(
+        gpd.GeoSeries(geometries, index=gdf.index, crs=f"EPSG:{to_epsg}")
+    )
+
+
+def geojson_to_gdf(geojson_wgs: dict) -> gpd.GeoDataFrame:
     gdf_wgs = gpd.GeoDataFrame.from_features(geojson_wgs)
-    gdf_wgs = gdf_wgs.set_crs("EPSG:4326", allow_override=True)
 
-    return gdf_wgs.to_crs("EPSG:25832")
+    return gdf_wgs.set_crs(f"EPSG:{WGS84}", allow_override=True)
+
+
+def geojson_to_gdf_with_metric_crs(
+    geojson_wgs: dict, metric_crs: int | None = None
+) -> gpd.GeoDataFrame:
+    gdf_wgs = geojson_to_gdf(geojson_wgs)
+    metric_crs = metric_crs or metric_crs_for_extent(gdf_wgs.total_bounds)
+
+    return reproject(gdf_wgs, metric_crs)
 
 
 def all_z_values_to_zero(gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
@@ -2,37 +2,80 @@ import json
 import logging
 import os
 import shlex
+import shutil
+import socket
 import subprocess
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
 
 import geopandas as gpd
 import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
 from shapely.geometry import box
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_fixed
 
+from noise_api.metrics import H2_BOOT_DURATION, STAGE_DURATION
 from noise_api.noise_analysis import queries
+from noise_api.noise_analysis.exposure_statistics import exposure_statistics
 from noise_api.noise_analysis.geo_helpers import (
+    WGS84,
     all_z_values_to_zero,
     geojson_to_gdf_with_metric_crs,
+    reproject,
 )
+from noise_api.noise_analysis.prefilter import prefilter_inputs
+from noise_api.noise_analysis.source_merging import merge_road_segments
 from noise_api.noise_analysis.sql_query_builder import (
-    get_buildings_geom_as_wkt,
+    INDIVIDUAL_BUILDINGS,
+    get_building_query,
     get_road_queries,
     get_traffic_queries,
     reset_all_roads,
+    select_building_ingest,
 )
 
 logger = logging.getLogger(__name__)
 
-DB_NAME = (os.path.abspath(".") + os.sep + "mydb").replace(os.sep, "/")
+H2_TERMINATE_TIMEOUT_SECONDS = 10
+
+# queries wait in Python instead of blocking in libpq, so signals (job dismissal, time limits)
+# interrupt long running NoiseModelling calls
+psycopg2.extensions.set_wait_callback(psycopg2.extras.wait_select)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
 
 
 class H2DatabaseContextManager:
+    """
+    Every context runs its own H2 database on a free port, in a directory of its own,
+    so several calculations can run side by side on one host (worker processes, synchronous executions).
+    """
+
+    def __init__(self, max_heap_mb: int | None = None):
+        self.max_heap_mb = max_heap_mb
+        self.peak_memory_mb = None
+        self.work_dir = None
+
     def __enter__(self):
+        start = time.perf_counter()
         self.h2_subprocess, self.psycopg2 = self.boot_h2_database_in_subprocess()
-        self.conn, self.psycopg2_cursor = self.initiate_database_connection(
-            self.psycopg2
-        )
+        try:
+            self.conn, self.psycopg2_cursor = self.initiate_database_connection(
+                self.psycopg2
+            )
+        except BaseException:
+            self.terminate_h2_subprocess()
+            raise
+
+        H2_BOOT_DURATION.observe(time.perf_counter() - start)
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -44,12 +87,16 @@ class H2DatabaseContextManager:
         retry=retry_if_exception_type(ImportError),
     )
     def boot_h2_database_in_subprocess(self):
+        java_options = f"-Xmx{self.max_heap_mb}m " if self.max_heap_mb else ""
+        self.port = free_port()
+        self.work_dir = tempfile.mkdtemp(prefix="noise-h2-")
         args = shlex.split(
-            'java -cp "bin/*:bundle/*:sys-bundle/*" org.h2.tools.Server -pg -trace'
+            f'java {java_options}-cp "bin/*:bundle/*:sys-bundle/*" org.h2.tools.Server '
+            f"-pg -pgPort {self.port} -trace"
         )
-        f = open("log.txt", "w+")
+        f = open(os.path.join(self.work_dir, "log.txt"), "w+")
         p = subprocess.Popen(args, cwd=ORBISGIS_DIR, stdout=f)
-        print("ProcessID H2-database ", p.pid)
+        logger.debug(f"Started H2 database, process {p.pid}")
 
         try:
             import psycopg2
@@ -69,14 +116,13 @@ class H2DatabaseContextManager:
     )
     def initiate_database_connection(self, psycopg2):
         # DB name has to be an absolute path
-        conn_string = (
-            f"host='localhost' port=5435 dbname='{DB_NAME}' user='sa' password='sa'"
-        )
-        print("Connecting to database\n ->%s" % (conn_string))
+        db_name = Path(self.work_dir, "mydb").as_posix()
+        conn_string = f"host='localhost' port={self.port} dbname='{db_name}' user='sa' password='sa'"
+        logger.debug(f"Connecting to H2 database {db_name}")
 
         conn = psycopg2.connect(conn_string)
         cursor = conn.cursor()
-        print("Connected!\n")
+        logger.debug("Connected to H2 database")
 
         cursor.execute(queries.H2GIS_SPATIAL)
 
@@ -92,15 +138,46 @@ class H2DatabaseContextManager:
         return conn, cursor
 
     def cleanup(self):
-        # Close connections to the database
-        print("Closing cursor")
-        self.psycopg2_cursor.close()
+        try:
+            # Close connections to the database
+            logger.debug("Closing cursor")
+            self.psycopg2_cursor.close()
+
+            logger.debug("Closing database connection")
+            self.conn.close()
+        except psycopg2.Error as e:
+            # e.g. the connection is still busy with a query that was interrupted
+            logger.warning(f"Could not close database connection: {e}")
+        finally:
+            self.peak_memory_mb = self.read_peak_memory_mb()
+            self.terminate_h2_subprocess()
+
+    def read_peak_memory_mb(self) -> float | None:
+        # peak resident memory of the JVM, only available on Linux
+        try:
+            with open(f"/proc/{self.h2_subprocess.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
 
-        print("Closing database connection")
-        self.conn.close()
+        return None
 
+    def terminate_h2_subprocess(self):
         # Terminate the database process as it constantly blocks memory
         self.h2_subprocess.terminate()
+        try:
+            self.h2_subprocess.wait(timeout=H2_TERMINATE_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            logger.warning(
+                f"H2 database process {self.h2_subprocess.pid} did not terminate, killing it"
+            )
+            self.h2_subprocess.kill()
+            self.h2_subprocess.wait()
+
+        if self.work_dir is not None:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
 
 
 def get_geojson_path(filename: str):
@@ -117,11 +194,15 @@ ORBISGIS_DIR = Path(__file__).parent / "orbisgis_java"
 
 
 def export_result_from_db_to_geojson(cursor):
-    geojson_path = get_geojson_path("result")
+    # a file of its own for every calculation, several may run at the same time
+    geojson_path = get_geojson_path(f"result-{uuid.uuid4().hex}")
     cursor.execute(f"CALL GeoJsonWrite('{geojson_path}', 'CONTOURING_NOISE_MAP');")
 
-    with open(geojson_path) as f:
-        return json.load(f)
+    try:
+        with open(geojson_path) as f:
+            return json.load(f)
+    finally:
+        os.remove(geojson_path)
 
 
 def get_settings():
@@ -138,53 +219,107 @@ def get_settings():
     }
 
 
-def calculate_noise_result(
-    cursor, buildings_geojson, roads_geojson, traffic_settings
-) -> dict:
-    # reproject input geojsons to local metric crs
-    # TODO: all coordinates for roads and buildings are currently set to z level 0
-    # TODO when upgrading to new noise version, that has proper 3D implementation- we should change this.
-    buildings_gdf = all_z_values_to_zero(
-        geojson_to_gdf_with_metric_crs(buildings_geojson)
+# stages of calculate_noise_result, in order
+STAGES = (
+    "reprojection",
+    "prefilter",
+    "z_normalization",
+    "source_merging",
+    "sql_building",
+    "ingest",
+    "emission",
+    "propagation",
+    "contouring",
+    "export",
+    "clip",
+    "statistics",
+)
+
+
+@contextmanager
+def timed_stage(stage: str, stage_timings: dict | None, on_stage=None):
+    if on_stage is not None:
+        on_stage(stage)
+
+    start = time.perf_counter()
+    yield
+    duration_seconds = time.perf_counter() - start
+
+    STAGE_DURATION.labels(stage=stage).observe(duration_seconds)
+    logger.info(
+        f"Stage {stage} took {duration_seconds:.2f}s",
+        extra={"stage": stage, "duration_seconds": duration_seconds},
     )
-    roads_gdf = all_z_values_to_zero(geojson_to_gdf_with_metric_crs(roads_geojson))
+    if stage_timings is not None:
+        stage_timings[stage] = duration_seconds
 
-    print("make buildings table ..")
 
-    cursor.execute(queries.RESET_BUILDINGS_TABLE)
-    cursor.execute(
-        queries.INSERT_BUILDING.substitute(
-            building=get_buildings_geom_as_wkt(buildings_gdf)
-        )
+def reproject_inputs(
+    buildings_geojson: dict, roads_geojson: dict
+) -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    # reproject input geojsons to the UTM zone of the buildings, they span the area of interest
+    buildings_gdf = geojson_to_gdf_with_metric_crs(buildings_geojson)
+    roads_gdf = geojson_to_gdf_with_metric_crs(
+        roads_geojson, metric_crs=buildings_gdf.crs.to_epsg()
     )
 
-    print("Make roads table (just geometries and road type)..")
+    return buildings_gdf, roads_gdf
+
+
+def build_queries(
+    buildings_gdf: gpd.GeoDataFrame,
+    roads_gdf: gpd.GeoDataFrame,
+    traffic_settings: dict,
+    building_ingest: str | None = None,
+) -> tuple[str, list[str], list[str]]:
+    building_ingest = building_ingest or select_building_ingest(len(buildings_gdf))
+    building_query = get_building_query(buildings_gdf, building_ingest)
+
     reset_all_roads()
+    # the traffic queries are built from the roads collected by get_road_queries
+    road_queries = get_road_queries(roads_gdf, traffic_settings)
+    traffic_queries = get_traffic_queries()
+
+    return building_query, road_queries, traffic_queries
+
+
+def ingest(cursor, building_query: str, road_queries: list, traffic_queries: list):
+    logger.debug("Making buildings table")
+    cursor.execute(queries.RESET_BUILDINGS_TABLE)
+    cursor.execute(building_query)
+
+    logger.debug("Making roads table (just geometries and road type)")
     cursor.execute(queries.RESET_ROADS_GEOM_TABLE)
-    roads_queries = get_road_queries(roads_gdf, traffic_settings)
-    for road in roads_queries:
+    for road in road_queries:
         cursor.execute("""{0}""".format(road))
 
-    print("Making traffic information table ...")
+    logger.debug("Making traffic information table")
     cursor.execute(queries.RESET_ROADS_TRAFFIC_TABLE)
-    traffic_queries = get_traffic_queries()
     for traffic_query in traffic_queries:
         cursor.execute("""{0}""".format(traffic_query))
 
-    print("Duplicating geometries to give sound level for each traffic direction ...")
+    logger.debug(
+        "Duplicating geometries to give sound level for each traffic direction"
+    )
     cursor.execute(queries.RESET_ROADS_DIR_TABLES)
 
-    print("Computing the sound level for each segment of roads ...")
+
+def compute_emission(cursor, spatial_index: bool = False):
+    logger.debug("Computing the sound level for each segment of roads")
 
     # compute the power of the noise source and add it to the table roads_src_global
     # for railroads (road_type = 99) use the function BTW_EvalSource (TW = Tramway)
     # for car roads use the function BR_EvalSource
     cursor.execute(queries.RESET_ROADS_GLOBAL_TABLE)
 
-    print("Applying frequency repartition of road noise level ...")
+    logger.debug("Applying frequency repartition of road noise level")
     cursor.execute(queries.RESET_ROADS_SRC_TABLE)
+    if spatial_index:
+        cursor.execute(queries.CREATE_ROADS_SRC_SPATIAL_INDEX)
+
 
-    print("Please wait, sound propagation from sources through buildings ...")
+def compute_propagation(cursor):
+    logger.debug("Propagating sound from sources through buildings")
 
     cursor.execute(
         """drop table if exists tri_lvl; create table tri_lvl as SELECT * from BR_TriGrid((select
@@ -198,38 +333,159 @@ def calculate_noise_result(
     # this leads to an invalid tri_lvl table , with all receiver values = 1 . replaced with old query above
     # cursor.execute(queries.RESET_TRI_LVL_TABLE)
 
-    print("Computation done !")
+    logger.debug("Propagation done")
+
 
-    print("Creating isocountour and save it as a geojson in the working folder..")
+def compute_contouring(cursor):
+    logger.debug("Creating isocontours")
     cursor.execute(queries.RESET_TRICONTOURING_MAP)
 
-    noise_result_geojson = export_result_from_db_to_geojson(cursor)
 
-    # clip to buildings extend
+def clip_to_buildings(
+    noise_result_geojson: dict, buildings_gdf: gpd.GeoDataFrame
+) -> gpd.GeoDataFrame:
+    # clip to buildings extend, the result is in the metric crs of the inputs
     result_gdf = gpd.GeoDataFrame.from_features(
-        noise_result_geojson["features"], crs="EPSG:4326"
+        noise_result_geojson["features"], crs=buildings_gdf.crs
     )
     # rename "idiso" column to "value"
     result_gdf = result_gdf.rename(columns={"idiso": "value"})
-    result_gdf_clip = gpd.clip(
-        result_gdf, box(*list(buildings_gdf.to_crs("EPSG:4326").total_bounds))
+
+    return gpd.clip(result_gdf, box(*list(buildings_gdf.total_bounds)))
+
+
+def prepare_queries(
+    buildings_geojson: dict,
+    roads_geojson: dict,
+    traffic_settings: dict,
+    stage_timings: dict | None = None,
+    on_stage=None,
+    building_ingest: str | None = None,
+) -> tuple[gpd.GeoDataFrame, str, tuple[str, list[str], list[str]]]:
+    """
+    The stages before the H2 database (see calculate_noise_result).
+    Returns the area of interest, the building ingest strategy and the queries to ingest the inputs.
+    """
+    with timed_stage("reprojection", stage_timings, on_stage):
+        buildings_gdf, roads_gdf = reproject_inputs(buildings_geojson, roads_geojson)
+
+    # the result is clipped to the extent of all buildings
+    area_of_interest_gdf = buildings_gdf
+    with timed_stage("prefilter", stage_timings, on_stage):
+        buildings_gdf, roads_gdf = prefilter_inputs(buildings_gdf, roads_gdf)
+
+    # TODO: all coordinates for roads and buildings are currently set to z level 0
+    # TODO when upgrading to new noise version, that has proper 3D implementation- we should change this.
+    with timed_stage("z_normalization", stage_timings, on_stage):
+        buildings_gdf = all_z_values_to_zero(buildings_gdf)
+        roads_gdf = all_z_values_to_zero(roads_gdf)
+
+    with timed_stage("source_merging", stage_timings, on_stage):
+        roads_gdf = merge_road_segments(roads_gdf)
+
+    building_ingest = building_ingest or select_building_ingest(len(buildings_gdf))
+    logger.info(
+        f"Ingesting {len(buildings_gdf)} buildings as {building_ingest}",
+        extra={"building_ingest": building_ingest},
     )
+    with timed_stage("sql_building", stage_timings, on_stage):
+        sql_queries = build_queries(
+            buildings_gdf, roads_gdf, traffic_settings, building_ingest
+        )
 
-    return json.loads(result_gdf_clip.to_json())
+    return area_of_interest_gdf, building_ingest, sql_queries
 
 
-def run_noise_calculation(task_def: dict):
-    with H2DatabaseContextManager() as h2_context:
+def calculate_noise_result(
+    cursor,
+    buildings_geojson,
+    roads_geojson,
+    traffic_settings,
+    stage_timings: dict | None = None,
+    on_stage=None,
+    building_ingest: str | None = None,
+    statistics: dict | None = None,
+) -> dict:
+    """
+    stage_timings, if given, is filled with the duration of each stage in seconds (see STAGES).
+    on_stage, if given, is called with the name of each stage when it starts.
+    building_ingest overrides the strategy selected by the number of buildings (see select_building_ingest).
+    statistics, if given, is filled with the exposure statistics of the result (see exposure_statistics).
+    """
+    area_of_interest_gdf, building_ingest, sql_queries = prepare_queries(
+        buildings_geojson,
+        roads_geojson,
+        traffic_settings,
+        stage_timings,
+        on_stage,
+        building_ingest,
+    )
+
+    with timed_stage("ingest", stage_timings, on_stage):
+        ingest(cursor, *sql_queries)
+
+    with timed_stage("emission", stage_timings, on_stage):
+        compute_emission(cursor, spatial_index=building_ingest == INDIVIDUAL_BUILDINGS)
+
+    with timed_stage("propagation", stage_timings, on_stage):
+        compute_propagation(cursor)
+
+    with timed_stage("contouring", stage_timings, on_stage):
+        compute_contouring(cursor)
+
+    with timed_stage("export", stage_timings, on_stage):
+        noise_result_geojson = export_result_from_db_to_geojson(cursor)
+
+    with timed_stage("clip", stage_timings, on_stage):
+        result_gdf = clip_to_buildings(noise_result_geojson, area_of_interest_gdf)
+        result_geojson = json.loads(reproject(result_gdf, WGS84).to_json())
+
+    if statistics is not None:
+        with timed_stage("statistics", stage_timings, on_stage):
+            statistics.update(exposure_statistics(result_gdf, area_of_interest_gdf))
+
+    return result_geojson
+
+
+def run_noise_calculation(
+    task_def: dict,
+    max_heap_mb: int | None = None,
+    run_stats: dict | None = None,
+    profiler=None,
+    on_stage=None,
+    statistics: dict | None = None,
+):
+    """
+    run_stats, if given, is filled with the peak memory of the H2 database
+    and the duration of each stage of the calculation.
+    profiler, if given (see noise_api.profiling.JobProfiler), records the duration of every SQL statement.
+    on_stage, if given, is called with the name of each stage when it starts.
+    statistics, if given, is filled with the exposure statistics of the result.
+    """
+    stage_timings = {}
+    h2_context = H2DatabaseContextManager(max_heap_mb)
+    with h2_context:
+        cursor = h2_context.psycopg2_cursor
+        if profiler is not None:
+            cursor = profiler.wrap_cursor(cursor)
+
         noise_result_geojson = calculate_noise_result(
-            h2_context.psycopg2_cursor,
+            cursor,
             task_def["buildings"],
             task_def["roads"],
             {
                 "max_speed": task_def.get("max_speed", None),
                 "traffic_quota": task_def.get("traffic_quota", None),
             },
+            stage_timings=stage_timings,
+            on_stage=on_stage,
+            statistics=statistics,
         )
 
+    if run_stats is not None:
+        run_stats["memory_mb"] = h2_context.peak_memory_mb
+        run_stats["stages"] = stage_timings
+
     # Try to make noise computation even faster
     # by adjustiong: https://github.com/Ifsttar/NoiseModelling/blob/master/noisemap-core/
     # src/main/java/org/orbisgis/noisemap/core/jdbc/JdbcNoiseMap.java#L30
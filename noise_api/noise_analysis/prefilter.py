@@ -0,0 +1,74 @@
+import logging
+
+import geopandas as gpd
+import numpy as np
+from shapely import box
+
+from noise_api.config import settings
+
+"""
+Drops geometries before the ingest that cannot change the result within the area of interest
+(the extent of the buildings, the result is clipped to it):
+- roads further than max_prop_distance from the area of interest, nothing they emit reaches it
+- buildings outside the calculation domain of the remaining roads, BR_TriGrid does not consider them
+  (the envelope of the sources expanded by max_prop_distance, see noisemap.compute_propagation)
+- optionally, roads with little traffic outside the area of interest (PREFILTER_MIN_OUTSIDE_DAILY_VEHICLES)
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def prefilter_inputs(
+    buildings_gdf: gpd.GeoDataFrame, roads_gdf: gpd.GeoDataFrame
+) -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    if not settings.prefilter.enabled or buildings_gdf.empty or roads_gdf.empty:
+        return buildings_gdf, roads_gdf
+
+    max_distance = settings.computation.max_prop_distance
+    area_of_interest = box(*buildings_gdf.total_bounds)
+    roads = roads_gdf.geometry.values
+
+    inside = roads.intersects(area_of_interest)
+    keep_roads = inside | (roads.distance(area_of_interest) <= max_distance)
+    if min_daily_vehicles := settings.prefilter.min_outside_daily_vehicles:
+        keep_roads &= inside | (daily_vehicles(roads_gdf) >= min_daily_vehicles)
+    filtered_roads_gdf = roads_gdf[keep_roads]
+
+    if filtered_roads_gdf.empty:
+        filtered_buildings_gdf = buildings_gdf.iloc[:0]
+    else:
+        # buildings within the domain shape the triangulation, even if no road is close to them
+        min_x, min_y, max_x, max_y = filtered_roads_gdf.total_bounds
+        domain = box(
+            min_x - max_distance,
+            min_y - max_distance,
+            max_x + max_distance,
+            max_y + max_distance,
+        )
+        filtered_buildings_gdf = buildings_gdf[
+            buildings_gdf.geometry.values.intersects(domain)
+        ]
+
+    logger.info(
+        f"Prefilter kept {len(filtered_buildings_gdf)} of {len(buildings_gdf)} buildings"
+        f" and {len(filtered_roads_gdf)} of {len(roads_gdf)} roads",
+        extra={
+            "buildings_dropped": len(buildings_gdf) - len(filtered_buildings_gdf),
+            "roads_dropped": len(roads_gdf) - len(filtered_roads_gdf),
+        },
+    )
+
+    return filtered_buildings_gdf, filtered_roads_gdf
+
+
+def daily_vehicles(roads_gdf: gpd.GeoDataFrame) -> np.ndarray:
+    vehicles = np.zeros(len(roads_gdf))
+    for column in ("car_traffic_daily", "truck_traffic_daily"):
+        if column in roads_gdf:
+            vehicles += roads_gdf[column].fillna(0).to_numpy(dtype=float)
+
+    # railroads are not rated by road traffic, they are always kept
+    if "road_type" in roads_gdf:
+        vehicles[(roads_gdf["road_type"] == "railroad").to_numpy()] = np.inf
+
+    return vehicles
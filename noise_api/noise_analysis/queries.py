@@ -35,6 +35,20 @@ INSERT_BUILDING = Template(
 """
 )
 
+INSERT_BUILDINGS = Template(
+    """
+    INSERT INTO buildings (the_geom) VALUES $buildings;
+"""
+)
+
+CREATE_BUILDINGS_SPATIAL_INDEX = """
+    CREATE SPATIAL INDEX ON buildings(the_geom);
+"""
+
+CREATE_ROADS_SRC_SPATIAL_INDEX = """
+    CREATE SPATIAL INDEX ON roads_src(the_geom);
+"""
+
 RESET_BUILDINGS_TABLE = """
     DROP TABLE IF EXISTS buildings;
     CREATE TABLE buildings (the_geom GEOMETRY);
@@ -140,6 +154,7 @@ RESET_ROADS_DIR_TABLES = """
 """
 
 
+# the contours stay in the metric CRS of the inputs, they are reprojected by clip_to_buildings
 RESET_TRICONTOURING_MAP = """
     DROP TABLE IF EXISTS tricontouring_noise_map;
     CREATE TABLE tricontouring_noise_map
@@ -174,15 +189,13 @@ RESET_TRICONTOURING_MAP = """
     DROP TABLE IF EXISTS contouring_noise_map;
     CREATE TABLE contouring_noise_map AS
         SELECT
-            ST_Transform(ST_SETSRID(the_geom, {0}), {1}),
+            the_geom,
             idiso,
             CELL_ID
         FROM
             ST_Explode('multipolygon_iso');
     DROP TABLE multipolygon_iso;
-""".format(
-    25832, 4326
-)
+"""
 
 RESET_ROADS_GLOBAL_TABLE = """
     DROP TABLE IF EXISTS roads_src_global;
@@ -0,0 +1,130 @@
+import logging
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from noise_api.config import settings
+from noise_api.models.calculation_input import ROAD_PROPERTIES
+
+"""
+Merges contiguous road segments with equal acoustic properties (road type, speed, traffic, ...)
+into longer sources. Emission is computed per meter of road, so merged sources emit the same,
+but emission and propagation process fewer rows.
+Segments are contiguous if their ends meet within SOURCE_MERGING_TOLERANCE_METERS,
+they are not merged across junctions of three or more segments.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def merge_road_segments(roads_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    if not settings.source_merging.enabled or len(roads_gdf) < 2:
+        return roads_gdf
+
+    tolerance = settings.source_merging.tolerance_meters
+    properties = [name for name in ROAD_PROPERTIES if name in roads_gdf]
+    # missing values (e.g. train properties of roads) are equal to each other
+    keys = roads_gdf[properties].astype(str)
+
+    merged_rows = []
+    for positions in keys.groupby(properties, sort=False).indices.values():
+        group = roads_gdf.iloc[positions]
+        if len(group) == 1:
+            merged_rows.append(group)
+            continue
+
+        segments, segment_rows = shapely.get_parts(
+            group.geometry.values, return_index=True
+        )
+        if tolerance:
+            segments = snap_endpoints(segments, tolerance)
+        # line_merge drops parts without length, they are kept as they are
+        degenerate = shapely.length(segments) == 0
+        merged_lines = np.concatenate(
+            [
+                shapely.get_parts(
+                    shapely.line_merge(shapely.multilinestrings(segments[~degenerate]))
+                ),
+                segments[degenerate],
+            ]
+        )
+        if len(merged_lines) >= len(group):
+            # nothing contiguous, keep the segments as they were submitted
+            merged_rows.append(group)
+            continue
+
+        # merged sources keep the properties of the group and distinct ids of their own segments
+        merged_properties = group.iloc[
+            source_rows(merged_lines, segments, segment_rows)
+        ].drop(columns="geometry")
+        merged_rows.append(
+            gpd.GeoDataFrame(
+                merged_properties, geometry=merged_lines, crs=roads_gdf.crs
+            )
+        )
+
+    merged_roads_gdf = gpd.GeoDataFrame(
+        gpd.pd.concat(merged_rows, ignore_index=True), crs=roads_gdf.crs
+    )
+    logger.info(
+        f"Merged {len(roads_gdf)} road segments into {len(merged_roads_gdf)} sources",
+        extra={"roads_merged": len(roads_gdf) - len(merged_roads_gdf)},
+    )
+
+    return merged_roads_gdf
+
+
+def source_rows(
+    merged_lines: np.ndarray, segments: np.ndarray, segment_rows: np.ndarray
+) -> list[int]:
+    # the first row with a segment in the merged line that no earlier line took,
+    # a row split over several lines leaves the later ones any other row
+    segment_indices, line_indices = STRtree(merged_lines).query(
+        segments, predicate="covered_by"
+    )
+    rows = []
+    for line in range(len(merged_lines)):
+        candidates = np.unique(segment_rows[segment_indices[line_indices == line]])
+        rows.append(
+            next(
+                (row for row in candidates if row not in rows),
+                next(row for row in np.unique(segment_rows) if row not in rows),
+            )
+        )
+
+    return rows
+
+
+def snap_endpoints(segments: np.ndarray, tolerance: float) -> np.ndarray:
+    # ends within tolerance of each other move onto the first of them, so line_merge connects them
+    include_z = bool(shapely.has_z(segments).any())
+    coordinates = shapely.get_coordinates(segments, include_z=include_z)
+    coordinate_counts = shapely.get_num_coordinates(segments)
+    last_positions = np.cumsum(coordinate_counts) - 1
+    first_positions = last_positions - coordinate_counts + 1
+    end_positions = np.concatenate([first_positions, last_positions])
+
+    ends = shapely.points(coordinates[end_positions, :2])
+    targets = np.arange(len(ends))
+    neighbours = STRtree(ends).query(ends, predicate="dwithin", distance=tolerance)
+    # the two ends of a segment shorter than the tolerance stay apart
+    end_segments = np.tile(np.arange(len(segments)), 2)
+    neighbours = neighbours[
+        :, end_segments[neighbours[0]] != end_segments[neighbours[1]]
+    ]
+    for end, neighbour in neighbours[:, np.lexsort(neighbours[::-1])].T:
+        if end < neighbour and targets[end] == end and targets[neighbour] == neighbour:
+            targets[neighbour] = end
+
+    coordinates[end_positions] = coordinates[end_positions[targets]]
+    snapped_segments = shapely.linestrings(
+        coordinates, indices=np.repeat(np.arange(len(segments)), coordinate_counts)
+    )
+
+    # both ends may still snap onto the same end of another segment
+    collapsed = shapely.length(snapped_segments) == 0
+    snapped_segments[collapsed] = segments[collapsed]
+
+    return snapped_segments
@@ -1,12 +1,17 @@
 import json
+import logging
 import os
 
 import geopandas as gpd
 import numpy
 from geomet import wkt
 
+from noise_api.config import settings
+from noise_api.noise_analysis import queries
 from noise_api.noise_analysis.road_info import RoadInfo
 
+logger = logging.getLogger(__name__)
+
 cwd = os.path.dirname(os.path.abspath(__file__))
 
 # road_type_ids from IffStar NoiseModdeling
@@ -111,7 +116,7 @@ def get_road_queries(roads_gdf, traffic_settings):
             # beginning point of the road
             start_point = coordinates[0]
             # end point of the road
-            end_point = coordinates[1]
+            end_point = coordinates[-1]
             # build string containing all coordinates
 
         geom = wkt.dumps(feature["geometry"], decimals=0)
@@ -208,6 +213,23 @@ def get_traffic_queries():
     return sql_insert_strings_noisy_roads
 
 
+MULTIPOLYGON_BUILDINGS = "multipolygon"
+INDIVIDUAL_BUILDINGS = "individual"
+BUILDINGS_PER_INSERT = 500
+
+
+def select_building_ingest(building_count: int) -> str:
+    strategy = settings.building_ingest.strategy
+    if strategy != "auto":
+        return strategy
+
+    # a single multipolygon is faster for districts, the spatial index pays off for larger areas
+    if building_count >= settings.building_ingest.individual_min_buildings:
+        return INDIVIDUAL_BUILDINGS
+
+    return MULTIPOLYGON_BUILDINGS
+
+
 # returns a wkt string for a multipolygon containing all buildings
 def get_buildings_geom_as_wkt(buildings_gdf: gpd.GeoDataFrame) -> str:
     # simplify complex geometries to speed up calculation and avoid hickups with spatial db.
@@ -217,6 +239,28 @@ def get_buildings_geom_as_wkt(buildings_gdf: gpd.GeoDataFrame) -> str:
     return f"'{buildings_gdf.geometry.unary_union}'"
 
 
+def get_building_query(buildings_gdf: gpd.GeoDataFrame, strategy: str) -> str:
+    if strategy == MULTIPOLYGON_BUILDINGS:
+        return queries.INSERT_BUILDING.substitute(
+            building=get_buildings_geom_as_wkt(buildings_gdf)
+        )
+
+    buildings_gdf.geometry = buildings_gdf.geometry.simplify(0.1)
+    values = [
+        f"(ST_GeomFromText('{geometry.wkt}'))"
+        for geometry in buildings_gdf.geometry
+        if geometry is not None and not geometry.is_empty
+    ]
+    inserts = []
+    for start in range(0, len(values), BUILDINGS_PER_INSERT):
+        end = start + BUILDINGS_PER_INSERT
+        inserts.append(
+            queries.INSERT_BUILDINGS.substitute(buildings=", ".join(values[start:end]))
+        )
+
+    return "".join(inserts) + queries.CREATE_BUILDINGS_SPATIAL_INDEX
+
+
 # create nodes for all roads - nodes are connection points of roads
 def create_nodes(all_roads):
     nodes = []
@@ -241,7 +285,7 @@ def get_node_for_point(point, nodes):
     for node_id, node in dict_of_nodes.items():
         if point == node:
             return node_id
-    print("could not find node for point", point)
+    logger.error("Could not find node for point %s", point)
     exit()
 
 
@@ -251,7 +295,12 @@ def get_road_type(road_properties):
         if road_properties["road_type"] == output_road_type:
             return road_types_iffstar_noise_modelling[output_road_type]
 
-    print("no matching noise road_type_found for", road_properties["road_type"])
+    # logged once per road
+    logger.warning(
+        "No matching noise road type found for %s",
+        road_properties["road_type"],
+        extra={"rate_limit": True},
+    )
     return 0
 
 
@@ -0,0 +1,110 @@
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from noise_api.config import settings
+
+"""
+Opt-in profiling of single jobs (execution requests with ?profile=true, see PROFILING_ENABLED).
+The Python side is sampled by a thread that records the stack of the calculation every few milliseconds,
+the H2 side is measured per SQL statement sent to the database.
+"""
+
+
+class JobProfiler:
+    def __init__(self):
+        self._interval = settings.profiling.sample_interval_seconds
+        self._thread_id = threading.get_ident()
+        self._stacks = Counter()
+        self._statements = []
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self):
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stopped.set()
+        self._sampler.join()
+
+    def wrap_cursor(self, cursor) -> "TimingCursor":
+        return TimingCursor(cursor, self._statements)
+
+    def result(self) -> dict:
+        statement_totals = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+        for statement, duration_seconds in self._statements:
+            totals = statement_totals[_statement_kind(statement)]
+            totals["count"] += 1
+            totals["seconds"] += duration_seconds
+
+        slowest_statements = sorted(self._statements, key=lambda s: s[1], reverse=True)
+        max_statements = settings.profiling.max_statements
+
+        return {
+            "python": {
+                "sample_interval_seconds": self._interval,
+                "samples": sum(self._stacks.values()),
+                # collapsed stacks (root;...;leaf), as used by flame graph tools
+                "stacks": dict(self._stacks.most_common(settings.profiling.max_stacks)),
+            },
+            "h2": {
+                "statements": len(self._statements),
+                "seconds": sum(
+                    duration_seconds for _, duration_seconds in self._statements
+                ),
+                "by_kind": dict(statement_totals),
+                "slowest": [
+                    {"statement": statement[:1000], "seconds": duration_seconds}
+                    for statement, duration_seconds in slowest_statements[
+                        :max_statements
+                    ]
+                ],
+            },
+        }
+
+    def _sample(self):
+        while not self._stopped.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._stacks[_collapse_stack(frame)] += 1
+
+
+class TimingCursor:
+    """Records the duration of every statement executed by the wrapped psycopg2 cursor."""
+
+    def __init__(self, cursor, statements: list):
+        self._cursor = cursor
+        self._statements = statements
+
+    def execute(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(query, *args, **kwargs)
+        finally:
+            self._statements.append((str(query).strip(), time.perf_counter() - start))
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _collapse_stack(frame) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(
+            f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})"
+        )
+        frame = frame.f_back
+
+    return ";".join(reversed(frames))
+
+
+def _statement_kind(statement: str) -> str:
+    # e.g. "INSERT INTO roads_traffic", "CALL GeoJsonWrite"
+    words = statement.replace("(", " ").split()
+    if words and words[0].upper() in ("INSERT", "DROP", "CREATE") and len(words) > 2:
+        return " ".join(words[:3])
+
+    return " ".join(words[:2])
@@ -0,0 +1,18 @@
+from noise_api.config import settings
+from noise_api.models.job_priority import JobPriority
+
+"""
+Routing of calculations to Celery queues, each queue is consumed by its own workers.
+Small interactive calculations go to the interactive queue, so they never wait behind
+city scale calculations. Everything else goes to the default queue.
+"""
+
+
+def select_queue(priority: JobPriority, input_size: int) -> str:
+    if (
+        priority == JobPriority.INTERACTIVE
+        and input_size <= settings.routing.interactive_max_input_bytes
+    ):
+        return settings.routing.interactive_queue
+
+    return settings.broker.task_default_queue
@@ -1,8 +1,27 @@
+import contextlib
+import gzip
+import signal
+import time
+
+import orjson
 from celery import signals
 from celery.utils.log import get_task_logger
 
-from noise_api.dependencies import cache, celery_app
-from noise_api.noise_analysis.noisemap import run_noise_calculation
+from noise_api import admission, cost_model, job_events, jobs
+from noise_api.config import settings
+from noise_api.dependencies import (
+    cache,
+    celery_app,
+    events_redis,
+    input_store,
+    job_store,
+    local_input_cache,
+)
+from noise_api.logs import setup_logging
+from noise_api.metrics import JOB_DURATION, JOBS_FINISHED, mark_process_dead
+from noise_api.models.job_status_info import StatusInfo
+from noise_api.noise_analysis.noisemap import STAGES, run_noise_calculation
+from noise_api.profiling import JobProfiler
 
 # from noise_api.models.calculation_input import NoiseTask
 
@@ -10,29 +29,160 @@ from noise_api.noise_analysis.noisemap import run_noise_calculation
 logger = get_task_logger(__name__)
 
 
-@celery_app.task()
-def compute_task(task_def: dict) -> dict:
-    return run_noise_calculation(task_def)
+@signals.setup_logging.connect
+def setup_worker_logging(**kwargs):
+    # connecting to this signal keeps Celery from configuring logging itself
+    setup_logging()
 
 
-@celery_app.task()
-def find_result_in_cache(celery_key: str) -> dict | None:
-    # Returns result dict or None
-    return cache.get(key=celery_key)
+@signals.worker_process_init.connect
+def install_termination_handler(**kwargs):
+    # revoke(terminate=True) sends SIGTERM to the worker process running the job.
+    # Exiting through SystemExit runs the cleanup of the H2 database context, so the JVM does not outlive the job.
+    signal.signal(signal.SIGTERM, exit_on_termination)
 
 
-@signals.task_postrun.connect
-def task_postrun_handler(task_id, task, *args, **kwargs):
+def exit_on_termination(signum, frame):
+    raise SystemExit(f"Terminated by signal {signum}")
 
-    if "find_result_in_cache" in task.name:
-        # do not cache again
-        return
 
+@signals.worker_process_shutdown.connect
+def mark_worker_process_dead(pid, **kwargs):
+    # live gauges of the process are removed from its metrics
+    mark_process_dead(pid)
+
+
+def revoke_job(job_id: str) -> None:
+    # queued jobs are skipped by the workers, running ones are terminated
+    celery_app.control.revoke(job_id, terminate=True, signal="SIGTERM")
+    # the job is reported as dismissed right away, even if no worker received it yet
+    celery_app.backend.mark_as_revoked(job_id, reason="dismissed")
+
+
+@celery_app.task(bind=True)
+def compute_task(self, task_def: dict) -> dict:
+    if input_id := task_def.get("input_id"):
+        task_def = {**task_def, **load_input_dataset(input_id)}
+
+    features = cost_model.extract_features(task_def["buildings"], task_def["roads"])
+    estimate = cost_model.estimate(job_store, features)
+    job_id = self.request.id
+    queue = self.request.delivery_info and self.request.delivery_info.get("routing_key")
+    if not admission.admit(job_store, job_id, estimate, queue):
+        logger.info(
+            f"Job {job_id} does not fit into the budget of this worker, retrying later"
+        )
+        raise self.retry(
+            countdown=settings.admission.retry_countdown_seconds, max_retries=None
+        )
+
+    profiler = JobProfiler() if task_def.get("profile") else None
+    try:
+        run_stats = {}
+        statistics = {}
+        start = time.monotonic()
+        with profiler or contextlib.nullcontext():
+            result = run_noise_calculation(
+                task_def,
+                max_heap_mb=admission.heap_size_mb(estimate, queue),
+                run_stats=run_stats,
+                profiler=profiler,
+                on_stage=lambda stage: publish_stage(job_id, stage),
+                statistics=statistics,
+            )
+        duration_seconds = time.monotonic() - start
+    finally:
+        admission.release(job_store, job_id)
+        # failed and timed out jobs keep their profile, it shows where they spent their time
+        if profiler is not None:
+            jobs.store_profile(job_store, job_id, profiler.result())
+
+    if statistics:
+        # stored before the result, the statistics are there once the job succeeded
+        jobs.store_statistics(cache, task_def["celery_key"], statistics)
+
+    JOB_DURATION.labels(queue=queue or "unknown").observe(duration_seconds)
+    logger.info(
+        f"Job {job_id} took {duration_seconds:.1f}s, estimated {estimate.duration_seconds:.1f}s",
+        extra={
+            "job_id": job_id,
+            "duration_seconds": duration_seconds,
+            "estimated_duration_seconds": estimate.duration_seconds,
+            "memory_mb": run_stats.get("memory_mb"),
+            "stages": run_stats.get("stages"),
+        },
+    )
+    cost_model.record_run(
+        job_store, features, duration_seconds, run_stats.get("memory_mb")
+    )
+
+    return result
+
+
+def publish_stage(job_id: str, stage: str) -> None:
+    job_events.publish(
+        events_redis,
+        job_id,
+        StatusInfo.PENDING,
+        stage=stage,
+        progress=round(STAGES.index(stage) / len(STAGES), 2),
+    )
+
+
+def load_input_dataset(input_id: str) -> dict:
+    # scenarios of the same input dataset usually follow each other, keep it in the worker process
+    if (input_dataset := local_input_cache.get(input_id)) is not None:
+        return input_dataset
+
+    compressed_input_dataset = input_store.get_compressed(key=input_id)
+    if compressed_input_dataset is None:
+        raise ValueError(f"Input dataset {input_id} is not registered (anymore)")
+
+    serialized_input_dataset = gzip.decompress(compressed_input_dataset)
+    input_dataset = orjson.loads(serialized_input_dataset)
+    local_input_cache.put(input_id, input_dataset, size=len(serialized_input_dataset))
+
+    return input_dataset
+
+
+def unpin_input_dataset(job_id: str, task_def: dict) -> None:
+    if input_id := task_def.get("input_id"):
+        jobs.unpin_input_dataset(input_store, input_id, job_id)
+
+
+@signals.task_revoked.connect
+def task_revoked_handler(request, *args, **kwargs):
+    # dismissed jobs that never ran have no postrun
+    if request.args:
+        unpin_input_dataset(request.id, request.args[0])
+
+
+@signals.task_postrun.connect
+def task_postrun_handler(task_id, task, *args, **kwargs):
     state = kwargs.get("state")
     args = kwargs.get("args")[0]
     result = kwargs.get("retval")
 
+    if state == "RETRY":
+        # the job waits for admission, it still holds the calculation
+        return
+
+    JOBS_FINISHED.labels(state=state).inc()
+    unpin_input_dataset(task_id, args)
+    key = args["celery_key"]
+    # requests attached to a synchronous calculation follow the job that took over
+    job_ids = [task_id, jobs.cached_job_id(key)]
     if state == "SUCCESS":
-        key = args["celery_key"]
-        cache.put(key=key, value=result)
+        # store the complete results document, so the API can serve it as it is
+        cache.put(key=key, value={"result": result})
         logger.info(f"Saved result with key {key} to cache.")
+        for job_id in job_ids:
+            job_events.publish(events_redis, job_id, StatusInfo.SUCCESS)
+    elif state == "FAILURE":
+        for job_id in job_ids:
+            job_events.publish(
+                events_redis, job_id, StatusInfo.FAILURE, message=str(result)
+            )
+
+    # identical requests are answered from the cache (or start a new job) from now on
+    jobs.release_calculation(job_store, key, task_id)
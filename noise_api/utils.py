@@ -2,6 +2,9 @@ import hashlib
 import json
 import logging
 from enum import Enum
+from numbers import Number
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +14,82 @@ def hash_dict(dict_) -> str:
     return hashlib.md5(dict_str.encode()).hexdigest()
 
 
+def hash_feature_collection(
+    feature_collection: dict, properties: tuple[str, ...], coordinate_tolerance: float
+) -> str:
+    """
+    Hash of a geojson FeatureCollection that only considers the given properties
+    and the 2D coordinates snapped to coordinate_tolerance. Independent of feature order,
+    number formatting (50 vs 50.0) and any other property.
+    """
+    canonical_features = sorted(
+        json.dumps(
+            {
+                "geometry": _canonical_geometry(
+                    feature.get("geometry"), coordinate_tolerance
+                ),
+                # null properties count as no properties
+                "properties": {
+                    name: _canonical_value((feature.get("properties") or {}).get(name))
+                    for name in properties
+                },
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        for feature in feature_collection.get("features", [])
+    )
+    features_str = "\n".join([str(coordinate_tolerance), *canonical_features])
+
+    return hashlib.md5(features_str.encode()).hexdigest()
+
+
+def _canonical_geometry(geometry: dict | None, tolerance: float) -> dict | None:
+    # features may have no geometry | RFC 7946 3.2
+    if geometry is None:
+        return None
+
+    if geometry["type"] == "GeometryCollection":
+        return {
+            "type": geometry["type"],
+            "geometries": [
+                _canonical_geometry(part, tolerance)
+                for part in geometry.get("geometries", [])
+            ],
+        }
+
+    return {
+        "type": geometry["type"],
+        "coordinates": _quantize_coordinates(
+            geometry.get("coordinates", []), tolerance
+        ),
+    }
+
+
+def _quantize_coordinates(coordinates: list, tolerance: float) -> list:
+    if not coordinates:
+        # empty geometries
+        return []
+
+    if isinstance(coordinates[0], Number):
+        # a single position
+        return [round(coordinates[0] / tolerance), round(coordinates[1] / tolerance)]
+
+    if isinstance(coordinates[0][0], Number):
+        # a list of positions, drop z values as they are not used for the calculation
+        positions = np.array([position[:2] for position in coordinates], dtype=float)
+        return np.rint(positions / tolerance).astype(np.int64).tolist()
+
+    return [_quantize_coordinates(part, tolerance) for part in coordinates]
+
+
+def _canonical_value(value):
+    if isinstance(value, Number) and not isinstance(value, bool):
+        return float(value)
+
+    return value
+
+
 def enum_to_list(enum_class: Enum) -> list[str]:
     return [member.value for member in enum_class]
 
@@ -1,7 +1,12 @@
+from functools import partial
+
+import fakeredis
 import pytest
 from fastapi.testclient import TestClient
 
 from noise_api.api.main import app
+from noise_api.cache import Cache, LocalCache
+from noise_api.config import settings
 
 
 @pytest.fixture
@@ -19,10 +24,120 @@ class MockCache:
     def put(self, *args, **kwargs):
         ...
 
+    def exists(self, *args, **kwargs):
+        ...
+
+    def touch(self, *args, **kwargs):
+        ...
+
+    def entry_size(self, *args, **kwargs):
+        ...
+
+    def subscribe_invalidations(self, *args, **kwargs):
+        ...
+
+    def claim(self, *args, owner, **kwargs):
+        return owner
+
+    def owner(self, *args, **kwargs):
+        ...
+
+    def release(self, *args, **kwargs):
+        ...
+
     def delete(self, *args, **kwargs):
         ...
 
+    def pin(self, *args, **kwargs):
+        ...
+
+    def unpin(self, *args, **kwargs):
+        ...
+
 
 @pytest.fixture(autouse=True)
 def mock_cache(monkeypatch):
     monkeypatch.setattr("noise_api.api.endpoints.cache", MockCache())
+    monkeypatch.setattr("noise_api.api.endpoints.input_store", MockCache())
+    monkeypatch.setattr("noise_api.api.endpoints.job_store", MockCache())
+    monkeypatch.setattr(
+        "noise_api.api.endpoints.local_cache",
+        LocalCache(
+            max_bytes=settings.local_cache.max_bytes,
+            max_age_seconds=settings.local_cache.max_age_seconds,
+        ),
+    )
+
+
+@pytest.fixture
+def fake_redis_server(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        "noise_api.cache.redis.Redis", partial(fakeredis.FakeRedis, server=server)
+    )
+    yield server
+
+
+@pytest.fixture
+def fake_cache(monkeypatch, fake_redis_server):
+    cache = Cache(
+        connection_config=settings.cache.connection,
+        key_prefix=settings.cache.key_prefix,
+        ttl_days=settings.cache.ttl_days,
+        max_bytes=settings.cache.max_bytes,
+        eviction_policy=settings.cache.eviction_policy,
+    )
+    monkeypatch.setattr("noise_api.api.endpoints.cache", cache)
+    monkeypatch.setattr("noise_api.tasks.cache", cache)
+    yield cache
+
+
+@pytest.fixture
+def fake_input_store(monkeypatch, fake_redis_server):
+    input_store = Cache(
+        connection_config=settings.cache.connection,
+        key_prefix=settings.cache.inputs_key_prefix,
+        ttl_days=settings.cache.inputs_ttl_days,
+        max_bytes=settings.cache.inputs_max_bytes,
+    )
+    monkeypatch.setattr("noise_api.api.endpoints.input_store", input_store)
+    monkeypatch.setattr("noise_api.tasks.input_store", input_store)
+    monkeypatch.setattr(
+        "noise_api.tasks.local_input_cache",
+        LocalCache(
+            max_bytes=settings.local_cache.inputs_max_bytes,
+            max_age_seconds=settings.local_cache.max_age_seconds,
+        ),
+    )
+    yield input_store
+
+
+@pytest.fixture
+def fake_job_store(monkeypatch, fake_redis_server):
+    job_store = Cache(
+        connection_config=settings.cache.connection,
+        key_prefix=settings.cache.jobs_key_prefix,
+        ttl_days=settings.cache.ttl_days,
+    )
+    monkeypatch.setattr("noise_api.api.endpoints.job_store", job_store)
+    monkeypatch.setattr("noise_api.tasks.job_store", job_store)
+    yield job_store
+
+
+class ComputeTaskSpy:
+    def __init__(self):
+        self.task_ids = []
+        self.task_defs = []
+        self.queues = []
+
+    def apply_async(self, args, task_id, queue, **kwargs):
+        self.task_ids.append(task_id)
+        self.task_defs.append(args[0])
+        self.queues.append(queue)
+
+
+@pytest.fixture
+def compute_task_spy(monkeypatch):
+    spy = ComputeTaskSpy()
+    monkeypatch.setattr("noise_api.tasks.compute_task.apply_async", spy.apply_async)
+    yield spy
@@ -0,0 +1,159 @@
+import time
+
+import pytest
+
+from noise_api.cache import Cache
+from noise_api.config import settings
+
+# compressed size of the values below is roughly proportional to their length
+SMALL_VALUE = {"values": list(range(100))}
+LARGE_VALUE = {"values": list(range(10000))}
+UNLIMITED_BYTES = 1024**3
+
+
+def make_cache(max_bytes: int, eviction_policy: str) -> Cache:
+    return Cache(
+        connection_config=settings.cache.connection,
+        key_prefix="test_cache",
+        ttl_days=1,
+        max_bytes=max_bytes,
+        eviction_policy=eviction_policy,
+    )
+
+
+def compressed_size(value: dict) -> int:
+    cache = make_cache(max_bytes=UNLIMITED_BYTES, eviction_policy="lru")
+    cache.put(key="size", value=value)
+    size = cache.entry_size(key="size")
+    cache.delete(key="size")
+
+    return size
+
+
+def test_hits_and_misses_are_counted(fake_redis_server):
+    cache = make_cache(max_bytes=UNLIMITED_BYTES, eviction_policy="lru")
+    cache.put(key="a", value=SMALL_VALUE)
+
+    assert cache.get(key="a") == SMALL_VALUE
+    assert cache.exists(key="a")
+    assert cache.get(key="b") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+    assert stats["bytes"] == cache.entry_size(key="a")
+
+
+def test_overwriting_entry_keeps_size_accurate(fake_redis_server):
+    cache = make_cache(max_bytes=UNLIMITED_BYTES, eviction_policy="lru")
+    cache.put(key="a", value=LARGE_VALUE)
+    cache.put(key="a", value=SMALL_VALUE)
+
+    assert cache.stats()["bytes"] == compressed_size(SMALL_VALUE)
+
+
+def test_lru_evicts_least_recently_used(fake_redis_server):
+    budget = 2 * compressed_size(SMALL_VALUE) + 1
+    cache = make_cache(max_bytes=budget, eviction_policy="lru")
+    cache.put(key="a", value=SMALL_VALUE)
+    cache.put(key="b", value=SMALL_VALUE)
+    cache.get(key="a")
+    cache.put(key="c", value=SMALL_VALUE)
+
+    assert cache.exists(key="a")
+    assert not cache.exists(key="b")
+    assert cache.exists(key="c")
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= budget
+
+
+@pytest.mark.parametrize("hits", [0, 3])
+def test_lfu_evicts_large_one_off_entries_first(fake_redis_server, hits):
+    budget = compressed_size(LARGE_VALUE) + compressed_size(SMALL_VALUE) + 1
+    cache = make_cache(max_bytes=budget, eviction_policy="lfu")
+    cache.put(key="hot", value=SMALL_VALUE)
+    cache.put(key="large", value=LARGE_VALUE)
+    for _ in range(hits):
+        cache.get(key="hot")
+    cache.put(key="new", value=SMALL_VALUE)
+
+    assert not cache.exists(key="large")
+    assert cache.exists(key="hot")
+    assert cache.exists(key="new")
+
+
+def test_expired_entries_are_not_counted_as_evicted(fake_redis_server):
+    cache = make_cache(
+        max_bytes=compressed_size(SMALL_VALUE) + 1, eviction_policy="lru"
+    )
+    cache.put(key="a", value=SMALL_VALUE)
+    cache._redis.delete(cache._make_key("a"))  # expired
+    cache.put(key="b", value=SMALL_VALUE)
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"]) == (1, 0)
+
+
+def test_entries_expired_by_ttl_leave_the_bookkeeping(fake_redis_server):
+    budget = 2 * compressed_size(SMALL_VALUE) + 1
+    cache = make_cache(max_bytes=budget, eviction_policy="lfu")
+    cache.put(key="hot", value=SMALL_VALUE)
+    for _ in range(3):
+        cache.get(key="hot")
+    cache.put(key="cold", value=SMALL_VALUE)
+    # the TTL of "hot" runs out
+    cache._redis.delete(cache._make_key("hot"))
+    cache._redis.zadd(cache._expiries_key, {"hot": time.time() - 1})
+
+    # "hot" makes room, not the live entry with fewer accesses
+    cache.put(key="new", value=SMALL_VALUE)
+
+    stats = cache.stats()
+    assert cache.exists(key="cold")
+    assert (stats["entries"], stats["evictions"]) == (2, 0)
+    assert stats["bytes"] == 2 * compressed_size(SMALL_VALUE)
+
+
+def test_pinned_entries_are_not_evicted(fake_redis_server):
+    budget = 2 * compressed_size(SMALL_VALUE) + 1
+    cache = make_cache(max_bytes=budget, eviction_policy="lru")
+    cache.put(key="a", value=SMALL_VALUE)
+    cache.put(key="b", value=SMALL_VALUE)
+    cache.pin(key="a", owner="job", ttl_seconds=60)
+    cache.put(key="c", value=SMALL_VALUE)
+
+    # "a" is the least recently used entry, "b" makes room
+    assert not cache.exists(key="b")
+    assert cache.stats()["evictions"] == 1
+
+    cache.unpin(key="a", owner="job")
+    cache.put(key="d", value=SMALL_VALUE)
+
+    assert cache.exists(key="c")
+    assert cache.exists(key="d")
+    assert cache.stats()["evictions"] == 2
+
+
+def test_unbudgeted_cache_keeps_no_bookkeeping(fake_redis_server):
+    cache = make_cache(max_bytes=0, eviction_policy="lru")
+    cache.put(key="a", value=SMALL_VALUE)
+    cache.put(key="a", value=SMALL_VALUE)
+    cache.get(key="a")
+
+    assert cache.entry_size(key="a") == compressed_size(SMALL_VALUE)
+    assert cache.stats()["entries"] == 0
+    assert cache._redis.keys("test_cache:__*") == [b"test_cache:__stats"]
+    cache.delete(key="a")
+    assert cache.entry_size(key="a") is None
+
+
+def test_cache_stats_endpoint(
+    unauthorized_api_test_client, fake_cache, fake_input_store
+):
+    fake_cache.put(key="a", value=SMALL_VALUE)
+
+    with unauthorized_api_test_client as client:
+        response = client.get("/noise/cache/stats")
+
+    assert response.status_code == 200
+    assert response.json()["results"]["entries"] == 1
+    assert response.json()["inputs"]["entries"] == 0
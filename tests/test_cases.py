@@ -1,5 +1,4 @@
 import json
-import time
 from pathlib import Path
 
 import geopandas
@@ -8,22 +7,18 @@ import pytest
 TEST_CASES_DIR = Path(__file__).parent / "test_cases"
 
 
-def wait_for_job_completion(client, endpoint, total_timeout=300):
-    start_time = time.time()
-    status = "PENDING"
+def wait_for_job_completion(client, job_id, total_timeout=300) -> str:
+    # the event stream ends with the final status of the job
+    status = None
+    with client.stream(
+        "GET", f"/noise/jobs/{job_id}/events", timeout=total_timeout
+    ) as response:
+        for line in response.iter_lines():
+            if line.startswith("data: "):
+                status = json.loads(line.removeprefix("data: "))["status"]
+                print(f"Job status: {status}")
 
-    while status == "PENDING":
-        time.sleep(5)
-
-        if time.time() - start_time > total_timeout:
-            raise Exception(
-                f"Timeout reached. Job status still PENDING after {total_timeout} seconds."
-            )
-
-        response = client.get(endpoint)
-        if response.status_code == 200:
-            status = response.json().get("status")
-            print(f"Job status: {status}")
+    return status
 
 
 def load_test_cases(directory: Path) -> list[dict]:
@@ -47,13 +42,10 @@ def test_noise_calculation(unauthorized_api_test_client, test_case):
             "/noise/processes/traffic-noise/execution", json=test_case["request"]
         )
         assert response.status_code == 201
-        job_id = response.json()["job_id"]
+        job_id = response.json()["jobID"]
         print(job_id)
 
-        status_endpoint = f"/noise/jobs/{job_id}/status"
-        wait_for_job_completion(client, status_endpoint)
-        response = client.get(status_endpoint)
-        assert response.json()["status"] == "SUCCESS"
+        assert wait_for_job_completion(client, job_id) == "successful"
 
         response = client.get(f"/noise/jobs/{job_id}/results")
         result = response.json()["result"]["geojson"]
@@ -0,0 +1,114 @@
+import json
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import box
+
+from noise_api import jobs
+from noise_api.noise_analysis.comparison import compare_results
+from noise_api.noise_analysis.geo_helpers import WGS84, reproject
+
+JOB_ID = "5c0b4bd0-4d7e-4a4d-9d4e-5bd5b0a8f111"
+CELERY_KEY = "buildingsandroadshash_varianthash"
+BASE_CELERY_KEY = "buildingsandroadshash_basehash"
+
+# Hamburg, 100 m x 100 m
+X, Y = 566000, 5931000
+
+
+def result_geojson(values: list[int], widths: list[int]) -> dict:
+    # bands of the given widths from west to east
+    boxes = []
+    x = X
+    for width in widths:
+        boxes.append(box(x, Y, x + width, Y + 100))
+        x += width
+
+    result_gdf = gpd.GeoDataFrame({"value": values}, geometry=boxes, crs="EPSG:25832")
+    return json.loads(reproject(result_gdf, WGS84).to_json())
+
+
+BASE_RESULT = result_geojson([2, 3], [50, 50])
+VARIANT_RESULT = result_geojson([2, 4], [70, 30])
+
+
+def test_comparison_of_two_results():
+    comparison = compare_results(BASE_RESULT, VARIANT_RESULT)
+
+    differences = {
+        feature["properties"]["difference"]
+        for feature in comparison["geojson"]["features"]
+    }
+    summary = comparison["summary"]
+    assert differences == {-1, 0, 1}
+    assert summary["area_m2_louder"] == pytest.approx(3000, rel=1e-3)
+    assert summary["area_m2_quieter"] == pytest.approx(2000, rel=1e-3)
+    assert summary["area_m2_unchanged"] == pytest.approx(5000, rel=1e-3)
+    assert summary["area_m2_per_class_delta"]["3"] == pytest.approx(-5000, rel=1e-3)
+    assert summary["area_m2_per_class_delta"]["4"] == pytest.approx(3000, rel=1e-3)
+    assert summary["thresholds"]["55"]["area_m2_delta"] == pytest.approx(
+        -2000, rel=1e-3
+    )
+
+
+def test_comparison_with_an_empty_result():
+    comparison = compare_results(BASE_RESULT, {"features": []})
+
+    assert comparison["geojson"]["features"] == []
+    assert comparison["summary"]["area_m2_unchanged"] == 0
+    assert comparison["summary"]["area_m2_per_class_delta"]["2"] == pytest.approx(
+        -5000, rel=1e-3
+    )
+
+
+def test_comparison_is_computed_once_per_pair(
+    unauthorized_api_test_client, fake_cache, fake_job_store
+):
+    fake_cache.put(key=BASE_CELERY_KEY, value={"result": {"geojson": BASE_RESULT}})
+    fake_cache.put(key=CELERY_KEY, value={"result": {"geojson": VARIANT_RESULT}})
+    jobs.remember_celery_key(fake_job_store, JOB_ID, CELERY_KEY)
+
+    with unauthorized_api_test_client as client:
+        # job IDs and celery keys both identify a result
+        response = client.get(
+            f"/noise/jobs/{JOB_ID}/comparison", params={"base": BASE_CELERY_KEY}
+        )
+        cached_response = client.get(
+            f"/noise/jobs/{CELERY_KEY}/comparison", params={"base": BASE_CELERY_KEY}
+        )
+        missing_response = client.get(
+            f"/noise/jobs/{JOB_ID}/comparison", params={"base": "unknown-job"}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == jobs.comparison_etag(BASE_CELERY_KEY, CELERY_KEY)
+    assert jobs.get_compressed_comparison(fake_cache, BASE_CELERY_KEY, CELERY_KEY)
+    assert cached_response.json() == response.json()
+    assert cached_response.headers["etag"] == response.headers["etag"]
+    assert missing_response.status_code == 404
+
+
+@pytest.mark.parametrize(
+    "base",
+    [
+        f"statistics:{BASE_CELERY_KEY}",
+        f"comparisons:{BASE_CELERY_KEY}:{CELERY_KEY}",
+        f"cached-statistics:{BASE_CELERY_KEY}",
+        "__stats",
+    ],
+)
+def test_comparison_with_other_cache_entries_is_not_found(
+    unauthorized_api_test_client, fake_cache, base
+):
+    fake_cache.put(key=BASE_CELERY_KEY, value={"result": {"geojson": BASE_RESULT}})
+    fake_cache.put(key=CELERY_KEY, value={"result": {"geojson": VARIANT_RESULT}})
+    jobs.store_statistics(fake_cache, BASE_CELERY_KEY, {"study_area_m2": 10000.0})
+    with unauthorized_api_test_client as client:
+        client.get(
+            f"/noise/jobs/{CELERY_KEY}/comparison", params={"base": BASE_CELERY_KEY}
+        )
+        response = client.get(
+            f"/noise/jobs/{CELERY_KEY}/comparison", params={"base": base}
+        )
+
+    assert response.status_code == 404
@@ -0,0 +1,134 @@
+import copy
+
+import pytest
+
+from noise_api import admission, cost_model
+from noise_api.config import settings
+from noise_api.models.cost_estimate import CostEstimate
+from tests.test_input_datasets import INPUT_DATASET
+
+INTERACTIVE_QUEUE = settings.routing.interactive_queue
+BATCH_QUEUE = settings.broker.task_default_queue
+
+
+def test_extract_features():
+    features = cost_model.extract_features(
+        INPUT_DATASET["buildings"], INPUT_DATASET["roads"]
+    )
+
+    assert features["roads"] == len(INPUT_DATASET["roads"]["features"])
+    assert features["building_vertices"] > len(INPUT_DATASET["buildings"]["features"])
+    assert 0 < features["envelope_km2"] < 10
+
+
+def test_extract_features_skips_missing_and_collects_nested_geometries():
+    buildings = copy.deepcopy(INPUT_DATASET["buildings"])
+    polygon = buildings["features"][0]["geometry"]
+    buildings["features"][0]["geometry"] = None
+    buildings["features"][1]["geometry"] = {
+        "type": "GeometryCollection",
+        "geometries": [polygon, {"type": "Polygon", "coordinates": []}],
+    }
+
+    features = cost_model.extract_features(buildings, INPUT_DATASET["roads"])
+
+    assert features["building_vertices"] > len(polygon["coordinates"][0])
+    assert 0 < features["envelope_km2"] < 10
+
+
+def test_estimate_is_calibrated_with_recorded_runs(fake_job_store):
+    features = {"roads": 100.0, "building_vertices": 1000.0, "envelope_km2": 1.0}
+    default_estimate = cost_model.estimate(fake_job_store, features)
+
+    for i in range(settings.cost_model.min_recorded_runs):
+        run_features = {
+            "roads": i * 10.0,
+            "building_vertices": i * i * 50.0,
+            "envelope_km2": i % 3,
+        }
+        duration_seconds = (
+            10 + 0.5 * run_features["roads"] + 0.01 * run_features["building_vertices"]
+        )
+        cost_model.record_run(
+            fake_job_store, run_features, duration_seconds, memory_mb=None
+        )
+
+    estimate = cost_model.estimate(fake_job_store, features)
+
+    assert default_estimate.recorded_runs == 0
+    assert estimate.recorded_runs == settings.cost_model.min_recorded_runs
+    assert estimate.duration_seconds == pytest.approx(10 + 50 + 10)
+    # memory was not recorded, the default coefficients remain
+    assert estimate.memory_mb == default_estimate.memory_mb
+
+
+def test_estimate_endpoint(unauthorized_api_test_client, fake_job_store):
+    with unauthorized_api_test_client as client:
+        response = client.post(
+            "/noise/processes/traffic-noise/estimate", json=INPUT_DATASET
+        )
+
+    assert response.status_code == 200
+    assert response.json()["duration_seconds"] > 0
+    assert response.json()["features"]["roads"] == len(
+        INPUT_DATASET["roads"]["features"]
+    )
+
+
+def estimate_with_memory(memory_mb: float) -> CostEstimate:
+    return CostEstimate(
+        duration_seconds=60, memory_mb=memory_mb, features={}, recorded_runs=0
+    )
+
+
+def test_admission_within_memory_budget(fake_job_store, monkeypatch):
+    monkeypatch.setattr(settings.admission, "cpu_budget", 4)
+    monkeypatch.setattr(settings.admission, "memory_budget_mb", 4000)
+    large_job = estimate_with_memory(2000)  # 3000 MB heap
+
+    assert admission.admit(fake_job_store, "first", large_job, INTERACTIVE_QUEUE)
+    assert not admission.admit(fake_job_store, "second", large_job, INTERACTIVE_QUEUE)
+
+    admission.release(fake_job_store, "first")
+    assert admission.admit(fake_job_store, "second", large_job, INTERACTIVE_QUEUE)
+
+
+def test_job_above_budget_runs_alone(fake_job_store, monkeypatch):
+    monkeypatch.setattr(settings.admission, "memory_budget_mb", 1000)
+
+    assert admission.admit(
+        fake_job_store, "huge", estimate_with_memory(5000), INTERACTIVE_QUEUE
+    )
+    assert not admission.admit(
+        fake_job_store, "small", estimate_with_memory(100), INTERACTIVE_QUEUE
+    )
+
+
+def test_batch_jobs_leave_room_for_interactive_jobs(fake_job_store, monkeypatch):
+    monkeypatch.setattr(settings.admission, "cpu_budget", 4)
+    monkeypatch.setattr(settings.admission, "memory_budget_mb", 8192)
+    monkeypatch.setattr(settings.admission, "max_heap_mb", 8192)
+    monkeypatch.setattr(settings.admission, "interactive_cpus", 1)
+    monkeypatch.setattr(settings.admission, "interactive_memory_mb", 2048)
+    city_scale_job = estimate_with_memory(10**6)
+
+    assert admission.heap_size_mb(city_scale_job, BATCH_QUEUE) == 8192 - 2048
+    assert admission.admit(fake_job_store, "batch", city_scale_job, BATCH_QUEUE)
+    # the batch queue has no room left, the interactive queue has
+    assert not admission.admit(
+        fake_job_store, "other batch", estimate_with_memory(100), BATCH_QUEUE
+    )
+    assert admission.admit(
+        fake_job_store, "interactive", estimate_with_memory(1000), INTERACTIVE_QUEUE
+    )
+
+
+def test_heap_size_is_bounded():
+    assert (
+        admission.heap_size_mb(estimate_with_memory(10), INTERACTIVE_QUEUE)
+        == settings.admission.min_heap_mb
+    )
+    assert (
+        admission.heap_size_mb(estimate_with_memory(10**6), INTERACTIVE_QUEUE)
+        == settings.admission.max_heap_mb
+    )
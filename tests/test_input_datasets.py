@@ -0,0 +1,141 @@
+import uuid
+
+import pytest
+
+import noise_api.tasks as tasks
+from noise_api import jobs
+from noise_api.models.calculation_input import NoiseTask
+from noise_api.utils import load_json_file
+from tests.test_cases import TEST_CASES_DIR
+
+INPUT_DATASET = {
+    key: value
+    for key, value in load_json_file(
+        TEST_CASES_DIR / "test_no_global_traffic_settings.json"
+    )["request"].items()
+    if key in ("buildings", "roads")
+}
+
+
+def register(client) -> str:
+    response = client.post("/noise/processes/traffic-noise/inputs", json=INPUT_DATASET)
+    assert response.status_code == 201
+
+    return response.json()["input_id"]
+
+
+def test_input_id_matches_task_hash(
+    unauthorized_api_test_client, fake_cache, fake_input_store
+):
+    with unauthorized_api_test_client as client:
+        input_id = register(client)
+
+    assert input_id == NoiseTask(**INPUT_DATASET).hash
+    assert fake_input_store.get(key=input_id) == INPUT_DATASET
+
+
+def test_scenario_by_reference_shares_cache_with_inline_request(
+    unauthorized_api_test_client, fake_cache, fake_input_store
+):
+    scenario = {"max_speed": 30, "traffic_quota": 50}
+    celery_key = NoiseTask(**INPUT_DATASET, **scenario).celery_key
+    fake_cache.put(key=celery_key, value={"result": {"geojson": {}}})
+
+    with unauthorized_api_test_client as client:
+        input_id = register(client)
+        response = client.post(
+            "/noise/processes/traffic-noise/execution",
+            json={"input_id": input_id, **scenario},
+        )
+
+    assert response.json()["jobID"] == jobs.cached_job_id(celery_key)
+
+
+def test_unknown_input_dataset(
+    unauthorized_api_test_client, fake_cache, fake_input_store, fake_job_store
+):
+    with unauthorized_api_test_client as client:
+        response = client.post(
+            "/noise/processes/traffic-noise/execution", json={"input_id": "unknown"}
+        )
+
+    assert response.status_code == 404
+
+
+def test_input_dataset_is_pinned_until_the_job_ends(
+    unauthorized_api_test_client,
+    fake_cache,
+    fake_input_store,
+    fake_job_store,
+    monkeypatch,
+):
+    monkeypatch.setattr(
+        "noise_api.tasks.compute_task.apply_async", lambda **kwargs: None
+    )
+
+    with unauthorized_api_test_client as client:
+        input_id = register(client)
+        job_id = client.post(
+            "/noise/processes/traffic-noise/execution", json={"input_id": input_id}
+        ).json()["jobID"]
+
+    assert fake_input_store._is_pinned(input_id)
+
+    tasks.task_postrun_handler(
+        job_id,
+        tasks.compute_task,
+        state="FAILURE",
+        args=[{"input_id": input_id, "celery_key": "key"}],
+        retval=ValueError("failed"),
+    )
+
+    assert not fake_input_store._is_pinned(input_id)
+
+
+@pytest.mark.parametrize(
+    "request_body",
+    [{"input_id": "abc", **INPUT_DATASET}, {"buildings": INPUT_DATASET["buildings"]}],
+)
+def test_input_dataset_is_required_once(unauthorized_api_test_client, request_body):
+    with unauthorized_api_test_client as client:
+        response = client.post(
+            "/noise/processes/traffic-noise/execution", json=request_body
+        )
+
+    assert response.status_code == 422
+
+
+def run_compute_task(task_def: dict) -> dict:
+    tasks.compute_task.push_request(id=str(uuid.uuid4()))
+    try:
+        return tasks.compute_task.run(task_def)
+    finally:
+        tasks.compute_task.pop_request()
+
+
+def test_worker_resolves_input_dataset(fake_input_store, fake_job_store, monkeypatch):
+    input_id = NoiseTask(**INPUT_DATASET).hash
+    fake_input_store.put(key=input_id, value=INPUT_DATASET)
+    monkeypatch.setattr(
+        "noise_api.tasks.run_noise_calculation", lambda task_def, **kwargs: task_def
+    )
+
+    task_def = run_compute_task({"input_id": input_id, "max_speed": 30})
+
+    assert task_def["buildings"] == INPUT_DATASET["buildings"]
+    assert task_def["roads"] == INPUT_DATASET["roads"]
+    assert task_def["max_speed"] == 30
+
+
+def test_worker_keeps_input_dataset(fake_input_store, fake_job_store, monkeypatch):
+    input_id = NoiseTask(**INPUT_DATASET).hash
+    fake_input_store.put(key=input_id, value=INPUT_DATASET)
+    monkeypatch.setattr(
+        "noise_api.tasks.run_noise_calculation", lambda task_def, **kwargs: task_def
+    )
+
+    run_compute_task({"input_id": input_id})
+    fake_input_store.delete(key=input_id)
+    task_def = run_compute_task({"input_id": input_id, "max_speed": 30})
+
+    assert task_def["buildings"] == INPUT_DATASET["buildings"]
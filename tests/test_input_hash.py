@@ -0,0 +1,92 @@
+import copy
+
+import pytest
+
+from noise_api.models.calculation_input import NoiseInputDataset
+from tests.test_input_datasets import INPUT_DATASET
+
+
+def input_hash(input_dataset: dict) -> str:
+    return NoiseInputDataset(**input_dataset).hash
+
+
+@pytest.fixture
+def input_dataset():
+    return copy.deepcopy(INPUT_DATASET)
+
+
+def test_feature_order_is_ignored(input_dataset):
+    input_dataset["roads"]["features"].reverse()
+    input_dataset["buildings"]["features"].reverse()
+
+    assert input_hash(input_dataset) == input_hash(INPUT_DATASET)
+
+
+def test_irrelevant_properties_are_ignored(input_dataset):
+    for feature in input_dataset["roads"]["features"]:
+        feature["properties"]["id"] = "re-exported"
+        feature["properties"]["name"] = "Some street"
+    for feature in input_dataset["buildings"]["features"]:
+        feature["properties"] = {}
+        feature["id"] = "re-exported"
+
+    assert input_hash(input_dataset) == input_hash(INPUT_DATASET)
+
+
+def test_number_and_coordinate_formatting_is_ignored(input_dataset):
+    road = input_dataset["roads"]["features"][0]
+    road["properties"]["car_traffic_daily"] = float(
+        road["properties"]["car_traffic_daily"]
+    )
+    road["geometry"]["coordinates"] = [
+        [x + 1e-9, y - 1e-9, 12.5] for x, y, *_ in road["geometry"]["coordinates"]
+    ]
+
+    assert input_hash(input_dataset) == input_hash(INPUT_DATASET)
+
+
+def test_relevant_changes_change_the_hash(input_dataset):
+    road = input_dataset["roads"]["features"][0]
+    road["properties"]["car_traffic_daily"] += 1
+    traffic_changed = input_hash(input_dataset)
+
+    road["properties"]["car_traffic_daily"] -= 1
+    x, y, *_ = road["geometry"]["coordinates"][0]
+    road["geometry"]["coordinates"][0] = [x + 1e-5, y]
+    geometry_changed = input_hash(input_dataset)
+
+    assert traffic_changed != input_hash(INPUT_DATASET)
+    assert geometry_changed != input_hash(INPUT_DATASET)
+
+
+def null_geometry(input_dataset: dict) -> None:
+    input_dataset["buildings"]["features"][0]["geometry"] = None
+
+
+def geometry_collection(input_dataset: dict) -> None:
+    building = input_dataset["buildings"]["features"][0]
+    building["geometry"] = {
+        "type": "GeometryCollection",
+        "geometries": [building["geometry"]],
+    }
+
+
+def null_properties(input_dataset: dict) -> None:
+    input_dataset["roads"]["features"][0]["properties"] = None
+
+
+@pytest.mark.parametrize(
+    "make_valid_geojson", [null_geometry, geometry_collection, null_properties]
+)
+def test_valid_geojson_is_hashed(
+    input_dataset, make_valid_geojson, unauthorized_api_test_client, compute_task_spy
+):
+    make_valid_geojson(input_dataset)
+
+    with unauthorized_api_test_client as client:
+        response = client.post(
+            "/noise/processes/traffic-noise/execution", json=input_dataset
+        )
+
+    assert response.status_code == 201
+    assert input_hash(input_dataset) != input_hash(INPUT_DATASET)
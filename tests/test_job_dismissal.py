@@ -0,0 +1,71 @@
+import subprocess
+import sys
+
+import psycopg2
+
+from noise_api.noise_analysis import noisemap
+from tests.test_job_submission import submit
+
+
+class RevokeSpy:
+    def __init__(self):
+        self.job_ids = []
+
+    def revoke_job(self, job_id):
+        self.job_ids.append(job_id)
+
+
+def test_dismiss_running_job(
+    unauthorized_api_test_client,
+    fake_cache,
+    fake_input_store,
+    fake_job_store,
+    compute_task_spy,
+    monkeypatch,
+):
+    revoke_spy = RevokeSpy()
+    monkeypatch.setattr("noise_api.tasks.revoke_job", revoke_spy.revoke_job)
+
+    with unauthorized_api_test_client as client:
+        job_id = submit(client)["jobID"]
+        response = client.delete(f"/noise/jobs/{job_id}")
+        resubmitted_job_id = submit(client)["jobID"]
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "dismissed"
+    assert revoke_spy.job_ids == [job_id]
+    # the calculation is released, identical requests start a new job
+    assert resubmitted_job_id != job_id
+
+
+def test_dismiss_unknown_job(unauthorized_api_test_client, fake_cache, fake_job_store):
+    with unauthorized_api_test_client as client:
+        unknown_job_response = client.delete("/noise/jobs/unknown")
+        cached_job_response = client.delete("/noise/jobs/cached-abc_def")
+
+    assert unknown_job_response.status_code == 404
+    assert cached_job_response.status_code == 409
+
+
+class FailingCursor:
+    def close(self):
+        raise psycopg2.InterfaceError("connection is busy")
+
+
+def test_h2_process_is_killed_if_it_ignores_termination(monkeypatch):
+    monkeypatch.setattr(noisemap, "H2_TERMINATE_TIMEOUT_SECONDS", 0.5)
+    h2_context = noisemap.H2DatabaseContextManager()
+    h2_context.psycopg2_cursor = FailingCursor()
+    h2_context.h2_subprocess = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); print(flush=True); time.sleep(60)",
+        ],
+        stdout=subprocess.PIPE,
+    )
+    h2_context.h2_subprocess.stdout.readline()  # SIGTERM is ignored from now on
+
+    h2_context.cleanup()
+
+    assert h2_context.h2_subprocess.returncode is not None
@@ -0,0 +1,128 @@
+import threading
+
+import fakeredis
+import fakeredis.aioredis
+import orjson
+import pytest
+
+from noise_api import job_events, jobs, tasks
+from noise_api.models.job_status_info import StatusInfo
+
+JOB_ID = "5c0b4bd0-4d7e-4a4d-9d4e-5bd5b0a8f111"
+
+
+class PendingResult:
+    state = "PENDING"
+
+    def __init__(self, *args, **kwargs):
+        ...
+
+
+@pytest.fixture
+def fake_events_redis(monkeypatch, fake_redis_server):
+    monkeypatch.setattr(
+        "noise_api.api.endpoints.events_redis_async",
+        fakeredis.aioredis.FakeRedis(server=fake_redis_server),
+    )
+    yield fakeredis.FakeRedis(server=fake_redis_server)
+
+
+def read_events(response) -> list[dict]:
+    return [
+        orjson.loads(line.removeprefix("data: "))
+        for line in response.iter_lines()
+        if line.startswith("data: ")
+    ]
+
+
+def test_events_of_running_job(
+    unauthorized_api_test_client, fake_events_redis, fake_job_store, monkeypatch
+):
+    monkeypatch.setattr("noise_api.api.endpoints.AsyncResult", PendingResult)
+    jobs.remember_celery_key(
+        fake_job_store, JOB_ID, "buildingsandroadshash_scenariohash"
+    )
+
+    def run_job():
+        job_events.publish(
+            fake_events_redis, JOB_ID, StatusInfo.PENDING, stage="ingest", progress=0.33
+        )
+        job_events.publish(fake_events_redis, JOB_ID, StatusInfo.SUCCESS)
+
+    threading.Timer(0.3, run_job).start()
+    with unauthorized_api_test_client as client:
+        with client.stream("GET", f"/noise/jobs/{JOB_ID}/events") as response:
+            events = read_events(response)
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert [event["status"] for event in events] == ["running", "running", "successful"]
+    assert events[1]["stage"] == "ingest"
+
+
+@pytest.mark.parametrize(
+    "state, status", [("STARTED", "running"), ("RETRY", "accepted")]
+)
+def test_status_of_started_and_retried_jobs(
+    unauthorized_api_test_client, fake_events_redis, monkeypatch, state, status
+):
+    monkeypatch.setattr(PendingResult, "state", state)
+    monkeypatch.setattr("noise_api.api.endpoints.AsyncResult", PendingResult)
+
+    with unauthorized_api_test_client as client:
+        response = client.get(f"/noise/jobs/{JOB_ID}")
+
+    assert response.json()["status"] == status
+
+
+def test_events_of_finished_job_end_right_away(
+    unauthorized_api_test_client, fake_cache, fake_events_redis
+):
+    celery_key = "buildingsandroadshash_scenariohash"
+    fake_cache.put(key=celery_key, value={"result": {}})
+
+    with unauthorized_api_test_client as client:
+        with client.stream(
+            "GET", f"/noise/jobs/{jobs.cached_job_id(celery_key)}/events"
+        ) as response:
+            events = read_events(response)
+
+    assert [event["status"] for event in events] == ["successful"]
+
+
+def test_events_of_synchronous_calculation_end_with_the_job_that_took_over(
+    unauthorized_api_test_client,
+    fake_cache,
+    fake_events_redis,
+    fake_job_store,
+    monkeypatch,
+):
+    monkeypatch.setattr("noise_api.tasks.events_redis", fake_events_redis)
+    celery_key = "buildingsandroadshash_scenariohash"
+    jobs.claim_calculation(fake_job_store, celery_key, JOB_ID)
+
+    def finish_job():
+        tasks.task_postrun_handler(
+            task_id=JOB_ID,
+            task=tasks.compute_task,
+            state="SUCCESS",
+            args=[{"celery_key": celery_key}],
+            retval={},
+        )
+
+    threading.Timer(0.3, finish_job).start()
+    with unauthorized_api_test_client as client:
+        with client.stream(
+            "GET", f"/noise/jobs/{jobs.cached_job_id(celery_key)}/events"
+        ) as response:
+            events = read_events(response)
+
+    assert [event["status"] for event in events] == ["running", "successful"]
+
+
+def test_events_of_unknown_job(
+    unauthorized_api_test_client, fake_events_redis, fake_job_store
+):
+    with unauthorized_api_test_client as client:
+        response = client.get(f"/noise/jobs/{JOB_ID}/events")
+
+    assert response.status_code == 404
@@ -0,0 +1,186 @@
+import gzip
+import json
+import time
+
+import pytest
+
+from noise_api import jobs
+from noise_api.models.calculation_input import NoiseTask
+
+JOB_ID = "5c0b4bd0-4d7e-4a4d-9d4e-5bd5b0a8f111"
+CELERY_KEY = "buildingsandroadshash_scenariohash"
+RESULT = {"geojson": {"type": "FeatureCollection", "features": []}}
+
+
+@pytest.fixture
+def cached_result(fake_cache, fake_job_store):
+    fake_cache.put(key=CELERY_KEY, value={"result": RESULT})
+    jobs.remember_celery_key(fake_job_store, JOB_ID, CELERY_KEY)
+
+
+def test_results_are_served_gzip_compressed(
+    unauthorized_api_test_client, fake_cache, cached_result
+):
+    with unauthorized_api_test_client as client:
+        response = client.get(
+            f"/noise/jobs/{JOB_ID}/results", headers={"Accept-Encoding": "gzip"}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == jobs.results_etag(CELERY_KEY)
+    assert int(response.headers["content-length"]) == len(
+        fake_cache.get_compressed(key=CELERY_KEY)
+    )
+    assert response.json() == {"result": RESULT}
+
+
+def test_results_are_served_brotli_compressed(
+    unauthorized_api_test_client, cached_result
+):
+    with unauthorized_api_test_client as client:
+        response = client.get(
+            f"/noise/jobs/{JOB_ID}/results", headers={"Accept-Encoding": "br, gzip;q=0"}
+        )
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == {"result": RESULT}
+
+
+def test_results_are_served_uncompressed(unauthorized_api_test_client, cached_result):
+    with unauthorized_api_test_client as client:
+        response = client.get(
+            f"/noise/jobs/{JOB_ID}/results", headers={"Accept-Encoding": "identity"}
+        )
+
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"result": RESULT}
+
+
+@pytest.mark.parametrize("accept_encoding", ["br, gzip;q=0", "identity", None])
+def test_results_are_transcoded_in_the_threadpool(
+    unauthorized_api_test_client, cached_result, monkeypatch, accept_encoding
+):
+    transcoded = []
+
+    async def run_in_threadpool(func, *args):
+        transcoded.append(func.__name__)
+        return func(*args)
+
+    monkeypatch.setattr("noise_api.api.responses.run_in_threadpool", run_in_threadpool)
+    headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {}
+    with unauthorized_api_test_client as client:
+        # the test client sends "Accept-Encoding: gzip, deflate" unless told otherwise
+        client.headers.pop("accept-encoding")
+        response = client.get(f"/noise/jobs/{JOB_ID}/results", headers=headers)
+
+    assert response.json() == {"result": RESULT}
+    assert transcoded == ["transcode"]
+
+
+def test_repeated_download_is_not_modified(unauthorized_api_test_client, cached_result):
+    with unauthorized_api_test_client as client:
+        etag = client.get(f"/noise/jobs/{JOB_ID}/results").headers["etag"]
+        response = client.get(
+            f"/noise/jobs/{JOB_ID}/results", headers={"If-None-Match": etag}
+        )
+
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_legacy_cache_entries_count_as_miss(fake_cache):
+    fake_cache._redis.set(fake_cache._make_key(CELERY_KEY), json.dumps(RESULT))
+
+    assert fake_cache.get(key=CELERY_KEY) is None
+
+
+def test_cached_values_are_gzip_compressed(fake_cache):
+    fake_cache.put(key=CELERY_KEY, value={"result": RESULT})
+
+    assert json.loads(gzip.decompress(fake_cache.get_compressed(key=CELERY_KEY))) == {
+        "result": RESULT
+    }
+
+
+def test_cache_hit_is_answered_without_a_celery_task(
+    unauthorized_api_test_client, fake_cache, monkeypatch
+):
+    request = {
+        "buildings": {"type": "FeatureCollection", "features": []},
+        "roads": {"type": "FeatureCollection", "features": []},
+    }
+    celery_key = NoiseTask(**request).celery_key
+    fake_cache.put(key=celery_key, value={"result": RESULT})
+    monkeypatch.setattr("noise_api.tasks.compute_task.delay", pytest.fail)
+
+    with unauthorized_api_test_client as client:
+        response = client.post("/noise/processes/traffic-noise/execution", json=request)
+        job_id = response.json()["jobID"]
+        status = client.get(f"/noise/jobs/{job_id}").json()["status"]
+        result = client.get(f"/noise/jobs/{job_id}/results").json()
+
+    assert response.status_code == 201
+    assert job_id == jobs.cached_job_id(celery_key)
+    assert status == "successful"
+    assert result == {"result": RESULT}
+
+
+def test_expired_cached_job_is_not_found(unauthorized_api_test_client, fake_cache):
+    job_id = jobs.cached_job_id(CELERY_KEY)
+
+    with unauthorized_api_test_client as client:
+        assert client.get(f"/noise/jobs/{job_id}").status_code == 404
+        assert client.get(f"/noise/jobs/{job_id}/results").status_code == 404
+
+
+def test_hot_results_are_served_from_local_cache(
+    unauthorized_api_test_client, fake_cache, cached_result
+):
+    with unauthorized_api_test_client as client:
+        client.get(f"/noise/jobs/{JOB_ID}/results")
+        redis_hits = fake_cache.stats()["hits"]
+        response = client.get(f"/noise/jobs/{JOB_ID}/results")
+
+    assert response.json() == {"result": RESULT}
+    assert fake_cache.stats()["hits"] == redis_hits
+
+
+def test_local_cache_follows_redis_invalidations(
+    unauthorized_api_test_client, fake_cache, cached_result
+):
+    job_id = jobs.cached_job_id(CELERY_KEY)
+
+    with unauthorized_api_test_client as client:
+        assert client.get(f"/noise/jobs/{job_id}/results").status_code == 200
+        fake_cache.delete(key=CELERY_KEY)
+
+        for _ in range(50):
+            response = client.get(f"/noise/jobs/{job_id}/results")
+            if response.status_code == 404:
+                break
+            time.sleep(0.1)
+
+    assert response.status_code == 404
+
+
+def test_statistics_are_served_from_their_own_cache_entry(
+    unauthorized_api_test_client, fake_cache, fake_job_store
+):
+    statistics = {"study_area_m2": 10000.0, "thresholds": {"55": {"buildings": 2}}}
+    jobs.store_statistics(fake_cache, CELERY_KEY, statistics)
+    jobs.remember_celery_key(fake_job_store, JOB_ID, CELERY_KEY)
+
+    with unauthorized_api_test_client as client:
+        response = client.get(f"/noise/jobs/{JOB_ID}/statistics")
+        not_modified_response = client.get(
+            f"/noise/jobs/{JOB_ID}/statistics",
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+        missing_response = client.get("/noise/jobs/unknown-job/statistics")
+
+    assert response.status_code == 200
+    assert response.json() == statistics
+    assert not fake_cache.exists(key=CELERY_KEY)
+    assert not_modified_response.status_code == 304
+    assert missing_response.status_code == 404
@@ -0,0 +1,121 @@
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+import noise_api.tasks as tasks
+from noise_api import jobs
+from noise_api.config import settings
+from noise_api.models.calculation_input import NoiseCalculationInput, NoiseTask
+from tests.test_input_datasets import INPUT_DATASET
+
+
+def submit(client, request_body=INPUT_DATASET, params=None) -> dict:
+    response = client.post(
+        "/noise/processes/traffic-noise/execution", json=request_body, params=params
+    )
+    assert response.status_code == 201
+
+    return response.json()
+
+
+def test_identical_jobs_are_coalesced(
+    unauthorized_api_test_client, fake_cache, fake_job_store, compute_task_spy
+):
+    with unauthorized_api_test_client as client:
+        first_job = submit(client)
+        second_job = submit(client)
+        other_scenario_job = submit(client, {**INPUT_DATASET, "max_speed": 30})
+
+    assert first_job["jobID"] == second_job["jobID"]
+    assert second_job["status"] == "accepted"
+    assert other_scenario_job["jobID"] != first_job["jobID"]
+    assert compute_task_spy.task_ids == [
+        first_job["jobID"],
+        other_scenario_job["jobID"],
+    ]
+
+
+def test_finished_job_releases_calculation(
+    unauthorized_api_test_client, fake_cache, fake_job_store, compute_task_spy
+):
+    celery_key = NoiseTask(**INPUT_DATASET).celery_key
+
+    with unauthorized_api_test_client as client:
+        first_job = submit(client)
+        tasks.task_postrun_handler(
+            task_id=first_job["jobID"],
+            task=tasks.compute_task,
+            state="FAILURE",
+            args=[{"celery_key": celery_key}],
+            retval=None,
+        )
+        second_job = submit(client)
+
+    assert first_job["jobID"] != second_job["jobID"]
+    assert jobs.lookup_celery_key(fake_job_store, second_job["jobID"]) == celery_key
+
+
+def test_release_keeps_claim_of_other_job(fake_job_store):
+    jobs.claim_calculation(fake_job_store, "celery_key", "running-job")
+    jobs.release_calculation(fake_job_store, "celery_key", "other-job")
+
+    assert (
+        jobs.claim_calculation(fake_job_store, "celery_key", "new-job") == "running-job"
+    )
+
+
+def test_task_def_references_input_dataset(
+    unauthorized_api_test_client,
+    fake_cache,
+    fake_input_store,
+    fake_job_store,
+    compute_task_spy,
+):
+    calculation_task = NoiseTask(**INPUT_DATASET)
+
+    with unauthorized_api_test_client as client:
+        submit(client)
+
+    expected_task_def = jsonable_encoder(
+        calculation_task, exclude={"buildings", "roads"}
+    )
+    expected_task_def["input_id"] = calculation_task.hash
+    assert compute_task_spy.task_defs == [expected_task_def]
+    assert fake_input_store.get(key=calculation_task.hash) == INPUT_DATASET
+
+
+def test_fingerprints_are_computed_once(monkeypatch):
+    calculation_task = NoiseTask.from_input(NoiseCalculationInput(**INPUT_DATASET))
+    celery_key = calculation_task.celery_key
+
+    monkeypatch.setattr("noise_api.models.calculation_input.hash_dict", None)
+    assert calculation_task.celery_key == celery_key
+    assert calculation_task.to_task_def()["hash"] == calculation_task.hash
+
+
+@pytest.mark.parametrize(
+    "params,interactive_max_input_bytes,queue",
+    [
+        (None, 256 * 1024, settings.routing.interactive_queue),
+        ({"priority": "batch"}, 256 * 1024, settings.broker.task_default_queue),
+        ({"priority": "interactive"}, 1024, settings.broker.task_default_queue),
+    ],
+)
+def test_jobs_are_routed_by_priority_and_size(
+    unauthorized_api_test_client,
+    fake_cache,
+    fake_input_store,
+    fake_job_store,
+    compute_task_spy,
+    monkeypatch,
+    params,
+    interactive_max_input_bytes,
+    queue,
+):
+    monkeypatch.setattr(
+        settings.routing, "interactive_max_input_bytes", interactive_max_input_bytes
+    )
+
+    with unauthorized_api_test_client as client:
+        submit(client, params=params)
+
+    assert compute_task_spy.queues == [queue]
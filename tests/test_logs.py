@@ -0,0 +1,57 @@
+import logging
+import queue
+
+import orjson
+
+from noise_api.logs import (
+    NonBlockingQueueHandler,
+    RateLimitFilter,
+    StructuredLogFormatter,
+)
+
+
+def make_record(
+    msg="Job %s took %.1fs", args=("job-id", 1.25), **extra
+) -> logging.LogRecord:
+    record = logging.LogRecord(
+        "noise_api.tasks", logging.INFO, "tasks.py", 42, msg, args, None
+    )
+    record.__dict__.update(extra)
+
+    return record
+
+
+def test_structured_log_formatter():
+    record = make_record(stages={"ingest": 0.5}, rate_limit=True)
+
+    log = orjson.loads(StructuredLogFormatter().format(record))
+
+    assert log["message"] == "Job job-id took 1.2s"
+    assert log["extra"] == {"stages": {"ingest": 0.5}}
+    assert log["metadata"]["lineno"] == 42
+
+
+def test_rate_limit_filter_reports_suppressed_records(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("noise_api.logs.time.monotonic", lambda: now[0])
+    rate_limit_filter = RateLimitFilter(max_records=2, interval_seconds=60)
+
+    passed = [rate_limit_filter.filter(make_record(rate_limit=True)) for _ in range(5)]
+    unlimited = rate_limit_filter.filter(make_record())
+    now[0] = 61.0
+    next_record = make_record(rate_limit=True)
+
+    assert passed == [True, True, False, False, False]
+    assert unlimited
+    assert rate_limit_filter.filter(next_record)
+    assert next_record.suppressed_records == 3
+
+
+def test_queue_handler_drops_records_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+
+    handler.handle(make_record())
+    handler.handle(make_record())
+
+    assert handler.queue.qsize() == 1
+    assert handler.queue.get().msg == "Job job-id took 1.2s"
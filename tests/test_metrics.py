@@ -0,0 +1,63 @@
+import fakeredis
+import pytest
+from prometheus_client import REGISTRY
+
+from noise_api.config import settings
+from noise_api.metrics import clear_multiprocess_dir
+from noise_api.noise_analysis.noisemap import timed_stage
+
+
+@pytest.fixture
+def fake_broker(monkeypatch, fake_redis_server):
+    broker = fakeredis.FakeRedis(server=fake_redis_server)
+    monkeypatch.setattr("noise_api.api.endpoints.broker_redis", broker)
+    yield broker
+
+
+def test_metrics_endpoint(unauthorized_api_test_client, fake_cache, fake_broker):
+    fake_broker.rpush(settings.routing.interactive_queue, "job")
+
+    with unauthorized_api_test_client as client:
+        client.get("/noise/jobs/cached-abc_def/results")
+        response = client.get("/noise/metrics")
+
+    assert response.status_code == 200
+    assert (
+        f'noise_queue_depth{{queue="{settings.routing.interactive_queue}"}} 1.0'
+        in response.text
+    )
+    assert (
+        'noise_cache_lookups_total{cache="noise_simulations",result="miss"}'
+        in response.text
+    )
+
+
+def test_stage_timing():
+    def observed_stages():
+        return (
+            REGISTRY.get_sample_value(
+                "noise_stage_duration_seconds_count", {"stage": "test_stage"}
+            )
+            or 0
+        )
+
+    observed_before = observed_stages()
+    stage_timings = {}
+
+    with timed_stage("test_stage", stage_timings):
+        pass
+
+    assert stage_timings["test_stage"] >= 0
+    assert observed_stages() == observed_before + 1
+
+
+def test_service_clears_only_its_own_metrics(tmp_path, monkeypatch):
+    for service in ("api", "celery-worker"):
+        (tmp_path / service).mkdir()
+        (tmp_path / service / "counter_1.db").touch()
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path / "api"))
+
+    clear_multiprocess_dir()
+
+    assert not (tmp_path / "api" / "counter_1.db").exists()
+    assert (tmp_path / "celery-worker" / "counter_1.db").exists()
@@ -0,0 +1,354 @@
+import json
+import shutil
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import LineString, box
+
+from benchmarks.synthetic_city import generate_city
+from noise_api.config import settings
+from noise_api.models.calculation_input import NoiseCalculationInput
+from noise_api.noise_analysis.exposure_statistics import exposure_statistics
+from noise_api.noise_analysis.geo_helpers import (
+    WGS84,
+    all_z_values_to_zero,
+    metric_crs_for_extent,
+    reproject,
+)
+from noise_api.noise_analysis.noisemap import (
+    STAGES,
+    H2DatabaseContextManager,
+    build_queries,
+    calculate_noise_result,
+    clip_to_buildings,
+    prepare_queries,
+    reproject_inputs,
+)
+from noise_api.noise_analysis.prefilter import prefilter_inputs
+from noise_api.noise_analysis.source_merging import merge_road_segments
+from noise_api.noise_analysis.sql_query_builder import select_building_ingest
+
+
+def test_synthetic_city():
+    city = generate_city(buildings=50, roads=30, railroads=5)
+
+    NoiseCalculationInput(**city)
+    assert len(city["buildings"]["features"]) == 50
+    assert len(city["roads"]["features"]) == 35
+    assert {road["properties"]["road_type"] for road in city["roads"]["features"]} == {
+        "boulevard",
+        "street",
+        "alley",
+        "railroad",
+    }
+
+
+def test_queries_of_synthetic_city():
+    city = generate_city(buildings=50, roads=30, railroads=5)
+
+    buildings_gdf, roads_gdf = reproject_inputs(city["buildings"], city["roads"])
+    building_query, road_queries, traffic_queries = build_queries(
+        all_z_values_to_zero(buildings_gdf),
+        all_z_values_to_zero(roads_gdf),
+        {"max_speed": 30, "traffic_quota": None},
+    )
+
+    assert "INSERT" in building_query.upper()
+    assert len(road_queries) == len(traffic_queries) == 35
+
+
+def test_stages_before_the_database():
+    city = generate_city(buildings=50, roads=30, railroads=5)
+    traffic_settings = {"max_speed": None, "traffic_quota": None}
+    stage_timings = {}
+
+    _, _, (_, road_queries, _) = prepare_queries(
+        city["buildings"], city["roads"], traffic_settings, stage_timings=stage_timings
+    )
+
+    database_stages = STAGES.index("ingest")
+    assert tuple(stage_timings) == STAGES[:database_stages]
+    assert road_queries
+
+
+@pytest.mark.parametrize(
+    "lon, lat, epsg",
+    [
+        (10.0, 53.5, 25832),  # Hamburg
+        (-9.1, 38.7, 25829),  # Lisbon
+        (-74.0, 40.7, 32618),  # New York
+        (151.2, -33.9, 32756),  # Sydney
+    ],
+)
+def test_metric_crs_is_the_utm_zone_of_the_input(lon, lat, epsg):
+    assert (
+        metric_crs_for_extent((lon - 0.01, lat - 0.01, lon + 0.01, lat + 0.01)) == epsg
+    )
+
+
+def test_inputs_are_reprojected_to_their_utm_zone():
+    city = generate_city(buildings=20, roads=10, origin=(-74.0, 40.7))
+
+    buildings_gdf, roads_gdf = reproject_inputs(city["buildings"], city["roads"])
+    result_gdf = clip_to_buildings(
+        {"features": json.loads(buildings_gdf.to_json())["features"]}, buildings_gdf
+    )
+
+    assert buildings_gdf.crs.to_epsg() == roads_gdf.crs.to_epsg() == 32618
+    # blocks are 60 m wide, distances stay true in the UTM zone
+    assert roads_gdf.geometry.length.round().isin([60]).all()
+    assert result_gdf.crs == buildings_gdf.crs
+    assert (
+        reproject(result_gdf, WGS84).geometry.centroid.x.between(-74.01, -73.99).all()
+    )
+
+
+def test_exposure_statistics():
+    # Hamburg, a study area of 100 m x 100 m
+    x, y = 566000, 5931000
+    buildings_gdf = gpd.GeoDataFrame(
+        {"name": ["quiet", "on the border", "loud"]},
+        geometry=[
+            box(x, y, x + 10, y + 10),
+            box(x + 45, y, x + 55, y + 10),
+            box(x + 90, y + 90, x + 100, y + 100),
+        ],
+        crs="EPSG:25832",
+    )
+    result_gdf = gpd.GeoDataFrame(
+        {"value": [2, 3, 5]},
+        geometry=[
+            box(x, y, x + 50, y + 100),
+            box(x + 50, y, x + 80, y + 100),
+            box(x + 80, y, x + 100, y + 100),
+        ],
+        crs="EPSG:25832",
+    )
+
+    statistics = exposure_statistics(result_gdf, buildings_gdf)
+
+    assert statistics["study_area_m2"] == pytest.approx(10000, rel=1e-3)
+    assert statistics["buildings"] == 3
+    assert statistics["area_m2_per_class"]["2"] == pytest.approx(5000, rel=1e-3)
+    assert statistics["area_m2_per_class"]["0"] == 0
+    # the building on the border counts in the louder class
+    assert statistics["buildings_per_class"] == {
+        "0": 0,
+        "1": 0,
+        "2": 1,
+        "3": 1,
+        "4": 0,
+        "5": 1,
+        "6": 0,
+        "7": 0,
+    }
+    assert statistics["thresholds"]["55"]["area_share"] == pytest.approx(0.5, rel=1e-3)
+    assert statistics["thresholds"]["55"]["buildings"] == 2
+    assert statistics["thresholds"]["65"]["area_share"] == pytest.approx(0.2, rel=1e-3)
+    assert statistics["thresholds"]["65"]["buildings"] == 1
+
+
+@pytest.mark.parametrize(
+    "building_count, building_ingest", [(50, "multipolygon"), (1200, "individual")]
+)
+def test_building_ingest_is_selected_by_size(
+    building_count, building_ingest, monkeypatch
+):
+    monkeypatch.setattr(settings.building_ingest, "strategy", "auto")
+    monkeypatch.setattr(settings.building_ingest, "individual_min_buildings", 1000)
+    city = generate_city(buildings=building_count, roads=30)
+
+    buildings_gdf, roads_gdf = reproject_inputs(city["buildings"], city["roads"])
+    building_query, _, _ = build_queries(
+        buildings_gdf, roads_gdf, {"max_speed": None, "traffic_quota": None}
+    )
+
+    assert select_building_ingest(building_count) == building_ingest
+    if building_ingest == "individual":
+        # one row per building, in batches, with a spatial index
+        assert building_query.count("INSERT INTO buildings") == 3
+        assert building_query.count("ST_GeomFromText") == building_count
+        assert "CREATE SPATIAL INDEX ON buildings" in building_query
+    else:
+        assert building_query.count("ST_GeomFromText") == 1
+        assert "SPATIAL INDEX" not in building_query
+
+
+def test_prefilter_drops_what_cannot_reach_the_buildings(monkeypatch):
+    monkeypatch.setattr(settings.computation, "max_prop_distance", 100)
+    buildings_gdf = gpd.GeoDataFrame(
+        {"name": ["near", "covered by another road", "within the domain", "far"]},
+        geometry=[
+            box(0, 0, 10, 10),
+            box(2000, 0, 2010, 10),
+            box(1000, 150, 1010, 160),
+            box(1000, 3000, 1010, 3010),
+        ],
+        crs="EPSG:25832",
+    )
+    roads_gdf = gpd.GeoDataFrame(
+        {
+            "name": ["inside", "quiet", "railroad", "too far"],
+            "road_type": ["street", "alley", "railroad", "boulevard"],
+            "car_traffic_daily": [1000, 10, None, 50000],
+            "truck_traffic_daily": [10, 0, None, 5000],
+        },
+        geometry=[
+            LineString([(0, 20), (50, 20)]),
+            LineString([(2050, 0), (2050, 50)]),
+            LineString([(2060, 50), (2060, 100)]),
+            LineString([(2300, 0), (2400, 0)]),
+        ],
+        crs="EPSG:25832",
+    )
+
+    filtered_buildings_gdf, filtered_roads_gdf = prefilter_inputs(
+        buildings_gdf, roads_gdf
+    )
+    monkeypatch.setattr(settings.prefilter, "min_outside_daily_vehicles", 100)
+    _, busy_roads_gdf = prefilter_inputs(buildings_gdf, roads_gdf)
+
+    # the buildings span the area of interest, "too far" is more than 100 m outside of it
+    assert list(filtered_roads_gdf["name"]) == ["inside", "quiet", "railroad"]
+    # the domain is the envelope of the remaining roads expanded by 100 m
+    assert list(filtered_buildings_gdf["name"]) == [
+        "near",
+        "covered by another road",
+        "within the domain",
+    ]
+    assert list(busy_roads_gdf["name"]) == ["inside", "railroad"]
+
+
+def test_source_merging_merges_contiguous_segments_with_equal_traffic():
+    roads_gdf = gpd.GeoDataFrame(
+        {
+            "id": [1, 2, 3, 4, 5, 6],
+            "road_type": ["street", "street", "street", "street", "alley", "street"],
+            "car_traffic_daily": [1000, 1000, 1000, 2000, 1000, 1000],
+            "train_speed": [None] * 6,
+        },
+        geometry=[
+            # one street split into three segments, the last one off by less than the tolerance
+            LineString([(0, 0), (100, 0)]),
+            LineString([(100, 0), (200, 0)]),
+            LineString([(200.4, 0), (300, 0)]),
+            # continues the street with other traffic
+            LineString([(300, 0), (400, 0)]),
+            # branches off the street with another road type
+            LineString([(100, 0), (100, 100)]),
+            # a separate street with the same traffic
+            LineString([(0, 500), (100, 500)]),
+        ],
+        crs="EPSG:25832",
+    )
+
+    merged_roads_gdf = merge_road_segments(roads_gdf)
+
+    assert len(merged_roads_gdf) == 4
+    assert merged_roads_gdf.geometry.length.sum() == pytest.approx(
+        roads_gdf.geometry.length.sum(), abs=1
+    )
+    merged_street = merged_roads_gdf[merged_roads_gdf.geometry.length > 250]
+    assert list(merged_street["car_traffic_daily"]) == [1000]
+    assert merged_roads_gdf["id"].is_unique
+    assert sorted(merged_roads_gdf["road_type"]) == [
+        "alley",
+        "street",
+        "street",
+        "street",
+    ]
+
+
+def test_source_merging_snaps_only_segment_ends():
+    roads_gdf = gpd.GeoDataFrame(
+        {"id": [1, 2], "road_type": ["street", "street"]},
+        geometry=[
+            # the ends are closer than the tolerance, but on both sides of a 1 m grid line
+            LineString([(0, 0), (50.3, 0.3), (100.4, 0)]),
+            LineString([(100.6, 0), (200, 0)]),
+        ],
+        crs="EPSG:25832",
+    )
+
+    merged_roads_gdf = merge_road_segments(roads_gdf)
+
+    assert len(merged_roads_gdf) == 1
+    assert (50.3, 0.3) in merged_roads_gdf.geometry.iloc[0].coords
+
+
+def test_source_merging_keeps_segments_shorter_than_the_tolerance():
+    roads_gdf = gpd.GeoDataFrame(
+        {"id": [1, 2], "road_type": ["street", "street"]},
+        geometry=[
+            LineString([(0, 0), (0.5, 0)]),
+            LineString([(500, 0), (600, 0)]),
+        ],
+        crs="EPSG:25832",
+    )
+
+    merged_roads_gdf = merge_road_segments(roads_gdf)
+
+    assert len(merged_roads_gdf) == 2
+    assert list(merged_roads_gdf.geometry.length) == pytest.approx([0.5, 100])
+
+
+def test_source_merging_keeps_the_ids_of_merged_segments():
+    roads_gdf = gpd.GeoDataFrame(
+        {"id": [1, 2, 3], "road_type": ["street", "street", "street"]},
+        geometry=[
+            LineString([(0, 500), (0.5, 500)]),
+            LineString([(0, 0), (100, 0)]),
+            LineString([(100, 0), (200, 0)]),
+        ],
+        crs="EPSG:25832",
+    )
+
+    merged_roads_gdf = merge_road_segments(roads_gdf)
+
+    assert len(merged_roads_gdf) == 2
+    assert sorted(
+        zip(merged_roads_gdf.geometry.length.round(1), merged_roads_gdf["id"])
+    ) == [(0.5, 1), (200, 2)]
+
+
+def test_source_merging_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(settings.source_merging, "enabled", False)
+    roads_gdf = gpd.GeoDataFrame(
+        {"id": [1, 2], "road_type": ["street", "street"]},
+        geometry=[LineString([(0, 0), (100, 0)]), LineString([(100, 0), (200, 0)])],
+        crs="EPSG:25832",
+    )
+
+    assert merge_road_segments(roads_gdf) is roads_gdf
+
+
+def area_by_noise_class(result_geojson: dict) -> dict:
+    result_gdf = gpd.GeoDataFrame.from_features(
+        result_geojson["features"], crs="EPSG:4326"
+    ).to_crs("EPSG:25832")
+    return result_gdf.geometry.area.groupby(result_gdf["value"]).sum().to_dict()
+
+
+@pytest.mark.skipif(shutil.which("java") is None, reason="the H2 database needs Java")
+def test_source_merging_keeps_noise_levels(monkeypatch):
+    city = generate_city(buildings=100, roads=60, railroads=0)
+    traffic_settings = {"max_speed": None, "traffic_quota": None}
+
+    areas = {}
+    for enabled in (False, True):
+        monkeypatch.setattr(settings.source_merging, "enabled", enabled)
+        with H2DatabaseContextManager() as h2_context:
+            areas[enabled] = area_by_noise_class(
+                calculate_noise_result(
+                    h2_context.psycopg2_cursor,
+                    city["buildings"],
+                    city["roads"],
+                    traffic_settings,
+                )
+            )
+
+    # the area of each noise class changes by less than 1 % of the total area
+    total_area = sum(areas[False].values())
+    for noise_class in areas[False].keys() | areas[True].keys():
+        difference = areas[True].get(noise_class, 0) - areas[False].get(noise_class, 0)
+        assert abs(difference) < 0.01 * total_area
@@ -21,3 +21,26 @@ def test_noise_calculation(unauthorized_api_test_client, traffic_noise_desc):
             json.dump(response.json(), f)
         assert response.status_code == 200
         assert traffic_noise_desc == response.json()
+
+
+def test_process_description_is_served_with_etag(unauthorized_api_test_client):
+    with unauthorized_api_test_client as client:
+        response = client.get("/noise/processes/traffic-noise")
+        not_modified_response = client.get(
+            "/noise/processes/traffic-noise",
+            headers={"If-None-Match": response.headers["ETag"]},
+        )
+        process_list_response = client.get("/noise/processes")
+
+    assert response.json()["id"] == "traffic-noise"
+    assert not_modified_response.status_code == 304
+    assert process_list_response.headers["ETag"] != response.headers["ETag"]
+
+
+def test_openapi_examples(unauthorized_api_test_client):
+    with unauthorized_api_test_client as client:
+        openapi_json = client.get("/noise/openapi.json").json()
+
+    request_body = openapi_json["paths"]["/noise/processes/traffic-noise/execution"]["post"]["requestBody"]
+    examples = request_body["content"]["application/json"]["examples"]
+    assert examples["without_global_traffic_settings"]["value"]["roads"]["type"] == "FeatureCollection"
@@ -0,0 +1,106 @@
+import gzip
+import time
+
+import orjson
+import pytest
+
+import noise_api.tasks as tasks
+from noise_api import jobs
+from noise_api.config import settings
+from noise_api.profiling import JobProfiler
+from tests.test_input_datasets import INPUT_DATASET
+from tests.test_job_submission import submit
+
+
+class SlowCursor:
+    def execute(self, query):
+        time.sleep(0.01)
+
+
+def busy_calculation(cursor):
+    cursor.execute("DROP TABLE IF EXISTS roads_traffic; CREATE TABLE roads_traffic ...")
+    for _ in range(3):
+        cursor.execute("INSERT INTO roads_traffic VALUES (1)")
+    deadline = time.monotonic() + 0.1
+    while time.monotonic() < deadline:
+        pass
+
+
+def test_profiler_samples_stacks_and_times_statements():
+    with JobProfiler() as profiler:
+        busy_calculation(profiler.wrap_cursor(SlowCursor()))
+
+    profile = profiler.result()
+
+    assert profile["python"]["samples"] > 0
+    assert any("busy_calculation" in stack for stack in profile["python"]["stacks"])
+    assert profile["h2"]["statements"] == 4
+    assert profile["h2"]["by_kind"]["INSERT INTO roads_traffic"]["count"] == 3
+    assert profile["h2"]["slowest"][0]["seconds"] >= 0.01
+
+
+def test_profiling_is_restricted_by_config(unauthorized_api_test_client):
+    with unauthorized_api_test_client as client:
+        response = client.post(
+            "/noise/processes/traffic-noise/execution",
+            json=INPUT_DATASET,
+            params={"profile": "true"},
+        )
+
+    assert response.status_code == 403
+
+
+def test_profiled_job_is_not_coalesced(
+    unauthorized_api_test_client,
+    fake_cache,
+    fake_input_store,
+    fake_job_store,
+    compute_task_spy,
+    monkeypatch,
+):
+    monkeypatch.setattr(settings.profiling, "enabled", True)
+
+    with unauthorized_api_test_client as client:
+        job_id = submit(client)["jobID"]
+        profiled_job_id = submit(client, params={"profile": "true"})["jobID"]
+
+    assert profiled_job_id != job_id
+    assert compute_task_spy.task_defs[1]["profile"] is True
+
+
+def test_profile_is_served_next_to_results(
+    unauthorized_api_test_client, fake_job_store
+):
+    jobs.store_profile(fake_job_store, "job-id", {"python": {"samples": 1}})
+
+    with unauthorized_api_test_client as client:
+        response = client.get("/noise/jobs/job-id/profile")
+        not_modified_response = client.get(
+            "/noise/jobs/job-id/profile",
+            headers={"If-None-Match": response.headers["ETag"]},
+        )
+        missing_response = client.get("/noise/jobs/other-job-id/profile")
+
+    assert response.json() == {"python": {"samples": 1}}
+    assert not_modified_response.status_code == 304
+    assert missing_response.status_code == 404
+
+
+def test_failed_job_keeps_its_profile(fake_job_store, monkeypatch):
+    def failing_calculation(task_def, profiler, **kwargs):
+        busy_calculation(profiler.wrap_cursor(SlowCursor()))
+        raise RuntimeError("calculation failed")
+
+    monkeypatch.setattr("noise_api.tasks.run_noise_calculation", failing_calculation)
+    job_id = "failed-job-id"
+    tasks.compute_task.push_request(id=job_id)
+    try:
+        with pytest.raises(RuntimeError):
+            tasks.compute_task.run({**INPUT_DATASET, "profile": True})
+    finally:
+        tasks.compute_task.pop_request()
+
+    profile = orjson.loads(
+        gzip.decompress(jobs.get_compressed_profile(fake_job_store, job_id))
+    )
+    assert profile["h2"]["statements"] == 4
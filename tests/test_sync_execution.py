@@ -0,0 +1,207 @@
+import gzip
+import time
+
+import orjson
+import pytest
+
+from noise_api import jobs
+from noise_api.models.calculation_input import NoiseTask
+from noise_api.models.cost_estimate import CostEstimate
+from tests.test_input_datasets import INPUT_DATASET
+
+RESULT = {"geojson": {"type": "FeatureCollection", "features": []}}
+STATISTICS = {"study_area_m2": 10000.0}
+
+
+class CalculationSpy:
+    def __init__(self):
+        self.task_defs = []
+        self.error = None
+        self.duration_seconds = 0
+        self.while_running = None
+
+    def run_noise_calculation(
+        self, task_def, max_heap_mb=None, run_stats=None, statistics=None
+    ):
+        self.task_defs.append(task_def)
+        if self.while_running is not None:
+            self.while_running()
+        time.sleep(self.duration_seconds)
+        if self.error is not None:
+            raise self.error
+
+        statistics.update(STATISTICS)
+        return RESULT
+
+
+@pytest.fixture
+def calculation_spy(monkeypatch):
+    spy = CalculationSpy()
+    monkeypatch.setattr(
+        "noise_api.api.endpoints.run_noise_calculation", spy.run_noise_calculation
+    )
+    yield spy
+
+
+def execute(client, wait_seconds):
+    return client.post(
+        "/noise/processes/traffic-noise/execution",
+        json=INPUT_DATASET,
+        headers={"Prefer": f"wait={wait_seconds}"},
+    )
+
+
+def test_small_input_is_calculated_synchronously(
+    unauthorized_api_test_client,
+    fake_cache,
+    fake_input_store,
+    fake_job_store,
+    compute_task_spy,
+    calculation_spy,
+):
+    with unauthorized_api_test_client as client:
+        response = execute(client, 60)
+        cached_response = execute(client, 60)
+
+    assert response.status_code == 200
+    assert response.headers["preference-applied"] == "wait=60"
+    assert response.json() == {"result": RESULT}
+    assert calculation_spy.task_defs[0]["roads"] == INPUT_DATASET["roads"]
+    # stored like the results of a job
+    celery_key = NoiseTask(**INPUT_DATASET).celery_key
+    assert fake_cache.get(key=celery_key) == {"result": RESULT}
+    assert (
+        orjson.loads(
+            gzip.decompress(jobs.get_compressed_statistics(fake_cache, celery_key))
+        )
+        == STATISTICS
+    )
+    assert cached_response.json() == {"result": RESULT}
+    assert len(calculation_spy.task_defs) == 1
+    assert compute_task_spy.task_ids == []
+
+
+def test_expensive_input_falls_back_to_a_job(
+    unauthorized_api_test_client,
+    fake_cache,
+    fake_input_store,
+    fake_job_store,
+    compute_task_spy,
+    calculation_spy,
+):
+    with unauthorized_api_test_client as client:
+        response = execute(client, 0.001)
+
+    assert response.status_code == 201
+    assert "preference-applied" not in response.headers
+    assert response.json()["status"] == "accepted"
+    assert calculation_spy.task_defs == []
+    assert len(compute_task_spy.task_ids) == 1
+
+
+def test_running_calculation_is_not_calculated_again(
+    unauthorized_api_test_client,
+    fake_cache,
+    fake_input_store,
+    fake_job_store,
+    compute_task_spy,
+    calculation_spy,
+):
+    celery_key = NoiseTask(**INPUT_DATASET).celery_key
+    jobs.claim_calculation(fake_job_store, celery_key, "running-job-id")
+
+    with unauthorized_api_test_client as client:
+        response = execute(client, 60)
+
+    assert response.json()["jobID"] == "running-job-id"
+    assert calculation_spy.task_defs == []
+    assert compute_task_spy.task_ids == []
+
+
+@pytest.mark.parametrize(
+    "error, duration_seconds", [(RuntimeError("H2 failed"), 0), (None, 2)]
+)
+def test_failed_or_slow_calculation_falls_back_to_a_job(
+    unauthorized_api_test_client,
+    fake_cache,
+    fake_input_store,
+    fake_job_store,
+    compute_task_spy,
+    calculation_spy,
+    monkeypatch,
+    error,
+    duration_seconds,
+):
+    monkeypatch.setattr(
+        "noise_api.api.endpoints.cost_model.estimate",
+        lambda job_store, features: CostEstimate(
+            duration_seconds=0.1, memory_mb=100, features=features, recorded_runs=0
+        ),
+    )
+    calculation_spy.error = error
+    calculation_spy.duration_seconds = duration_seconds
+
+    with unauthorized_api_test_client as client:
+        response = execute(client, 0.5)
+
+    assert response.status_code == 201
+    assert len(calculation_spy.task_defs) == 1
+    assert len(compute_task_spy.task_ids) == 1
+    assert response.json()["jobID"] == compute_task_spy.task_ids[0]
+
+
+def test_synchronous_calculation_is_reported_as_running(
+    unauthorized_api_test_client, fake_cache, fake_job_store
+):
+    celery_key = NoiseTask(**INPUT_DATASET).celery_key
+    job_id = jobs.cached_job_id(celery_key)
+    jobs.claim_calculation(fake_job_store, celery_key, job_id)
+
+    with unauthorized_api_test_client as client:
+        response = client.get(f"/noise/jobs/{job_id}")
+
+    assert response.json()["status"] == "running"
+
+
+def test_attached_requests_follow_the_job_when_the_synchronous_calculation_times_out(
+    unauthorized_api_test_client,
+    fake_cache,
+    fake_input_store,
+    fake_job_store,
+    compute_task_spy,
+    calculation_spy,
+    monkeypatch,
+):
+    monkeypatch.setattr(
+        "noise_api.api.endpoints.cost_model.estimate",
+        lambda job_store, features: CostEstimate(
+            duration_seconds=0.1, memory_mb=100, features=features, recorded_runs=0
+        ),
+    )
+    calculation_spy.duration_seconds = 1
+    celery_key = NoiseTask(**INPUT_DATASET).celery_key
+    sync_job_id = jobs.cached_job_id(celery_key)
+
+    attached_responses = []
+
+    with unauthorized_api_test_client as client:
+        calculation_spy.while_running = lambda: attached_responses.append(
+            client.post("/noise/processes/traffic-noise/execution", json=INPUT_DATASET)
+        )
+        response = execute(client, 0.2)
+        status_while_the_job_runs = client.get(f"/noise/jobs/{sync_job_id}")
+        for _ in range(50):
+            if fake_cache.get(key=celery_key) is not None:
+                break
+            time.sleep(0.1)
+        status_after_the_calculation = client.get(f"/noise/jobs/{sync_job_id}")
+
+    assert response.status_code == 201
+    assert response.json()["jobID"] == compute_task_spy.task_ids[0]
+    # attached to the synchronous calculation, then handed over to the job
+    assert attached_responses[0].json()["jobID"] == sync_job_id
+    assert len(calculation_spy.task_defs) == 1
+    assert status_while_the_job_runs.json()["status"] == "running"
+    # the abandoned calculation still caches its result
+    assert status_after_the_calculation.json()["status"] == "successful"
+    assert fake_cache.get(key=celery_key) == {"result": RESULT}